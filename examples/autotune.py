@@ -0,0 +1,52 @@
+"""tunes the mathsat options of an enumerator on a corpus of SMT-LIB instances, and saves a profile per theory
+
+The profiles are named PREFIX-THEORY (e.g. tuned-lra) and saved in --profiles-dir (by default the
+directory given by ENUMERATORS_PROFILES_DIR, or ~/.enumerators/profiles), from which the enumerators
+load them with msat_profile="tuned-lra".
+
+usage: python autotune.py corpus_dir [more files or dirs] [--enumerator total] [--timeout 60] [--prefix tuned]
+"""
+
+import argparse
+import sys
+
+from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.tuning import tune_corpus
+
+ENUMERATORS = {"total": MathSATTotalEnumerator, "partial": MathSATExtendedPartialEnumerator}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="+", help="SMT-LIB files, or directories of SMT-LIB files")
+    parser.add_argument("--enumerator", choices=ENUMERATORS, default="total")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed to each enumeration")
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--min-improvement", type=float, default=0.05)
+    parser.add_argument("--no-lemma-check", action="store_true", help="do not check that the lemmas are T-valid")
+    parser.add_argument("--prefix", default="tuned")
+    parser.add_argument("--profiles-dir", default=None)
+    args = parser.parse_args()
+
+    profiles = tune_corpus(
+        args.corpus,
+        prefix=args.prefix,
+        directory=args.profiles_dir,
+        enumerator_cls=ENUMERATORS[args.enumerator],
+        timeout=args.timeout,
+        rounds=args.rounds,
+        min_improvement=args.min_improvement,
+        check_lemmas=not args.no_lemma_check,
+        log=lambda line: print(line, file=sys.stderr),
+    )
+    for theory, profile in profiles.items():
+        info = profile.info
+        print(
+            f"{profile.name} ({theory}): {info['default_score']:.3f}s -> {info['tuned_score']:.3f}s, "
+            f"options {profile.options}"
+        )
+
+
+if __name__ == "__main__":
+    main()
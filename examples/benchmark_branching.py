@@ -0,0 +1,57 @@
+"""compares the branching preferences of the enumerators on a formula
+
+The bindings of mathsat expose no decision counter, so the number of partial models found by the
+partial enumerators stands for the decisions saved by a preference.
+
+usage: python benchmark_branching.py [formula.smt2] [--procs N]
+"""
+
+import argparse
+import pathlib
+import time
+
+from enumerators.formula import read_phi
+from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+
+DEFAULT_FORMULA = pathlib.Path(__file__).parent.parent / "tests" / "items" / "rng.smt"
+
+CONFIGURATIONS = [
+    ("total", MathSATTotalEnumerator, {}),
+    ("total+atoms", MathSATTotalEnumerator, {"prefer_projected_atoms": True}),
+    ("partial", MathSATExtendedPartialEnumerator, {}),
+    ("partial+atoms", MathSATExtendedPartialEnumerator, {"prefer_projected_atoms": True}),
+    ("partial+labels", MathSATExtendedPartialEnumerator, {"prefer_cnf_labels": True}),
+    (
+        "partial+atoms+labels",
+        MathSATExtendedPartialEnumerator,
+        {"prefer_projected_atoms": True, "prefer_cnf_labels": True},
+    ),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("formula", nargs="?", default=str(DEFAULT_FORMULA))
+    parser.add_argument("--procs", type=int, default=1, help="parallel processes of the partial enumerator")
+    args = parser.parse_args()
+
+    phi = read_phi(args.formula)
+    print(f"{'configuration':<22} {'time (s)':>10} {'partial':>8} {'models':>8} {'lemmas':>8}")
+    for name, enumerator_cls, options in CONFIGURATIONS:
+        logger = {}
+        if enumerator_cls is MathSATExtendedPartialEnumerator:
+            options = {"parallel_procs": args.procs, **options}
+        enumerator = enumerator_cls(computation_logger=logger, project_on_theory_atoms=True, **options)
+        start_time = time.time()
+        enumerator.check_all_sat(phi)
+        elapsed = time.time() - start_time
+        partial = logger.get("Partial models", "-")
+        print(
+            f"{name:<22} {elapsed:>10.3f} {partial:>8} {enumerator.get_models_count():>8} "
+            f"{len(enumerator.get_theory_lemmas()):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
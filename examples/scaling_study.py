@@ -0,0 +1,152 @@
+"""measures how the enumerators scale with the size of random formulas and with parallel_procs
+
+For each formula, enumerator and number of processes, the enumeration is repeated and its median
+time is compared with the one with a single process: the speedup and the efficiency (speedup per
+process) are fitted with Amdahl's law, speedup(p) = 1 / (1 - f + f / p), where f is the fraction
+of the run which is parallel. The CSV written to the output (stdout by default) has a row per
+measurement, with the fitted fraction and speedup, ready to be plotted.
+
+usage: python scaling_study.py [--theory LRA] [--depths 4 5] [--atoms 10 20] [--procs 1 2 4 8] [--output study.csv]
+"""
+
+import argparse
+import csv
+import multiprocessing
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from enumerators.generator import THEORIES, FormulaParameters, random_formula
+from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+
+# the enumerators which do not run in parallel are only measured with a single process
+ENUMERATORS = [
+    ("total", MathSATTotalEnumerator, False),
+    ("partial", MathSATExtendedPartialEnumerator, True),
+]
+
+FIELDS = [
+    "enumerator",
+    "formula",
+    "theory",
+    "depth",
+    "atoms",
+    "procs",
+    "time",
+    "models",
+    "lemmas",
+    "speedup",
+    "efficiency",
+    "parallel_fraction",
+    "amdahl_speedup",
+]
+
+
+def fit_amdahl(speedups: Dict[int, float]) -> float:
+    """returns the parallel fraction f which best fits the speedups, by least squares on 1 / speedup
+
+    Amdahl's law gives 1 / speedup(p) - 1 = -f * (1 - 1 / p), which is linear in f.
+    """
+    numerator = 0.0
+    denominator = 0.0
+    for procs, speedup in speedups.items():
+        x = 1 - 1 / procs
+        numerator -= (1 / speedup - 1) * x
+        denominator += x * x
+    if denominator == 0:
+        return 0.0
+    return min(max(numerator / denominator, 0.0), 1.0)
+
+
+def amdahl_speedup(parallel_fraction: float, procs: int) -> float:
+    """returns the speedup predicted by Amdahl's law"""
+    return 1 / (1 - parallel_fraction + parallel_fraction / procs)
+
+
+def measure(enumerator_cls, options: dict, phi, repeats: int) -> dict:
+    """returns the median time of the enumeration of phi, and its models and lemmas"""
+    times = []
+    for _ in range(repeats):
+        enumerator = enumerator_cls(project_on_theory_atoms=True, **options)
+        start_time = time.perf_counter()
+        enumerator.check_all_sat(phi)
+        times.append(time.perf_counter() - start_time)
+    return {
+        "time": statistics.median(times),
+        "models": enumerator.get_models_count(),
+        "lemmas": len(enumerator.get_theory_lemmas()),
+    }
+
+
+def study(params: FormulaParameters, procs_list: List[int], repeats: int) -> List[dict]:
+    """returns the rows of the study of a formula"""
+    phi = random_formula(params)
+    rows = []
+    for name, enumerator_cls, is_parallel in ENUMERATORS:
+        measurements = {}
+        for procs in procs_list if is_parallel else [1]:
+            options = {"parallel_procs": procs} if is_parallel else {}
+            measurements[procs] = measure(enumerator_cls, options, phi, repeats)
+            print(f"{name} {params.name()} procs={procs}: {measurements[procs]['time']:.3f}s", file=sys.stderr)
+
+        sequential_time = measurements[min(measurements)]["time"]
+        speedups = {procs: sequential_time / m["time"] for procs, m in measurements.items()}
+        parallel_fraction = fit_amdahl(speedups)
+        for procs, measurement in measurements.items():
+            rows.append(
+                {
+                    "enumerator": name,
+                    "formula": params.name(),
+                    "theory": params.theory,
+                    "depth": params.depth,
+                    "atoms": params.bool_vars + params.theory_atoms,
+                    "procs": procs,
+                    **measurement,
+                    "speedup": speedups[procs],
+                    "efficiency": speedups[procs] / procs,
+                    "parallel_fraction": parallel_fraction,
+                    "amdahl_speedup": amdahl_speedup(parallel_fraction, procs),
+                }
+            )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--theory", choices=THEORIES, default="LRA")
+    parser.add_argument("--depths", type=int, nargs="+", default=[4, 5])
+    parser.add_argument("--atoms", type=int, nargs="+", default=[10, 20], help="Boolean and theory atoms")
+    parser.add_argument("--procs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--partitions", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="CSV file, stdout if omitted")
+    args = parser.parse_args()
+
+    procs_list = sorted({p for p in [1, *args.procs] if p <= multiprocessing.cpu_count()})
+    output = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames=FIELDS)
+        writer.writeheader()
+        for depth in args.depths:
+            for atoms in args.atoms:
+                params = FormulaParameters(
+                    bool_vars=atoms // 2,
+                    theory_vars=max(atoms // 2, args.partitions),
+                    theory_atoms=atoms - atoms // 2,
+                    depth=depth,
+                    theory=args.theory,
+                    partitions=args.partitions,
+                    seed=args.seed,
+                )
+                writer.writerows(study(params, procs_list, args.repeats))
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""measures the latency and throughput of an enumeration server under concurrent clients
+
+Each client submits its share of random formulas (see generator) with random priorities, one job at
+a time, and the latency of each job (from its submission to its result) and of its first batch of
+lemmas are reported, with the throughput of the server. With --cold, the same formulas are also
+enumerated by a new Python process each, as a pipeline without the server would do.
+
+usage: python server_load_test.py [--socket /tmp/enumerators.sock] [--start-server] [--clients 4] [--jobs 40] [--cold]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from pysmt.environment import Environment
+
+from enumerators.generator import THEORIES, FormulaParameters, random_formula
+from enumerators.server import protocol
+from enumerators.server.client import EnumerationClient, formula_to_smtlib
+
+COLD_SCRIPT = """
+import sys
+from enumerators.formula import read_phi
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+MathSATTotalEnumerator().check_all_sat(read_phi(sys.argv[1]))
+"""
+
+
+def make_formulas(args) -> List[str]:
+    """returns the SMT-LIB2 scripts of the formulas of the test"""
+    env = Environment()
+    formulas = []
+    for seed in range(args.jobs):
+        params = FormulaParameters(
+            bool_vars=args.atoms // 2,
+            theory_vars=args.atoms // 2,
+            theory_atoms=args.atoms - args.atoms // 2,
+            depth=args.depth,
+            theory=args.theory,
+            seed=seed,
+        )
+        formulas.append(formula_to_smtlib(random_formula(params, env)))
+    return formulas
+
+
+def run_client(socket_path: str, formulas: List[str], enumerator: str, seed: int, rows: List[Dict]) -> None:
+    rng = random.Random(seed)
+    with EnumerationClient(socket_path) as client:
+        for formula in formulas:
+            submitted = time.perf_counter()
+            first_lemmas = []
+
+            def on_event(message: Dict) -> None:
+                if message["type"] == protocol.LEMMAS and not first_lemmas:
+                    first_lemmas.append(time.perf_counter() - submitted)
+
+            result = client.enumerate(
+                formula, on_event=on_event, enumerator=enumerator, priority=rng.randint(0, 3), progress_interval=None
+            )
+            rows.append(
+                {
+                    "latency": time.perf_counter() - submitted,
+                    "first_lemmas": first_lemmas[0] if first_lemmas else None,
+                    "queue_time": result.queue_time,
+                    "time": result.time,
+                }
+            )
+
+
+def wait_for_socket(path: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("the server did not start")
+        time.sleep(0.1)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def report(name: str, latencies: List[float], elapsed: float) -> None:
+    print(
+        f"{name:<8} jobs={len(latencies)} throughput={len(latencies) / elapsed:.2f} jobs/s "
+        f"p50={statistics.median(latencies):.3f}s p95={percentile(latencies, 0.95):.3f}s max={max(latencies):.3f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=os.path.join(tempfile.gettempdir(), "enumerators.sock"))
+    parser.add_argument("--start-server", action="store_true", help="start a server for the test")
+    parser.add_argument("--max-concurrent", type=int, default=2, help="jobs run at once by the started server")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=40, help="jobs of all the clients")
+    parser.add_argument("--enumerator", default=protocol.DEFAULT_ENUMERATOR)
+    parser.add_argument("--theory", choices=THEORIES, default="LRA")
+    parser.add_argument("--atoms", type=int, default=12)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--cold", action="store_true", help="also run a process per formula")
+    args = parser.parse_args()
+
+    formulas = make_formulas(args)
+    server = None
+    if args.start_server:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "enumerators.server",
+                "--socket",
+                args.socket,
+                "--max-concurrent",
+                str(args.max_concurrent),
+            ]
+        )
+        wait_for_socket(args.socket, server)
+    try:
+        rows: List[Dict] = []
+        start_time = time.perf_counter()
+        threads = [
+            threading.Thread(
+                target=run_client, args=(args.socket, formulas[i :: args.clients], args.enumerator, i, rows)
+            )
+            for i in range(args.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report("server", [row["latency"] for row in rows], time.perf_counter() - start_time)
+        first_lemmas = [row["first_lemmas"] for row in rows if row["first_lemmas"] is not None]
+        if first_lemmas:
+            print(f"{'':<8} first lemmas p50={statistics.median(first_lemmas):.3f}s", end=" ")
+        print(f"queue p50={statistics.median(row['queue_time'] for row in rows):.3f}s")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.cold:
+        latencies = []
+        start_time = time.perf_counter()
+        with tempfile.TemporaryDirectory() as directory:
+            for index, formula in enumerate(formulas):
+                path = os.path.join(directory, f"{index}.smt2")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(formula)
+                job_start = time.perf_counter()
+                subprocess.run([sys.executable, "-c", COLD_SCRIPT, path], check=True)
+                latencies.append(time.perf_counter() - job_start)
+        report("cold", latencies, time.perf_counter() - start_time)
+
+
+if __name__ == "__main__":
+    main()
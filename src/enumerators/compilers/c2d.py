@@ -0,0 +1,26 @@
+"""this module runs the c2d compiler"""
+
+import os
+import shutil
+from typing import List
+
+from enumerators.compilers.compiler import KnowledgeCompiler
+from enumerators.constants import C2D_COMMAND as _C2D_COMMAND
+
+
+class C2DCompiler(KnowledgeCompiler):
+    """compiles DIMACS files into d-DNNF with c2d
+
+    c2d always writes its output next to the input, as <cnf_path>.nnf, which is then moved to the requested path.
+    """
+
+    def __init__(self, command: str = _C2D_COMMAND, timeout: float | None = None):
+        super().__init__(command, timeout)
+
+    def get_arguments(self, cnf_path: str, output_path: str) -> List[str]:
+        return [self.command, "-in", cnf_path, "-dt_method", "4"]
+
+    def _collect_output(self, cnf_path: str, output_path: str) -> None:
+        nnf_path = cnf_path + ".nnf"
+        if os.path.isfile(nnf_path) and os.path.abspath(nnf_path) != os.path.abspath(output_path):
+            shutil.move(nnf_path, output_path)
@@ -0,0 +1,108 @@
+"""this module defines the interface to external knowledge compilers which read DIMACS CNF"""
+
+import os
+import subprocess
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Iterable, List
+
+from pysmt.fnode import FNode
+
+from enumerators.export.dimacs import write_dimacs
+from enumerators.util.atom_table import AtomTable
+from enumerators.util.custom_exceptions import CompilerException
+
+
+class KnowledgeCompiler(ABC):
+    """an external compiler, run as a subprocess on a DIMACS file
+
+    Args:
+        command (str): the path of the compiler binary
+        timeout (float | None) [None]: the timeout in seconds, None for no timeout
+    """
+
+    def __init__(self, command: str, timeout: float | None = None):
+        if not os.path.isfile(command):
+            raise FileNotFoundError(f"The compiler binary {command} is missing")
+        if not os.access(command, os.X_OK):
+            raise PermissionError(f"The compiler binary {command} is not executable")
+        self.command = command
+        self.timeout = timeout
+
+    @abstractmethod
+    def get_arguments(self, cnf_path: str, output_path: str) -> List[str]:
+        """returns the command line which compiles cnf_path into output_path"""
+        raise NotImplementedError()
+
+    def _collect_output(self, cnf_path: str, output_path: str) -> None:
+        """moves the output of the compiler to output_path, if the compiler cannot choose it"""
+
+    def compile_dimacs(self, cnf_path: str, output_path: str) -> str:
+        """runs the compiler on a DIMACS file
+
+        Args:
+            cnf_path (str): the DIMACS file
+            output_path (str): the file where the compiled formula is saved
+
+        Returns:
+            str: the standard output of the compiler
+
+        Raises:
+            CompilerException: if the compiler fails, times out or does not produce output_path
+        """
+        arguments = self.get_arguments(cnf_path, output_path)
+        try:
+            result = subprocess.run(arguments, capture_output=True, text=True, timeout=self.timeout, check=False)
+        except subprocess.TimeoutExpired as e:
+            raise CompilerException(f"{self.command} timed out after {self.timeout} seconds") from e
+        if result.returncode != 0:
+            raise CompilerException(
+                f"{self.command} exited with code {result.returncode}: {result.stderr.strip()}"
+            )
+        self._collect_output(cnf_path, output_path)
+        if not os.path.isfile(output_path):
+            raise CompilerException(f"{self.command} did not produce {output_path}")
+        return result.stdout
+
+    def compile(
+        self,
+        phi: FNode,
+        output_path: str,
+        lemmas: Iterable[FNode] = (),
+        projected_atoms: Iterable[FNode] | None = None,
+        atom_map_path: str | None = None,
+    ) -> AtomTable:
+        """compiles the Boolean abstraction of phi and its lemmas
+
+        The DIMACS file is written to a temporary directory, which is removed afterwards.
+
+        Args:
+            phi (FNode): a pysmt formula
+            output_path (str): the file where the compiled formula is saved
+            lemmas (Iterable[FNode]) [()]: the lemmas conjoined to phi
+            projected_atoms (Iterable[FNode] | None) [None]: the atoms onto which the compiler projects
+            atom_map_path (str | None) [None]: if given, the map from variable ids to atoms is saved here
+
+        Returns:
+            AtomTable: the table which maps the variables of the compiled formula to the atoms
+        """
+        with tempfile.TemporaryDirectory(prefix="tlemmas_cnf_") as tmp_dir:
+            cnf_path = os.path.join(tmp_dir, "phi.cnf")
+            table = write_dimacs(phi, cnf_path, lemmas, projected_atoms, atom_map_path)
+            self.compile_dimacs(cnf_path, output_path)
+        return table
+
+
+class ExternalCompiler(KnowledgeCompiler):
+    """a compiler whose command line is given as a template
+
+    Each argument may contain the placeholders {cnf} and {output}, which are replaced by the
+    input and output paths, e.g. ["-in", "{cnf}", "-out={output}"].
+    """
+
+    def __init__(self, command: str, arguments: List[str], timeout: float | None = None):
+        super().__init__(command, timeout)
+        self.arguments = list(arguments)
+
+    def get_arguments(self, cnf_path: str, output_path: str) -> List[str]:
+        return [self.command] + [arg.format(cnf=cnf_path, output=output_path) for arg in self.arguments]
@@ -0,0 +1,19 @@
+"""this module runs the d4 compiler"""
+
+from typing import List
+
+from enumerators.compilers.compiler import KnowledgeCompiler
+from enumerators.constants import D4_COMMAND as _D4_COMMAND
+
+
+class D4Compiler(KnowledgeCompiler):
+    """compiles DIMACS files into d-DNNF with d4
+
+    Projected compilation uses the "c p show" comment written by write_dimacs.
+    """
+
+    def __init__(self, command: str = _D4_COMMAND, timeout: float | None = None):
+        super().__init__(command, timeout)
+
+    def get_arguments(self, cnf_path: str, output_path: str) -> List[str]:
+        return [self.command, cnf_path, "-dDNNF", f"-out={output_path}"]
@@ -0,0 +1,227 @@
+"""this module implements a compact binary format for lemmas and models
+
+The file starts with a header (MAGIC, version, kind) followed by a sequence of records:
+
+- atom records (ATOM_RECORD): a u32 length and an utf-8 SMT-LIB2 snippet which declares the new
+  symbols and asserts the new atoms, in order of id (see AtomTable)
+- literal-set records (SETS_RECORD): two u32 (number of sets, number of literals), the int32 size
+  of each set and then the int32 signed atom ids of all the literals
+
+All integers are little-endian. Atom records always precede the sets which refer to their atoms,
+so files can be written while lemmas are produced and read back with a single SMT-LIB parse.
+"""
+
+import struct
+import sys
+from array import array
+from io import StringIO
+from typing import BinaryIO, Iterable, List, Set, Tuple
+
+from pysmt.fnode import FNode
+from pysmt.shortcuts import get_env
+from pysmt.smtlib.parser import SmtLibParser
+from pysmt.smtlib.printers import SmtPrinter, quote
+
+from enumerators.formula import get_clause_literals
+from enumerators.util.atom_table import AtomTable
+from enumerators.util.custom_exceptions import FormulaException
+
+MAGIC = b"TLSB"
+VERSION = 1
+LEMMAS_KIND = 0
+MODELS_KIND = 1
+ATOM_RECORD = b"A"
+SETS_RECORD = b"S"
+
+_HEADER = struct.Struct("<4sBB2x")
+_U32 = struct.Struct("<I")
+_SETS_HEADER = struct.Struct("<II")
+
+
+def _to_le_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le_bytes(data, typecode: str = "i") -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class BinaryWriter:
+    """streams sets of literals (lemmas or models) to a binary file
+
+    Sets are buffered and written in blocks of block_size sets.
+    """
+
+    def __init__(self, path: str | BinaryIO, kind: int = LEMMAS_KIND, block_size: int = 4096):
+        if kind not in (LEMMAS_KIND, MODELS_KIND):
+            raise ValueError("kind must be LEMMAS_KIND or MODELS_KIND")
+        if isinstance(path, str):
+            self._stream = open(path, "wb")
+            self._owns_stream = True
+        else:
+            self._stream = path
+            self._owns_stream = False
+        self.kind = kind
+        self.block_size = block_size
+        self.atom_table = AtomTable()
+        self._written_atoms = 0
+        self._declared: Set[FNode] = set()
+        self._sizes = array("i")
+        self._literals = array("i")
+        self._stream.write(_HEADER.pack(MAGIC, VERSION, kind))
+
+    def __enter__(self) -> "BinaryWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write_literal_sets(self, literal_sets: Iterable[Iterable[FNode]]) -> None:
+        """writes a batch of sets of literals"""
+        encode_literals = self.atom_table.encode_literals
+        for literals in literal_sets:
+            encoded = encode_literals(literals)
+            self._sizes.append(len(encoded))
+            self._literals.extend(encoded)
+            if len(self._sizes) >= self.block_size:
+                self.flush()
+
+    def write_lemmas(self, lemmas: Iterable[FNode]) -> None:
+        """writes a batch of lemmas, which must be clauses
+
+        Raises:
+            FormulaException: if a lemma is not a clause
+        """
+        if self.kind != LEMMAS_KIND:
+            raise ValueError("Cannot write lemmas to a models file")
+        self.write_literal_sets(get_clause_literals(lemma) for lemma in lemmas)
+
+    def write_models(self, models: Iterable[Iterable[FNode]]) -> None:
+        """writes a batch of models, as sets of literals"""
+        if self.kind != MODELS_KIND:
+            raise ValueError("Cannot write models to a lemmas file")
+        self.write_literal_sets(models)
+
+    def _write_new_atoms(self) -> None:
+        if self._written_atoms == len(self.atom_table):
+            return
+        out = []
+        for atom in self.atom_table.atoms[self._written_atoms :]:
+            for symbol in atom.get_free_variables():
+                if symbol not in self._declared:
+                    self._declared.add(symbol)
+                    out.append(f"(declare-fun {quote(symbol.symbol_name())} {symbol.symbol_type().as_smtlib()})")
+            buf = StringIO()
+            SmtPrinter(buf).printer(atom)
+            out.append(f"(assert {buf.getvalue()})")
+        data = "\n".join(out).encode("utf-8")
+        self._stream.write(ATOM_RECORD + _U32.pack(len(data)) + data)
+        self._written_atoms = len(self.atom_table)
+
+    def flush(self) -> None:
+        """writes the buffered sets and the atoms they refer to"""
+        self._write_new_atoms()
+        if len(self._sizes) > 0:
+            self._stream.write(SETS_RECORD + _SETS_HEADER.pack(len(self._sizes), len(self._literals)))
+            self._stream.write(_to_le_bytes(self._sizes))
+            self._stream.write(_to_le_bytes(self._literals))
+            self._sizes = array("i")
+            self._literals = array("i")
+        self._stream.flush()
+
+    def close(self) -> None:
+        """flushes the file, closing the underlying stream if it was opened by the writer"""
+        self.flush()
+        if self._owns_stream:
+            self._stream.close()
+
+
+def read_binary(path: str, env=None) -> Tuple[int, AtomTable, List[array]]:
+    """reads a file written by BinaryWriter
+
+    Args:
+        path (str): the name of the file
+        env [None]: the pysmt environment in which atoms are created
+
+    Returns:
+        Tuple[int, AtomTable, List[array]]: the kind of the file, the table of its atoms and
+            the sets of literals, as arrays of signed atom ids
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise FormulaException(f"{path} is not a binary lemmas file")
+    magic, version, kind = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise FormulaException(f"{path} is not a binary lemmas file of version {VERSION}")
+
+    atoms_text = []
+    literal_sets = []
+    pos = _HEADER.size
+    view = memoryview(data)
+    while pos < len(data):
+        tag = data[pos : pos + 1]
+        pos += 1
+        if tag == ATOM_RECORD:
+            (length,) = _U32.unpack_from(data, pos)
+            pos += _U32.size
+            atoms_text.append(bytes(view[pos : pos + length]).decode("utf-8"))
+            pos += length
+        elif tag == SETS_RECORD:
+            n_sets, n_literals = _SETS_HEADER.unpack_from(data, pos)
+            pos += _SETS_HEADER.size
+            sizes = _from_le_bytes(view[pos : pos + 4 * n_sets])
+            pos += 4 * n_sets
+            literals = _from_le_bytes(view[pos : pos + 4 * n_literals])
+            pos += 4 * n_literals
+            start = 0
+            for size in sizes:
+                literal_sets.append(literals[start : start + size])
+                start += size
+        else:
+            raise FormulaException(f"Corrupted record in {path} at offset {pos - 1}")
+
+    env = env if env is not None else get_env()
+    script = SmtLibParser(environment=env).get_script(StringIO("\n".join(atoms_text)))
+    atoms = [cmd.args[0] for cmd in script.commands if cmd.name == "assert"]
+    return kind, AtomTable(atoms, env), literal_sets
+
+
+def read_binary_lemmas(path: str, env=None) -> List[FNode]:
+    """reads the lemmas of a file written by BinaryWriter.write_lemmas
+
+    Args:
+        path (str): the name of the file
+        env [None]: the pysmt environment in which lemmas are created
+
+    Returns:
+        List[FNode]: the lemmas, as clauses
+    """
+    kind, table, literal_sets = read_binary(path, env)
+    if kind != LEMMAS_KIND:
+        raise FormulaException(f"{path} does not contain lemmas")
+    mgr = table.env.formula_manager
+    return [mgr.Or(table.decode_literals(literals)) for literals in literal_sets]
+
+
+def read_binary_models(path: str, env=None) -> List[Set[FNode]]:
+    """reads the models of a file written by BinaryWriter.write_models
+
+    Args:
+        path (str): the name of the file
+        env [None]: the pysmt environment in which models are created
+
+    Returns:
+        List[Set[FNode]]: the models, as sets of literals
+    """
+    kind, table, literal_sets = read_binary(path, env)
+    if kind != MODELS_KIND:
+        raise FormulaException(f"{path} does not contain models")
+    return [set(table.decode_literals(literals)) for literals in literal_sets]
@@ -0,0 +1,252 @@
+"""this module exports the Boolean abstraction of a formula and its lemmas to DIMACS CNF
+
+The formula is CNF-ized with the polarity-aware Tseitin encoding (Plaisted-Greenbaum): each
+connective gets a fresh label variable, defined only in the polarities in which it occurs.
+The encoding works directly on integer variable ids, without building intermediate pysmt
+formulas. Atoms (theory atoms and Boolean variables) are numbered by AtomTable, labels are
+numbered in a separate range and moved after the atoms when the file is written, so that
+variables 1..n are exactly the atoms of the abstraction regardless of the order in which
+formulas are added. Lemmas, which are clauses, are written as they are, without labels.
+"""
+
+from array import array
+from typing import Dict, Iterable, List, TextIO
+
+from pysmt.fnode import FNode
+from pysmt.smtlib.printers import to_smtlib
+
+from enumerators.util.atom_table import AtomTable
+from enumerators.util.custom_exceptions import UnsupportedNodeException
+
+POSITIVE = 1
+NEGATIVE = 2
+BOTH = POSITIVE | NEGATIVE
+
+# labels are numbered from _LABELS_BASE + 1 until they are written
+_LABELS_BASE = 1 << 30
+
+
+def _flip(polarity: int) -> int:
+    return ((polarity & POSITIVE) << 1) | ((polarity & NEGATIVE) >> 1)
+
+
+class DimacsEncoder:
+    """incrementally encodes formulas into a set of clauses over integer variables"""
+
+    def __init__(self, atom_table: AtomTable | None = None):
+        self.atom_table = atom_table if atom_table is not None else AtomTable()
+        # clauses, as a flat array of literals where each clause is terminated by 0
+        self.clauses = array("i")
+        self.clauses_count = 0
+        self._labels: Dict[FNode, int] = {}
+        self._encoded: Dict[FNode, int] = {}
+        self._labels_count = 0
+        self._true_label = 0
+
+    def get_vars_count(self) -> int:
+        """returns the number of variables used by the clauses"""
+        return len(self.atom_table) + self._labels_count
+
+    def add_atoms(self, atoms: Iterable[FNode]) -> None:
+        """numbers the atoms in the given order, e.g. to give the projected atoms the lowest ids"""
+        for atom in atoms:
+            self.atom_table.get_id(atom)
+
+    def _add_clause(self, literals: Iterable[int]) -> None:
+        self.clauses.extend(literals)
+        self.clauses.append(0)
+        self.clauses_count += 1
+
+    def _is_atom(self, formula: FNode) -> bool:
+        return not (formula.is_bool_op() or formula.is_ite() or formula.is_bool_constant())
+
+    def _new_label(self) -> int:
+        self._labels_count += 1
+        return _LABELS_BASE + self._labels_count
+
+    def _literal(self, formula: FNode) -> int:
+        """returns the literal representing formula, which must be already encoded"""
+        negated = False
+        while formula.is_not():
+            negated = not negated
+            formula = formula.arg(0)
+        if formula.is_bool_constant():
+            if self._true_label == 0:
+                self._true_label = self._new_label()
+                self._add_clause([self._true_label])
+            lit = self._true_label if formula.is_true() else -self._true_label
+        elif self._is_atom(formula):
+            lit = self.atom_table.get_id(formula)
+        else:
+            lit = self._labels.get(formula)
+            if lit is None:
+                lit = self._new_label()
+                self._labels[formula] = lit
+        return -lit if negated else lit
+
+    def _children(self, formula: FNode, polarity: int):
+        # quantifiers are Boolean operators for pysmt, they would be labelled as connectives
+        if formula.is_quantifier():
+            raise UnsupportedNodeException("Quantifiers are yet to be supported")
+        if formula.is_and() or formula.is_or():
+            return [(arg, polarity) for arg in formula.args()]
+        if formula.is_not():
+            return [(formula.arg(0), _flip(polarity))]
+        if formula.is_implies():
+            return [(formula.arg(0), _flip(polarity)), (formula.arg(1), polarity)]
+        if formula.is_iff():
+            return [(formula.arg(0), BOTH), (formula.arg(1), BOTH)]
+        if formula.is_ite():
+            return [(formula.arg(0), BOTH), (formula.arg(1), polarity), (formula.arg(2), polarity)]
+        return []
+
+    def _define(self, formula: FNode, polarity: int) -> None:
+        """emits the clauses defining the label of formula in the given polarities"""
+        label = self._literal(formula)
+        if formula.is_and() or formula.is_or() or formula.is_implies():
+            if formula.is_implies():
+                args = [-self._literal(formula.arg(0)), self._literal(formula.arg(1))]
+                is_and = False
+            else:
+                args = [self._literal(arg) for arg in formula.args()]
+                is_and = formula.is_and()
+            if is_and:
+                if polarity & POSITIVE:
+                    for arg in args:
+                        self._add_clause([-label, arg])
+                if polarity & NEGATIVE:
+                    self._add_clause([label] + [-arg for arg in args])
+            else:
+                if polarity & POSITIVE:
+                    self._add_clause([-label] + args)
+                if polarity & NEGATIVE:
+                    for arg in args:
+                        self._add_clause([label, -arg])
+        elif formula.is_iff():
+            left, right = self._literal(formula.arg(0)), self._literal(formula.arg(1))
+            if polarity & POSITIVE:
+                self._add_clause([-label, -left, right])
+                self._add_clause([-label, left, -right])
+            if polarity & NEGATIVE:
+                self._add_clause([label, left, right])
+                self._add_clause([label, -left, -right])
+        elif formula.is_ite():
+            cond, then, other = (self._literal(arg) for arg in formula.args())
+            if polarity & POSITIVE:
+                self._add_clause([-label, -cond, then])
+                self._add_clause([-label, cond, other])
+            if polarity & NEGATIVE:
+                self._add_clause([label, -cond, -then])
+                self._add_clause([label, cond, -other])
+        else:
+            raise UnsupportedNodeException(f"Unsupported node {formula.node_type()} in CNF encoding")
+
+    def _encode(self, formula: FNode, polarity: int) -> int:
+        """encodes formula (and its subformulas) in the given polarity, returning its literal"""
+        stack = [(formula, polarity, False)]
+        while stack:
+            node, pol, expanded = stack.pop()
+            if node.is_not():
+                stack.append((node.arg(0), _flip(pol), False))
+                continue
+            if self._is_atom(node) or node.is_bool_constant():
+                continue
+            missing = pol & ~self._encoded.get(node, 0)
+            if missing == 0:
+                continue
+            if not expanded:
+                stack.append((node, missing, True))
+                stack.extend((child, child_pol, False) for child, child_pol in self._children(node, missing))
+                continue
+            self._define(node, missing)
+            self._encoded[node] = self._encoded.get(node, 0) | missing
+        return self._literal(formula)
+
+    def add_formula(self, formula: FNode) -> None:
+        """asserts formula, top-level conjunctions and disjunctions are not labelled"""
+        stack = [formula]
+        while stack:
+            node = stack.pop()
+            if node.is_and():
+                stack.extend(node.args())
+            elif node.is_or():
+                self._add_clause([self._encode(arg, POSITIVE) for arg in node.args()])
+            elif node.is_true():
+                continue
+            else:
+                self._add_clause([self._encode(node, POSITIVE)])
+
+    def add_lemmas(self, lemmas: Iterable[FNode]) -> None:
+        """asserts lemmas, clauses are added as they are"""
+        for lemma in lemmas:
+            self.add_formula(lemma)
+
+    def write(self, stream: TextIO, projected_atoms: Iterable[FNode] | None = None) -> None:
+        """writes the clauses in DIMACS format
+
+        Args:
+            stream (TextIO): the output stream
+            projected_atoms (Iterable[FNode] | None) [None]: if given, a "c p show" comment lists their variables
+        """
+        stream.write(f"c atoms {len(self.atom_table)}\n")
+        if projected_atoms is not None:
+            ids = " ".join(str(self.atom_table.ids[atom]) for atom in projected_atoms)
+            stream.write(f"c p show {ids} 0\n")
+        stream.write(f"p cnf {self.get_vars_count()} {self.clauses_count}\n")
+        shift = len(self.atom_table) - _LABELS_BASE
+        out: List[str] = []
+        clause: List[str] = []
+        for lit in self.clauses:
+            if lit == 0:
+                clause.append("0\n")
+                out.append(" ".join(clause))
+                clause = []
+                if len(out) >= 4096:
+                    stream.write("".join(out))
+                    out = []
+            elif lit > _LABELS_BASE:
+                clause.append(str(lit + shift))
+            elif lit < -_LABELS_BASE:
+                clause.append(str(lit - shift))
+            else:
+                clause.append(str(lit))
+        stream.write("".join(out))
+
+    def write_atom_map(self, stream: TextIO) -> None:
+        """writes one line for each atom, with its variable id and its SMT-LIB representation"""
+        for atom_id, atom in enumerate(self.atom_table.atoms, start=1):
+            stream.write(f"{atom_id} {to_smtlib(atom, daggify=False)}\n")
+
+
+def write_dimacs(
+    phi: FNode,
+    cnf_path: str,
+    lemmas: Iterable[FNode] = (),
+    projected_atoms: Iterable[FNode] | None = None,
+    atom_map_path: str | None = None,
+) -> AtomTable:
+    """writes the Boolean abstraction of phi and its lemmas to a DIMACS CNF file
+
+    Args:
+        phi (FNode): a pysmt formula
+        cnf_path (str): the name of the DIMACS file
+        lemmas (Iterable[FNode]) [()]: the lemmas conjoined to phi
+        projected_atoms (Iterable[FNode] | None) [None]: if given, these atoms get the lowest ids
+            and are listed in a "c p show" comment, for projected compilation
+        atom_map_path (str | None) [None]: if given, the map from ids to atoms is written to this file
+
+    Returns:
+        AtomTable: the table which maps the variables of the CNF to the atoms
+    """
+    encoder = DimacsEncoder()
+    if projected_atoms is not None:
+        projected_atoms = list(projected_atoms)
+        encoder.add_atoms(projected_atoms)
+    encoder.add_formula(phi)
+    encoder.add_lemmas(lemmas)
+    with open(cnf_path, "w", encoding="utf-8") as f:
+        encoder.write(f, projected_atoms)
+    if atom_map_path is not None:
+        with open(atom_map_path, "w", encoding="utf-8") as f:
+            encoder.write_atom_map(f)
+    return encoder.atom_table
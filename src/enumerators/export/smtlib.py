@@ -0,0 +1,182 @@
+"""this module streams lemmas and models to SMT-LIB2 scripts"""
+
+from io import StringIO
+from typing import Dict, Iterable, List, Set, TextIO
+
+from pysmt.fnode import FNode
+from pysmt.smtlib.parser import SmtLibParser
+from pysmt.smtlib.printers import SmtDagPrinter, SmtPrinter, quote
+
+from enumerators.formula import get_clause_literals
+from enumerators.util.custom_exceptions import FormulaException
+
+# SMT-LIB2 reserves the symbols starting with "." or "@" to the solvers
+ATOM_NAME_TEMPLATE = "__a%d"
+MODEL_NAME_TEMPLATE = "__m%d"
+_RESERVED_PREFIXES = (ATOM_NAME_TEMPLATE.split("%")[0], MODEL_NAME_TEMPLATE.split("%")[0])
+
+
+class SmtLibWriter:
+    """streams formulas to an SMT-LIB2 script as soon as they are produced
+
+    Each atom is printed only once, in a define-fun named ATOM_NAME_TEMPLATE % id, and every
+    lemma or model refers to its atoms by name. Since lemmas share most of their atoms, this
+    keeps both the output and the printing time proportional to the number of literals.
+    Formulas which are not clauses are printed with let-sharing of their common subterms.
+
+    Lemmas are asserted, so that a script with phi and its lemmas is equivalent to phi.
+    Models are defined as Boolean constants named MODEL_NAME_TEMPLATE % index. The variables of the
+    formulas cannot have names starting like these templates.
+    """
+
+    def __init__(self, stream: TextIO | str, logic: str | None = None):
+        if isinstance(stream, str):
+            self._stream = open(stream, "w", encoding="utf-8")
+            self._owns_stream = True
+        else:
+            self._stream = stream
+            self._owns_stream = False
+        self._declared: Set[FNode] = set()
+        self._atom_names: Dict[FNode, str] = {}
+        self._models_count = 0
+        if logic is not None:
+            self._stream.write(f"(set-logic {logic})\n")
+
+    def __enter__(self) -> "SmtLibWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _declare(self, formula: FNode, out: List[str]) -> None:
+        for symbol in formula.get_free_variables():
+            if symbol not in self._declared:
+                if symbol.symbol_name().startswith(_RESERVED_PREFIXES):
+                    raise FormulaException(f"Symbol {symbol.symbol_name()} clashes with the names of atoms and models")
+                self._declared.add(symbol)
+                out.append(f"(declare-fun {quote(symbol.symbol_name())} {symbol.symbol_type().as_smtlib()})\n")
+
+    def _atom_name(self, atom: FNode, out: List[str]) -> str:
+        name = self._atom_names.get(atom)
+        if name is None:
+            self._declare(atom, out)
+            name = ATOM_NAME_TEMPLATE % len(self._atom_names)
+            self._atom_names[atom] = name
+            buf = StringIO()
+            SmtPrinter(buf).printer(atom)
+            out.append(f"(define-fun {name} () Bool {buf.getvalue()})\n")
+        return name
+
+    def _literal(self, literal: FNode, out: List[str]) -> str:
+        if literal.is_not():
+            return f"(not {self._atom_name(literal.arg(0), out)})"
+        return self._atom_name(literal, out)
+
+    def _literals(self, literals: Iterable[FNode], connective: str, out: List[str]) -> str:
+        names = [self._literal(literal, out) for literal in literals]
+        if len(names) == 1:
+            return names[0]
+        if len(names) == 0:
+            return "false" if connective == "or" else "true"
+        return f"({connective} {' '.join(names)})"
+
+    def write_formula(self, phi: FNode) -> None:
+        """asserts a generic formula, printed with let-sharing of its subterms"""
+        out: List[str] = []
+        self._declare(phi, out)
+        buf = StringIO()
+        SmtDagPrinter(buf).printer(phi)
+        out.append(f"(assert {buf.getvalue()})\n")
+        self._stream.write("".join(out))
+
+    def write_lemmas(self, lemmas: Iterable[FNode]) -> None:
+        """asserts a batch of lemmas"""
+        out: List[str] = []
+        for lemma in lemmas:
+            try:
+                literals = get_clause_literals(lemma)
+            except FormulaException:
+                self._stream.write("".join(out))
+                out = []
+                self.write_formula(lemma)
+                continue
+            out.append(f"(assert {self._literals(literals, 'or', out)})\n")
+        self._stream.write("".join(out))
+
+    def write_models(self, models: Iterable[Iterable[FNode]]) -> None:
+        """defines a batch of models, each as the conjunction of its literals"""
+        out: List[str] = []
+        for model in models:
+            body = self._literals(model, "and", out)
+            out.append(f"(define-fun {MODEL_NAME_TEMPLATE % self._models_count} () Bool {body})\n")
+            self._models_count += 1
+        self._stream.write("".join(out))
+
+    def flush(self) -> None:
+        """flushes the underlying stream"""
+        self._stream.flush()
+
+    def close(self) -> None:
+        """flushes the script, closing the underlying stream if it was opened by the writer"""
+        if self._owns_stream:
+            self._stream.close()
+        else:
+            self._stream.flush()
+
+
+def write_smtlib_lemmas(lemmas: Iterable[FNode], filename: str, phi: FNode | None = None) -> None:
+    """writes lemmas (and optionally phi) to an SMT-LIB2 script
+
+    Args:
+        lemmas (Iterable[FNode]): the lemmas to write
+        filename (str): the name of the file
+        phi (FNode | None) [None]: if given, phi is asserted before the lemmas
+    """
+    with SmtLibWriter(filename) as writer:
+        if phi is not None:
+            writer.write_formula(phi)
+        writer.write_lemmas(lemmas)
+
+
+def _read_script(source: str | TextIO, env=None):
+    parser = SmtLibParser(environment=env)
+    if not isinstance(source, str):
+        return parser.get_script(source)
+    with open(source, "r", encoding="utf-8") as f:
+        return parser.get_script(f)
+
+
+def read_smtlib_lemmas(source: str | TextIO, env=None) -> List[FNode]:
+    """reads the formulas asserted in an SMT-LIB2 script, e.g. one written by SmtLibWriter.write_lemmas
+
+    Args:
+        source (str | TextIO): the name of the file, or a text stream
+        env [None]: the pysmt environment in which lemmas are created
+
+    Returns:
+        List[FNode]: the asserted formulas, in order
+    """
+    script = _read_script(source, env)
+    return [cmd.args[0] for cmd in script.commands if cmd.name == "assert"]
+
+
+def read_smtlib_models(source: str | TextIO, env=None) -> List[Set[FNode]]:
+    """reads the models defined in an SMT-LIB2 script written by SmtLibWriter.write_models
+
+    Args:
+        source (str | TextIO): the name of the file, or a text stream
+        env [None]: the pysmt environment in which models are created
+
+    Returns:
+        List[Set[FNode]]: the models, as sets of literals, in order
+    """
+    script = _read_script(source, env)
+    models = []
+    for cmd in script.commands:
+        if cmd.name == "define-fun" and cmd.args[0].startswith(_RESERVED_PREFIXES[1]):
+            body = cmd.args[3]
+            if body.is_true():
+                models.append(set())
+            else:
+                models.append(set(body.args()) if body.is_and() else {body})
+    return models
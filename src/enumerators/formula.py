@@ -2,17 +2,15 @@
 
 from typing import Collection, Iterable, List, Dict, Set
 from pysmt.shortcuts import (
-    And as _And,
-    Or as _Or,
     BOOL as _BOOL,
-    Not as _Not,
+    get_env as _get_env,
     read_smtlib as _read_smtlib,
-    TRUE as _TRUE,
+    write_smtlib as _write_smtlib,
 )
 from pysmt.fnode import FNode
 
 from enumerators.util.custom_exceptions import FormulaException
-from enumerators.util.disjoint_set import DisjointSet
+from enumerators.util.formula_index import get_formula_index
 from enumerators.walkers.normalizer import NormalizerWalker
 
 
@@ -35,6 +33,18 @@ def read_phi(filename: str) -> FNode:
         raise FormulaException("The input formula is not supported by the PYSMT package and cannot be read") from _e
 
 
+def save_phi(phi: FNode, filename: str) -> None:
+    """Saves the SMT formula on a file as an SMT-LIB2 script
+
+    Args:
+        phi (FNode): a pysmt formula
+        filename (str): the name of the file
+    """
+    if not isinstance(phi, FNode):
+        raise TypeError("Expected FNode found " + str(type(phi)))
+    _write_smtlib(phi, filename)
+
+
 def get_atoms(phi: FNode) -> List[FNode]:
     """Returns a list of all the atoms in the SMT formula
 
@@ -63,105 +73,122 @@ def get_symbols(phi: FNode) -> List[FNode]:
     return list(phi.get_free_variables())
 
 
-def get_normalized(phi: FNode, converter) -> FNode:
+def get_normalized(phi: FNode, converter, env=None) -> FNode:
     """Returns a normalized version of phi
 
     Args:
         phi (FNode): a pysmt formula
+        converter: the converter of a solver, which defines the normal form of the atoms
+        env (Environment | None) [None]: the pysmt environment of phi, the global one if None
 
     Returns:
         FNode: the provided formula normalized according to the converter
     """
     if not isinstance(phi, FNode):
         raise TypeError("Expected FNode found " + str(type(phi)))
-    walker = NormalizerWalker(converter)
+    walker = NormalizerWalker(converter, env)
     return walker.walk(phi)
 
 
-def get_atom_partitioning(phi: FNode) -> List[Set[FNode]]:
-    """partitions atoms into set
+def get_atom_partitioning(phi: FNode, env=None) -> List[Set[FNode]]:
+    """partitions the atoms of phi into sets of theory atoms which share no variable, even transitively
 
-    phi must be a normalized formula or the partitioning may not be correct
+    Each Boolean atom is in a set of its own. phi must be a normalized formula (see get_normalized),
+    or the partitioning may not be correct
 
     Args:
         phi (FNode): a pysmt formula
-        skip_normalization (bool): if True, the formula is not normalized before partitioning
+        env (Environment | None) [None]: the pysmt environment of phi, the global one if None
 
     Returns:
         List[Set[FNode]]: a list of sets of atoms that are in the same partition
     """
-    atoms = get_atoms(phi)
-    all_vars = phi.get_free_variables()
-    if all_vars is None:
-        # no free variables in the formula
-        return [set(atoms)]
-
-    # merge all variables that appear in the same atom
-    disjoint_set_vars = DisjointSet(all_vars)
-    # associate to each atom the first free variable that appears in it
-    atoms_repr_vars: Dict[FNode, FNode] = {}
-    theory_atoms = []
-    for atom in atoms:
-        atom_vars = list(atom.get_free_variables())
-
-        # skip boolean atoms (that do not have free variables)
-        if len(atom_vars) == 0:
-            continue
-
-        # add the atom to the theory_atoms list
-        theory_atoms.append(atom)
-
-        # associate to the atom a representative variable
-        atoms_repr_vars[atom] = atom_vars[0]
-
-        # join all variables that appear in the same atom
-        for index, var_1 in enumerate(atom_vars):
-            for var_2 in atom_vars[(index + 1) :]:
-                disjoint_set_vars.union(var_1, var_2)
-    # now all atoms have a find result on the disjoint set
-    # which is disjoint_set_vars.find(atom.get_free_variables()[0])
-
-    # merge atoms that share a variable
-    disjoint_set_atoms = DisjointSet(theory_atoms)
-    for index, atom_1 in enumerate(theory_atoms):
-        # get repr for atom_1's first variable
-        atom_1_repr = disjoint_set_vars.find(atoms_repr_vars[atom_1])
-        for atom_2 in atoms[(index + 1) :]:
-            # get repr for atom_2's first variable
-            atom_2_repr = disjoint_set_vars.find(atoms_repr_vars[atom_2])
-            # join atoms if they share the repr of disjoint_set_vars of their repr variable
-            if atom_1_repr == atom_2_repr:
-                disjoint_set_atoms.union(atom_1, atom_2)
-
-    # get partitioning of theory atoms
-    atoms_sets = list(disjoint_set_atoms.get_sets().values())
+    index = get_formula_index(phi, env)
+    atoms_sets = [set(partition) for partition in index.partitions()]
 
     # add singleton partition for all boolean atoms
-    for atom in atoms:
-        if atom not in theory_atoms:
-            singleton_set = set()
-            singleton_set.add(atom)
-            atoms_sets.append(singleton_set)
+    for atom in index.atoms:
+        if atom.is_symbol(_BOOL):
+            atoms_sets.append({atom})
 
     return atoms_sets
 
 
-def get_true_given_atoms(atoms: Iterable[FNode]) -> FNode:
+def get_true_given_atoms(atoms: Iterable[FNode], env=None) -> FNode:
     """returns the formula that is True given the atoms
 
     Args:
         atoms (Iterable[FNode]): a set of pysmt atoms
+        env (Environment | None) [None]: the pysmt environment of the atoms, the global one if None
 
     Returns:
         FNode: the formula that is always True given the atoms
     """
+    mgr = (env if env is not None else _get_env()).formula_manager
     if len(atoms) == 0:
-        return _TRUE()
+        return mgr.TRUE()
     big_and_items = []
     for atom in atoms:
-        big_and_items.append(_Or(atom, _Not(atom)))
-    return _And(*big_and_items)
+        big_and_items.append(mgr.Or(atom, mgr.Not(atom)))
+    return mgr.And(*big_and_items)
+
+
+def slice_formula(
+    phi: FNode, kept_atoms: Collection[FNode], abstraction: Dict[FNode, FNode] | None = None, env=None
+) -> FNode:
+    """replaces the theory atoms of phi which are not in kept_atoms with fresh Boolean variables
+
+    If kept_atoms is a partition of the theory atoms (see get_atom_partitioning), the other theory
+    atoms share no variable with kept_atoms, so that the sliced formula only involves the theory of
+    the partition, and every T-lemma on kept_atoms is a T-lemma of phi. The projection of the
+    sliced formula on kept_atoms may however contain assignments which only extend to T-inconsistent
+    assignments of the other atoms.
+
+    Args:
+        phi (FNode): a pysmt formula
+        kept_atoms (Collection[FNode]): the theory atoms which are kept
+        abstraction (Dict[FNode, FNode] | None) [None]: the fresh variable of each replaced atom, which is
+            updated with the new replacements, so that slices of the same formula share their variables
+        env (Environment | None) [None]: the pysmt environment of phi, the global one if None
+
+    Returns:
+        FNode: the sliced formula
+    """
+    env = env if env is not None else _get_env()
+    if abstraction is None:
+        abstraction = {}
+    kept_atoms = set(kept_atoms)
+    substitutions = {}
+    for atom in env.ao.get_atoms(phi):
+        if atom in kept_atoms or atom.is_symbol(_BOOL):
+            continue
+        if atom not in abstraction:
+            abstraction[atom] = env.formula_manager.FreshSymbol(_BOOL, template="SLICE%d")
+        substitutions[atom] = abstraction[atom]
+    if len(substitutions) == 0:
+        return phi
+    return env.substituter.substitute(phi, substitutions)
 
 
 def get_theory_atoms(atoms: Collection[FNode]) -> Collection[FNode]:
     return [atom for atom in atoms if not atom.is_symbol(_BOOL)]
+
+
+def get_clause_literals(clause: FNode) -> List[FNode]:
+    """returns the literals of a clause
+
+    Args:
+        clause (FNode): a disjunction of literals, or a single literal
+
+    Returns:
+        List[FNode]: the literals of the clause
+
+    Raises:
+        FormulaException: if the formula is not a clause
+    """
+    literals = clause.args() if clause.is_or() else (clause,)
+    for literal in literals:
+        atom = literal.arg(0) if literal.is_not() else literal
+        if atom.is_bool_op() or atom.is_ite() or atom.is_constant():
+            raise FormulaException(f"{clause} is not a clause")
+    return list(literals)
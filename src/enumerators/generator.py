@@ -0,0 +1,123 @@
+"""this module generates random SMT formulas, e.g. to study how the enumerators scale"""
+
+import random
+from dataclasses import dataclass
+from typing import List
+
+from pysmt.environment import Environment, get_env
+from pysmt.fnode import FNode
+from pysmt.typing import BOOL, INT, REAL, BVType
+
+THEORIES = ("LRA", "LIA", "BV")
+
+
+@dataclass(frozen=True)
+class FormulaParameters:
+    """the parameters of a random formula
+
+    The formula is the conjunction of partitions subformulas on disjoint variables. Each subformula
+    is a random tree of And and Or of the given depth, whose leaves are literals of its atoms: its
+    share of the Boolean variables and of the theory_atoms atoms, which are linear inequalities on at
+    most atom_vars of its share of the theory variables.
+    """
+
+    bool_vars: int = 10
+    theory_vars: int = 10
+    theory_atoms: int = 10
+    depth: int = 5
+    theory: str = "LRA"
+    partitions: int = 1
+    atom_vars: int = 3
+    seed: int = 0
+    # width of the variables of the BV formulas
+    bv_width: int = 8
+
+    def __post_init__(self):
+        if self.theory not in THEORIES:
+            raise ValueError(f"theory must be one of {', '.join(THEORIES)}")
+        if self.depth < 1 or self.partitions < 1 or self.atom_vars < 1:
+            raise ValueError("depth, partitions and atom_vars must be at least 1")
+        if self.bool_vars < 0 or self.theory_vars < 0 or self.theory_atoms < 0:
+            raise ValueError("the number of variables and atoms must be non-negative")
+        if self.theory_atoms > 0 and self.theory_vars < self.partitions:
+            raise ValueError("each partition needs a theory variable to build theory atoms")
+        if self.bool_vars + self.theory_atoms < self.partitions:
+            raise ValueError("each partition needs at least one atom")
+
+    def name(self) -> str:
+        """returns a name which encodes the parameters, in the style of the randgen benchmarks"""
+        return (
+            f"{self.theory.lower()}_b{self.bool_vars}_d{self.depth}_r{self.theory_vars}_a{self.theory_atoms}"
+            f"_p{self.partitions}_s{self.seed}"
+        )
+
+
+def random_formula(params: FormulaParameters, env: Environment | None = None) -> FNode:
+    """generates a random formula, which only depends on params
+
+    Args:
+        params (FormulaParameters): the parameters of the formula
+        env (Environment | None) [None]: the pysmt environment of the formula, the global one if None
+
+    Returns:
+        FNode: the formula
+    """
+    generator = _FormulaGenerator(params, env if env is not None else get_env())
+    return generator.generate()
+
+
+class _FormulaGenerator:
+    def __init__(self, params: FormulaParameters, env: Environment):
+        self.params = params
+        self.mgr = env.formula_manager
+        self.rng = random.Random(params.seed)
+
+    def generate(self) -> FNode:
+        partitions = self.params.partitions
+        bools = self._symbols("A", BOOL, self.params.bool_vars)
+        theory_vars = self._symbols(*self._theory_symbol(), self.params.theory_vars)
+        subformulas = []
+        for index in range(partitions):
+            atoms = bools[index::partitions]
+            part_vars = theory_vars[index::partitions]
+            # the theory atoms are dealt after the Boolean variables, so that each partition gets an atom
+            first = (index - self.params.bool_vars) % partitions
+            atoms = atoms + [self._theory_atom(part_vars) for _ in range(first, self.params.theory_atoms, partitions)]
+            subformulas.append(self._tree(atoms, self.params.depth))
+        return self.mgr.And(subformulas)
+
+    def _symbols(self, prefix: str, symbol_type, count: int) -> List[FNode]:
+        return [self.mgr.Symbol(f"{prefix}{i}", symbol_type) for i in range(count)]
+
+    def _theory_symbol(self) -> tuple:
+        # each theory has its own prefix, so that formulas of different theories can share an environment
+        if self.params.theory == "LRA":
+            return "x", REAL
+        if self.params.theory == "LIA":
+            return "n", INT
+        return "v", BVType(self.params.bv_width)
+
+    def _tree(self, atoms: List[FNode], depth: int) -> FNode:
+        if depth == 0:
+            atom = self.rng.choice(atoms)
+            return self.mgr.Not(atom) if self.rng.random() < 0.5 else atom
+        children = [self._tree(atoms, depth - 1) for _ in range(self.rng.randint(2, 3))]
+        node = self.mgr.And(children) if self.rng.random() < 0.5 else self.mgr.Or(children)
+        return self.mgr.Not(node) if self.rng.random() < 0.25 else node
+
+    def _theory_atom(self, variables: List[FNode]) -> FNode:
+        variables = self.rng.sample(variables, self.rng.randint(1, min(self.params.atom_vars, len(variables))))
+        mgr = self.mgr
+        if self.params.theory == "BV":
+            width = self.params.bv_width
+            terms = [mgr.BVMul(mgr.BV(self._coefficient() % 2**width, width), v) for v in variables]
+            bound = mgr.BV(self.rng.randrange(2**width), width)
+            return mgr.BVULE(mgr.BVAdd(terms), bound)
+        constant = mgr.Real if self.params.theory == "LRA" else mgr.Int
+        terms = [mgr.Times(constant(self._coefficient()), v) for v in variables]
+        bound = constant(self.rng.randint(-100, 100))
+        relation = mgr.LT if self.rng.random() < 0.5 else mgr.LE
+        return relation(mgr.Plus(terms), bound)
+
+    def _coefficient(self) -> int:
+        return self.rng.choice([-1, 1]) * self.rng.randint(1, 10)
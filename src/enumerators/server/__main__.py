@@ -0,0 +1,48 @@
+"""runs an enumeration server
+
+usage: python -m enumerators.server --socket /tmp/enumerators.sock [--max-concurrent 2] [--parallel-procs 4]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+
+from enumerators.server.server import EnumerationServer
+from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", required=True, help="path of the unix socket")
+    parser.add_argument("--max-concurrent", type=int, default=1, help="jobs running at the same time")
+    parser.add_argument("--max-queued", type=int, default=1000, help="jobs waiting to run")
+    parser.add_argument("--jobs-per-environment", type=int, default=100)
+    parser.add_argument("--parallel-procs", default="1", help='processes of the partial enumerator, or "auto"')
+    parser.add_argument("--msat-profile", default=None, help="name of the mathsat profile of the enumerators")
+    args = parser.parse_args()
+
+    parallel_procs = args.parallel_procs if args.parallel_procs == "auto" else int(args.parallel_procs)
+    enumerators = {
+        "total": functools.partial(MathSATTotalEnumerator, msat_profile=args.msat_profile),
+        "partial": functools.partial(
+            MathSATExtendedPartialEnumerator,
+            parallel_procs=parallel_procs,
+            msat_profile=args.msat_profile,
+            mp_context="forkserver",
+        ),
+    }
+    server = EnumerationServer(
+        args.socket,
+        enumerators,
+        max_concurrent=args.max_concurrent,
+        max_queued=args.max_queued,
+        jobs_per_environment=args.jobs_per_environment,
+    )
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
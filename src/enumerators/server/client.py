@@ -0,0 +1,209 @@
+"""this module is a client of the enumeration server, for scripts which submit jobs from a single thread"""
+
+import collections
+import itertools
+import socket
+from dataclasses import dataclass, field
+from io import StringIO
+from typing import Callable, Dict, Iterator, List, Set
+
+from pysmt.environment import Environment
+from pysmt.fnode import FNode
+
+from enumerators.export.smtlib import SmtLibWriter, read_smtlib_lemmas, read_smtlib_models
+from enumerators.server import protocol
+from enumerators.util.custom_exceptions import EnumerationCancelled, ServerException
+
+
+def formula_to_smtlib(phi: FNode) -> str:
+    """returns an SMT-LIB2 script which asserts phi, to be submitted to the server"""
+    buffer = StringIO()
+    SmtLibWriter(buffer).write_formula(phi)
+    return buffer.getvalue()
+
+
+@dataclass
+class JobResult:
+    """the result of a job run by the server, with the SMT-LIB2 scripts of its lemmas and models"""
+
+    id: str
+    sat: bool
+    models_count: int
+    lemmas_count: int
+    # seconds spent enumerating, and waiting in the queue of the server
+    time: float
+    queue_time: float
+    lemmas_script: str = ""
+    models_script: str = ""
+    # the progress messages received, as dictionaries of the fields of EnumerationProgress
+    progress: List[Dict] = field(default_factory=list)
+
+    def get_lemmas(self, env: Environment | None = None) -> List[FNode]:
+        """returns the lemmas of the job, parsed in env (the global environment if None)"""
+        return read_smtlib_lemmas(StringIO(self.lemmas_script), env)
+
+    def get_models(self, env: Environment | None = None) -> List[Set[FNode]]:
+        """returns the models of the job, if they were requested, parsed in env (the global environment if None)"""
+        return read_smtlib_models(StringIO(self.models_script), env)
+
+
+class EnumerationClient:
+    """submits jobs to an EnumerationServer listening on socket_path, and receives their messages
+
+    A connection can have several jobs queued or running at once: submit returns the id of a job,
+    and events yields the messages of the server, e.g. the lemmas of each job as soon as they are
+    found. enumerate submits a job and waits for its result. The client is not thread-safe, each
+    thread should use its own.
+
+    Args:
+        socket_path (str): the path of the unix socket of the server
+        timeout (float | None) [None]: the seconds to wait for a message, forever if None
+    """
+
+    def __init__(self, socket_path: str, timeout: float | None = None):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(socket_path)
+        self._reader = self._socket.makefile("rb")
+        self._ids = itertools.count()
+        # the messages received while waiting for those of another job
+        self._pending: collections.deque = collections.deque()
+
+    def __enter__(self) -> "EnumerationClient":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """closes the connection, which cancels the jobs still queued or running"""
+        self._reader.close()
+        self._socket.close()
+
+    def _send(self, message: Dict) -> None:
+        self._socket.sendall(protocol.encode_message(message))
+
+    def _receive(self) -> Dict:
+        line = self._reader.readline()
+        if not line:
+            raise ServerException("the server closed the connection")
+        return protocol.decode_message(line)
+
+    def _next_message(self, accept: Callable[[Dict], bool]) -> Dict:
+        """returns the first message accepted, keeping the others for later"""
+        for message in self._pending:
+            if accept(message):
+                self._pending.remove(message)
+                return message
+        while True:
+            message = self._receive()
+            if accept(message):
+                return message
+            self._pending.append(message)
+
+    def submit(
+        self,
+        formula: str | FNode,
+        enumerator: str = protocol.DEFAULT_ENUMERATOR,
+        priority: int = 0,
+        models: bool = False,
+        progress_interval: float | None = protocol.DEFAULT_PROGRESS_INTERVAL,
+        job_id: str | None = None,
+    ) -> str:
+        """submits a job, and returns its id
+
+        Args:
+            formula (str | FNode): an SMT-LIB2 script, or a pysmt formula
+            enumerator (str) [DEFAULT_ENUMERATOR]: the name of an enumerator of the server
+            priority (int) [0]: the jobs with higher priority are run first
+            models (bool) [False]: if True, the models are streamed as well
+            progress_interval (float | None) [DEFAULT_PROGRESS_INTERVAL]: the seconds between two
+                progress messages, None for no progress messages
+            job_id (str | None) [None]: the id of the job, generated if None
+
+        Returns:
+            str: the id of the job
+        """
+        if isinstance(formula, FNode):
+            formula = formula_to_smtlib(formula)
+        job_id = job_id if job_id is not None else f"job-{next(self._ids)}"
+        self._send(
+            {
+                "type": protocol.SUBMIT,
+                "id": job_id,
+                "formula": formula,
+                "enumerator": enumerator,
+                "priority": priority,
+                "models": models,
+                "progress_interval": progress_interval,
+            }
+        )
+        return job_id
+
+    def cancel(self, job_id: str) -> None:
+        """asks the server to cancel a job, whose last message will be cancelled (or done, if it completed first)"""
+        self._send({"type": protocol.CANCEL, "id": job_id})
+
+    def status(self) -> Dict:
+        """returns the status of the server (see protocol)"""
+        self._send({"type": protocol.STATUS})
+        return self._next_message(lambda message: message["type"] == protocol.STATUS)
+
+    def events(self, job_id: str | None = None) -> Iterator[Dict]:
+        """yields the messages of the server about job_id, until its last one, or about any job, forever, if None"""
+        while True:
+            message = self._next_message(lambda m: job_id is None or m.get("id") == job_id)
+            yield message
+            if job_id is not None and message["type"] in protocol.FINAL_MESSAGES:
+                return
+
+    def enumerate(self, formula: str | FNode, on_event: Callable[[Dict], None] | None = None, **options) -> JobResult:
+        """submits a job and waits for its result
+
+        Args:
+            formula (str | FNode): an SMT-LIB2 script, or a pysmt formula
+            on_event (Callable[[Dict], None] | None) [None]: called with each message about the job,
+                e.g. to process the lemmas as they arrive
+            **options: the other arguments of submit
+
+        Returns:
+            JobResult: the result of the job
+
+        Raises:
+            ServerException: if the server rejects the job or fails to run it
+            EnumerationCancelled: if the job is cancelled
+        """
+        job_id = self.submit(formula, **options)
+        lemmas_chunks = []
+        models_chunks = []
+        progress = []
+        queue_time = 0.0
+        for message in self.events(job_id):
+            if on_event is not None:
+                on_event(message)
+            message_type = message["type"]
+            if message_type == protocol.STARTED:
+                queue_time = message["queue_time"]
+            elif message_type == protocol.LEMMAS:
+                lemmas_chunks.append(message["smtlib"])
+            elif message_type == protocol.MODELS:
+                models_chunks.append(message["smtlib"])
+            elif message_type == protocol.PROGRESS:
+                progress.append({k: v for k, v in message.items() if k not in ("type", "id")})
+            elif message_type == protocol.ERROR:
+                raise ServerException(message["message"])
+            elif message_type == protocol.CANCELLED:
+                raise EnumerationCancelled(f"the job {job_id} was cancelled")
+            elif message_type == protocol.DONE:
+                return JobResult(
+                    id=job_id,
+                    sat=message["sat"],
+                    models_count=message["models"],
+                    lemmas_count=message["lemmas"],
+                    time=message["time"],
+                    queue_time=queue_time,
+                    lemmas_script="".join(lemmas_chunks),
+                    models_script="".join(models_chunks),
+                    progress=progress,
+                )
+        raise ServerException(f"the server sent no result for the job {job_id}")
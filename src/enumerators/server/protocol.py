@@ -0,0 +1,66 @@
+"""this module defines the JSON lines protocol of the enumeration server
+
+Each message is a JSON object on its own line, with a "type" and, for the messages about a job,
+the "id" chosen by the client when submitting it (unique among the jobs of its connection).
+
+Client requests:
+    - submit: "id", "formula" (an SMT-LIB2 script), and optionally "enumerator" (a name configured
+      in the server, DEFAULT_ENUMERATOR if omitted), "priority" (higher first, 0 if omitted),
+      "models" (stream the models too, False if omitted) and "progress_interval" (seconds between
+      two progress messages, DEFAULT_PROGRESS_INTERVAL if omitted, no progress messages if null);
+    - cancel: "id" of a queued or running job;
+    - status: no fields.
+
+Server messages:
+    - queued: the job was accepted, "position" in the queue;
+    - started: the job was given to an enumerator, "queue_time" it waited;
+    - progress: the fields of EnumerationProgress;
+    - lemmas / models: "smtlib", the next chunk of an SMT-LIB2 script with the new lemmas (models)
+      of the job, written by SmtLibWriter: the chunks of a job must be concatenated, since atoms
+      are defined once and referred to by name;
+    - done: "sat", "models" and "lemmas" counts, "time" of the enumeration;
+    - cancelled: the job was cancelled before completing;
+    - error: "message", and the "id" of the job if the error concerns one;
+    - status: "queued", "running" and "completed" jobs, and the "max_concurrent" jobs.
+"""
+
+import json
+from typing import Dict
+
+DEFAULT_ENUMERATOR = "total"
+DEFAULT_PROGRESS_INTERVAL = 1.0
+# the longest line accepted by the server, which bounds the size of a formula
+MAX_LINE_SIZE = 256 * 1024 * 1024
+
+SUBMIT = "submit"
+CANCEL = "cancel"
+STATUS = "status"
+
+QUEUED = "queued"
+STARTED = "started"
+PROGRESS = "progress"
+LEMMAS = "lemmas"
+MODELS = "models"
+DONE = "done"
+CANCELLED = "cancelled"
+ERROR = "error"
+
+# the messages after which the server sends nothing more about a job
+FINAL_MESSAGES = frozenset({DONE, CANCELLED, ERROR})
+
+
+def encode_message(message: Dict) -> bytes:
+    """returns the line of a message"""
+    return json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def decode_message(line: bytes) -> Dict:
+    """returns the message of a line
+
+    Raises:
+        ValueError: if the line is not a JSON object with a type
+    """
+    message = json.loads(line)
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise ValueError("a message must be a JSON object with a type")
+    return message
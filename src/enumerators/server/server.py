@@ -0,0 +1,447 @@
+"""this module serves enumeration jobs over a unix socket, with enumerators kept warm across jobs"""
+
+import asyncio
+import contextlib
+import functools
+import itertools
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from io import StringIO
+from typing import Callable, Dict, List
+
+from pysmt.environment import Environment
+from pysmt.smtlib.parser import SmtLibParser
+
+from enumerators.export.smtlib import SmtLibWriter
+from enumerators.server import protocol
+from enumerators.solvers.async_enumerator import AsyncEnumerator
+from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.solvers.solver import SMTEnumerator
+
+# builds an enumerator in the given pysmt environment, e.g. an enumerator class or a functools.partial of it
+EnumeratorFactory = Callable[..., SMTEnumerator]
+
+# the pools are started from the threads of the slots, they must not fork the server
+DEFAULT_ENUMERATORS: Dict[str, EnumeratorFactory] = {
+    "total": MathSATTotalEnumerator,
+    "partial": functools.partial(MathSATExtendedPartialEnumerator, mp_context="forkserver"),
+}
+
+# the streamed messages (lemmas, models and progress) of a connection which can wait to be written
+MAX_PENDING_STREAMED = 64
+# seconds between two checks of the cancellation of a job waiting to stream a message
+_STREAM_POLL_INTERVAL = 0.1
+
+
+class _Connection:
+    """a client connection, its jobs which are queued or running, and the messages waiting to be written
+
+    The messages are written in order by a task which waits for the client to read them. The streamed
+    messages of the jobs wait while MAX_PENDING_STREAMED of them are not written yet, which blocks the
+    listeners of the enumerators: a slow client slows down its jobs, instead of the server buffering
+    their whole output.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.jobs: Dict[str, "_Job"] = {}
+        self._messages: asyncio.Queue = asyncio.Queue()
+        self._pending_streamed = 0
+        self._streamed_written = asyncio.Event()
+        self._closed = False
+        self._writer_task = asyncio.ensure_future(self._write_messages())
+
+    def send(self, message: Dict) -> None:
+        """queues a message which does not wait, e.g. the replies to the requests and the final message of a job"""
+        # the messages about the jobs of a closed connection are dropped
+        if not self._closed:
+            self._messages.put_nowait((message, False))
+
+    async def stream(self, message: Dict, job: "_Job") -> None:
+        """queues a streamed message of job, waiting for the client to read the previous ones"""
+        while self._pending_streamed >= MAX_PENDING_STREAMED and not self._closed and not job.cancelled:
+            self._streamed_written.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._streamed_written.wait(), _STREAM_POLL_INTERVAL)
+        # the messages of a cancelled job are dropped, so that its enumeration stops promptly
+        if self._closed or job.cancelled:
+            return
+        self._pending_streamed += 1
+        self._messages.put_nowait((message, True))
+
+    async def _write_messages(self) -> None:
+        while True:
+            message, streamed = await self._messages.get()
+            try:
+                if not self._closed:
+                    self.writer.write(protocol.encode_message(message))
+                    await self.writer.drain()
+            except ConnectionError:
+                self._closed = True
+            if streamed:
+                self._pending_streamed -= 1
+                self._streamed_written.set()
+
+    async def close(self) -> None:
+        """writes the messages already queued, without waiting for the client to read them, and closes the connection"""
+        self._closed = True
+        self._writer_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._writer_task
+        while not self._messages.empty():
+            message, _ = self._messages.get_nowait()
+            if not self.writer.is_closing():
+                self.writer.write(protocol.encode_message(message))
+        self.writer.close()
+        with contextlib.suppress(ConnectionError):
+            await self.writer.wait_closed()
+
+
+@dataclass(eq=False)
+class _Job:
+    id: str
+    formula: str
+    enumerator: str
+    priority: int
+    models: bool
+    progress_interval: float | None
+    connection: _Connection
+    submitted: float = field(default_factory=time.monotonic)
+    cancelled: bool = False
+    task: asyncio.Task | None = None
+
+    def send(self, message: Dict) -> None:
+        self.connection.send({**message, "id": self.id})
+
+    async def stream(self, message: Dict) -> None:
+        await self.connection.stream({**message, "id": self.id}, self)
+
+
+class _Slot:
+    """a thread which runs one job at a time, with its own pysmt environment and warm enumerators
+
+    The environment, and the enumerators built in it, are replaced after jobs_per_environment jobs,
+    so that the formulas of the past jobs are released.
+    """
+
+    def __init__(self, factories: Dict[str, EnumeratorFactory], jobs_per_environment: int):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="enumeration-slot")
+        self._factories = factories
+        self._jobs_per_environment = jobs_per_environment
+        self._env = None
+        self._enumerators: Dict[str, SMTEnumerator] = {}
+        self._jobs = 0
+
+    def prepare(self, job: _Job, send: Callable[[Dict], None]) -> tuple:
+        """returns the enumerator of the job, with its listeners, and its formula; runs in the thread of the slot"""
+        if self._env is None or self._jobs >= self._jobs_per_environment:
+            self._env = Environment()
+            self._enumerators = {}
+            self._jobs = 0
+        self._jobs += 1
+        enumerator = self._enumerators.get(job.enumerator)
+        if enumerator is None:
+            enumerator = self._enumerators[job.enumerator] = self._factories[job.enumerator](env=self._env)
+        phi = SmtLibParser(environment=self._env).get_script(StringIO(job.formula))
+        phi = phi.get_last_formula(self._env.formula_manager)
+
+        enumerator.set_lemmas_listener(_ScriptStream(protocol.LEMMAS, SmtLibWriter.write_lemmas, send))
+        models_stream = _ScriptStream(protocol.MODELS, SmtLibWriter.write_models, send) if job.models else None
+        enumerator.set_models_listener(models_stream)
+        if job.progress_interval is None:
+            enumerator.set_progress_callback(None)
+        else:
+            enumerator.set_progress_callback(
+                lambda progress: send({"type": protocol.PROGRESS, **asdict(progress)}), job.progress_interval
+            )
+        return enumerator, phi
+
+    @staticmethod
+    def release(enumerator: SMTEnumerator) -> None:
+        """drops the listeners, lemmas and models of the last job, keeping the enumerator warm"""
+        enumerator.set_lemmas_listener(None)
+        enumerator.set_models_listener(None)
+        enumerator.set_progress_callback(None)
+        enumerator.reset()
+
+
+class _ScriptStream:
+    """sends the formulas passed to a listener as the next chunk of the SMT-LIB2 script of a job"""
+
+    def __init__(self, message_type: str, write: Callable, send: Callable[[Dict], None]):
+        self._buffer = StringIO()
+        self._writer = SmtLibWriter(self._buffer)
+        self._message_type = message_type
+        self._write = write
+        self._send = send
+
+    def __call__(self, formulas: List) -> None:
+        self._write(self._writer, formulas)
+        chunk = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._send({"type": self._message_type, "smtlib": chunk})
+
+
+class EnumerationServer:
+    """serves enumeration jobs submitted over a unix socket (see protocol), without a process per job
+
+    The server keeps max_concurrent slots, each a thread with its own pysmt environment and the
+    enumerators built in it by the factories of enumerators (DEFAULT_ENUMERATORS if None), which are
+    reset and reused by the next jobs: a job only pays for parsing its formula and enumerating it.
+    The pools of MathSATExtendedPartialEnumerator are still started for each job which uses them, by
+    a thread of the server: the factories of enumerators which start pools must not let them fork the
+    server, e.g. with mp_context="forkserver" (see DEFAULT_ENUMERATORS).
+
+    The jobs wait in a queue ordered by priority (then by submission), which holds at most max_queued
+    jobs; a job submitted to a full queue is rejected with an error. While a job runs, its lemmas
+    (and its models, if requested) are streamed to its client as soon as the enumerator harvests
+    them, together with its progress; a client which reads them slowly slows down its jobs (see
+    MAX_PENDING_STREAMED). A job is cancelled by a cancel request, or when the connection of its
+    client is closed.
+
+    Args:
+        socket_path (str): the path of the unix socket
+        enumerators (Dict[str, EnumeratorFactory] | None) [None]: the enumerators which the jobs can
+            choose by name, built with factory(env=env)
+        max_concurrent (int) [1]: the maximum number of jobs running at the same time
+        max_queued (int) [1000]: the maximum number of jobs waiting to run
+        jobs_per_environment (int) [100]: the jobs run in an environment of a slot before it is replaced
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        enumerators: Dict[str, EnumeratorFactory] | None = None,
+        max_concurrent: int = 1,
+        max_queued: int = 1000,
+        jobs_per_environment: int = 100,
+    ):
+        if max_concurrent < 1 or max_queued < 1 or jobs_per_environment < 1:
+            raise ValueError("max_concurrent, max_queued and jobs_per_environment must be at least 1")
+        self.socket_path = socket_path
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._factories = dict(enumerators if enumerators is not None else DEFAULT_ENUMERATORS)
+        if protocol.DEFAULT_ENUMERATOR not in self._factories:
+            raise ValueError(f"the enumerators must include {protocol.DEFAULT_ENUMERATOR!r}")
+        self._slots = [_Slot(self._factories, jobs_per_environment) for _ in range(max_concurrent)]
+        self._queue: asyncio.PriorityQueue | None = None
+        self._sequence = itertools.count()
+        self._queued: set = set()
+        self._running: set = set()
+        self._completed = 0
+        self._server: asyncio.AbstractServer | None = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """starts listening on the socket and running the jobs"""
+        _remove_stale_socket(self.socket_path)
+        self._queue = asyncio.PriorityQueue()
+        self._server = await asyncio.start_unix_server(
+            self._handle_connection, self.socket_path, limit=protocol.MAX_LINE_SIZE
+        )
+        self._workers = [asyncio.ensure_future(self._work(slot)) for slot in self._slots]
+
+    async def serve_forever(self) -> None:
+        """serves the jobs until the task is cancelled, then closes the server"""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """cancels the queued and running jobs, and stops the server"""
+        if self._server is not None:
+            self._server.close()
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            with contextlib.suppress(asyncio.CancelledError):
+                await worker
+        self._workers = []
+        for slot in self._slots:
+            slot.executor.shutdown(wait=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+
+    def status(self) -> Dict:
+        """returns the numbers of queued, running and completed jobs"""
+        return {
+            "type": protocol.STATUS,
+            "queued": len(self._queued),
+            "running": len(self._running),
+            "completed": self._completed,
+            "max_concurrent": self.max_concurrent,
+        }
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        connection = _Connection(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    connection.send({"type": protocol.ERROR, "message": "message too long"})
+                    break
+                if not line:
+                    break
+                try:
+                    message = protocol.decode_message(line)
+                except ValueError as e:
+                    connection.send({"type": protocol.ERROR, "message": f"invalid message: {e}"})
+                    continue
+                self._dispatch(connection, message)
+        except ConnectionError:
+            pass
+        finally:
+            for job in list(connection.jobs.values()):
+                self._cancel(job, notify=False)
+            await connection.close()
+
+    def _dispatch(self, connection: _Connection, message: Dict) -> None:
+        if message["type"] == protocol.SUBMIT:
+            self._submit(connection, message)
+        elif message["type"] == protocol.CANCEL:
+            job = connection.jobs.get(message.get("id"))
+            if job is None:
+                connection.send({"type": protocol.ERROR, "id": message.get("id"), "message": "unknown job"})
+            else:
+                self._cancel(job, notify=True)
+        elif message["type"] == protocol.STATUS:
+            connection.send(self.status())
+        else:
+            connection.send({"type": protocol.ERROR, "message": f"unknown message type {message['type']!r}"})
+
+    def _submit(self, connection: _Connection, message: Dict) -> None:
+        job_id = message.get("id")
+        error = _validate_submit(message, self._factories)
+        if error is None and job_id in connection.jobs:
+            error = "a job with this id is already queued or running"
+        if error is None and len(self._queued) >= self.max_queued:
+            error = "the queue is full"
+        if error is not None:
+            connection.send({"type": protocol.ERROR, "id": job_id, "message": error})
+            return
+
+        progress_interval = message.get("progress_interval", protocol.DEFAULT_PROGRESS_INTERVAL)
+        job = _Job(
+            id=job_id,
+            formula=message["formula"],
+            enumerator=message.get("enumerator", protocol.DEFAULT_ENUMERATOR),
+            priority=message.get("priority", 0),
+            models=message.get("models", False),
+            progress_interval=progress_interval,
+            connection=connection,
+        )
+        position = sum(1 for queued in self._queued if queued.priority >= job.priority)
+        connection.jobs[job.id] = job
+        self._queued.add(job)
+        self._queue.put_nowait((-job.priority, next(self._sequence), job))
+        job.send({"type": protocol.QUEUED, "position": position})
+
+    def _cancel(self, job: _Job, notify: bool) -> None:
+        if job in self._queued:
+            # the job is skipped when it leaves the queue
+            job.cancelled = True
+            self._queued.discard(job)
+            self._finish(job, {"type": protocol.CANCELLED} if notify else None)
+        elif job.task is not None:
+            job.cancelled = True
+            job.task.cancel()
+
+    def _finish(self, job: _Job, message: Dict | None) -> None:
+        job.connection.jobs.pop(job.id, None)
+        if message is not None:
+            job.send(message)
+
+    async def _work(self, slot: _Slot) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            if job.cancelled:
+                continue
+            self._queued.discard(job)
+            self._running.add(job)
+            job.task = asyncio.ensure_future(self._run(slot, job))
+            try:
+                # the cancellation of the job does not stop the worker
+                await asyncio.wait([job.task])
+            except asyncio.CancelledError:
+                job.cancelled = True
+                job.task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await job.task
+                raise
+            finally:
+                self._running.discard(job)
+            if job.task.cancelled():
+                self._finish(job, {"type": protocol.CANCELLED})
+            elif job.task.exception() is not None:
+                error = job.task.exception()
+                self._finish(job, {"type": protocol.ERROR, "message": f"{type(error).__name__}: {error}"})
+            else:
+                self._completed += 1
+                self._finish(job, job.task.result())
+
+    async def _run(self, slot: _Slot, job: _Job) -> Dict:
+        """runs a job in a slot, and returns its done message"""
+        loop = asyncio.get_running_loop()
+        queue_time = time.monotonic() - job.submitted
+        job.send({"type": protocol.STARTED, "queue_time": queue_time})
+
+        def send(message: Dict) -> None:
+            # the listeners run in the thread of the slot, which waits for the messages to be queued (see
+            # _Connection.stream), so that they are sent before the done message
+            asyncio.run_coroutine_threadsafe(job.stream(message), loop).result()
+
+        enumerator, phi = await loop.run_in_executor(slot.executor, slot.prepare, job, send)
+        try:
+            start_time = time.monotonic()
+            sat = await AsyncEnumerator(enumerator, slot.executor).check_all_sat(phi, store_models=job.models)
+            return {
+                "type": protocol.DONE,
+                "sat": bool(sat),
+                "models": enumerator.get_models_count(),
+                "lemmas": len(set(enumerator.get_theory_lemmas())),
+                "time": time.monotonic() - start_time,
+            }
+        finally:
+            # the enumerator has stopped, even if the job was cancelled (see AsyncEnumerator)
+            await asyncio.shield(loop.run_in_executor(slot.executor, _Slot.release, enumerator))
+
+
+def _validate_submit(message: Dict, factories: Dict[str, EnumeratorFactory]) -> str | None:
+    """returns the reason why a submit message is invalid, or None if it is valid"""
+    if not isinstance(message.get("id"), str):
+        return "the id of a job must be a string"
+    if not isinstance(message.get("formula"), str):
+        return "the formula of a job must be an SMT-LIB2 script"
+    if message.get("enumerator", protocol.DEFAULT_ENUMERATOR) not in factories:
+        return f"unknown enumerator, available: {', '.join(sorted(factories))}"
+    priority = message.get("priority", 0)
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        return "the priority of a job must be an integer"
+    if not isinstance(message.get("models", False), bool):
+        return "models must be a boolean"
+    interval = message.get("progress_interval", protocol.DEFAULT_PROGRESS_INTERVAL)
+    if interval is not None and (not isinstance(interval, (int, float)) or interval < 0):
+        return "progress_interval must be a non-negative number or null"
+    return None
+
+
+def _remove_stale_socket(path: str) -> None:
+    """removes the socket of a server which is no longer running, and fails if the server is still running"""
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)
+            return
+    raise OSError(f"a server is already listening on {path}")
@@ -0,0 +1,135 @@
+"""this module exposes the enumerators to asyncio code"""
+
+import asyncio
+import contextlib
+import functools
+from concurrent.futures import Executor
+from typing import AsyncIterator, Callable, List
+
+from pysmt.fnode import FNode
+
+from enumerators.solvers.solver import SMTEnumerator
+from enumerators.util.custom_exceptions import EnumerationCancelled
+
+_END_OF_STREAM = object()
+
+
+class AsyncEnumerator:
+    """runs an enumerator without blocking the event loop
+
+    check_all_sat runs in an executor (the default executor of the loop if executor is None), so that
+    the event loop keeps serving other requests; the pools of MathSATExtendedPartialEnumerator still
+    run in their own processes. Cancelling the task awaiting check_all_sat (or leaving an iteration
+    over iter_models or iter_theory_lemmas early) cancels the enumeration, which stops msat_all_sat and
+    terminates the pool, and waits for the enumerator to be reset before the cancellation propagates.
+
+    An enumerator runs a single enumeration at a time, so concurrent calls on the same AsyncEnumerator
+    are serialized; concurrent requests should be served by distinct enumerators, each with its own
+    pysmt environment (see SMTEnumerator).
+    """
+
+    def __init__(self, enumerator: SMTEnumerator, executor: Executor | None = None):
+        self.enumerator = enumerator
+        self.executor = executor
+        self._lock = asyncio.Lock()
+
+    async def check_all_sat(
+        self, phi: FNode, atoms: List[FNode] | None = None, store_models: bool = False, **kwargs
+    ) -> bool:
+        """Runs All-SMT on the formula phi in the executor, see SMTEnumerator.check_all_sat
+
+        Args:
+            phi (FNode): a pysmt formula
+            atoms (List[FNode] | None) [None]: list of atoms to consider for All-SMT
+            store_models (bool) [False]: if True, the models found during All-SMT are stored
+            **kwargs: other arguments of the check_all_sat of the enumerator
+
+        Returns:
+            bool: SAT or UNSAT, depending on satisfiability of phi
+        """
+        async with self._lock:
+            return await self._run(phi, atoms, store_models, **kwargs)
+
+    async def iter_models(self, phi: FNode, atoms: List[FNode] | None = None, **kwargs) -> AsyncIterator:
+        """Runs All-SMT on the formula phi in the executor and yields its models as they are found
+
+        The models are also stored in the enumerator, as with check_all_sat(..., store_models=True).
+
+        Args:
+            phi (FNode): a pysmt formula
+            atoms (List[FNode] | None) [None]: list of atoms to consider for All-SMT
+            **kwargs: other arguments of the check_all_sat of the enumerator, except resume_from
+
+        Yields:
+            the models of phi
+        """
+        if kwargs.get("resume_from") is not None:
+            raise ValueError("iter_models cannot resume from a checkpoint")
+        async for model in self._stream(self.enumerator.set_models_listener, phi, atoms, True, **kwargs):
+            yield model
+
+    async def iter_theory_lemmas(self, phi: FNode, atoms: List[FNode] | None = None, **kwargs) -> AsyncIterator:
+        """Runs All-SMT on the formula phi in the executor and yields its theory lemmas as they are found
+
+        The lemmas are yielded in the batches harvested by the enumerator (see set_lemmas_listener),
+        e.g. after each extension task of MathSATExtendedPartialEnumerator, each lemma once.
+
+        Args:
+            phi (FNode): a pysmt formula
+            atoms (List[FNode] | None) [None]: list of atoms to consider for All-SMT
+            **kwargs: other arguments of the check_all_sat of the enumerator
+
+        Yields:
+            FNode: the theory lemmas found during All-SMT
+        """
+        async for lemma in self._stream(self.enumerator.set_lemmas_listener, phi, atoms, False, **kwargs):
+            yield lemma
+
+    async def _stream(
+        self, set_listener: Callable, phi: FNode, atoms: List[FNode] | None, store_models: bool, **kwargs
+    ) -> AsyncIterator:
+        """runs check_all_sat and yields the items of the batches passed to the listener set with set_listener"""
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            queue = asyncio.Queue()
+
+            def listener(batch: List) -> None:
+                loop.call_soon_threadsafe(queue.put_nowait, batch)
+
+            set_listener(listener)
+            run = asyncio.ensure_future(self._run(phi, atoms, store_models, **kwargs))
+            run.add_done_callback(lambda _: queue.put_nowait(_END_OF_STREAM))
+            try:
+                # the batches are notified by the executor before the run completes, so they are all
+                # queued before _END_OF_STREAM
+                while True:
+                    batch = await queue.get()
+                    if batch is _END_OF_STREAM:
+                        break
+                    for item in batch:
+                        yield item
+                # raises the exceptions of the enumeration
+                await run
+            finally:
+                if not run.done():
+                    run.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await run
+                set_listener(None)
+
+    async def _run(self, phi: FNode, atoms: List[FNode] | None, store_models: bool, **kwargs) -> bool:
+        """runs check_all_sat in the executor, and cancels it if the awaiting task is cancelled"""
+        loop = asyncio.get_running_loop()
+        # a request left over by a previous cancellation must not stop this run
+        self.enumerator.clear_cancel()
+        future = loop.run_in_executor(
+            self.executor, functools.partial(self.enumerator.check_all_sat, phi, atoms, store_models, **kwargs)
+        )
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self.enumerator.cancel()
+            # the enumerator cannot be reused until it has stopped
+            with contextlib.suppress(EnumerationCancelled):
+                await future
+            raise
@@ -0,0 +1,195 @@
+"""this module shrinks sets of theory lemmas before they are passed to knowledge compilers"""
+
+import math
+import multiprocessing
+import time
+from typing import Dict, Iterable, List
+
+import mathsat
+from pysmt.environment import Environment, get_env
+from pysmt.fnode import FNode
+from pysmt.formula import FormulaContextualizer
+
+from enumerators.formula import get_clause_literals
+from enumerators.util.custom_exceptions import FormulaException
+from enumerators.util.pysmt import contextualize as _contextualize
+
+MSAT_MINIMIZE_OPTIONS = {"model_generation": "false"}
+
+# the workers run in their own processes, in the global pysmt environment
+_SOLVER = None
+
+
+def lemma_size_stats(lemmas: Iterable[FNode]) -> Dict[str, int]:
+    """returns the number of lemmas, and the total and maximum number of literals in a lemma
+
+    Args:
+        lemmas (Iterable[FNode]): a collection of clauses
+
+    Returns:
+        Dict[str, int]: the statistics, with keys "lemmas", "literals" and "max_literals"
+    """
+    sizes = [len(_literals_or_none(lemma) or (lemma,)) for lemma in lemmas]
+    return {"lemmas": len(sizes), "literals": sum(sizes), "max_literals": max(sizes, default=0)}
+
+
+def _literals_or_none(lemma: FNode) -> List[FNode] | None:
+    try:
+        return get_clause_literals(lemma)
+    except FormulaException:
+        return None
+
+
+def _unsat_assumptions(msat_env, assumptions: list) -> list | None:
+    """returns the assumptions in the unsat core of the conjunction of assumptions, or None if it is satisfiable"""
+    result = mathsat.msat_solve_with_assumptions(msat_env, assumptions)
+    if result == mathsat.MSAT_SAT:
+        return None
+    if result != mathsat.MSAT_UNSAT:
+        raise RuntimeError(f"mathsat could not decide a lemma: {mathsat.msat_last_error_message(msat_env)}")
+    return mathsat.msat_get_unsat_assumptions(msat_env)
+
+
+def minimize_lemma(solver, lemma: FNode) -> FNode:
+    """shrinks a T-valid clause to a minimal T-valid subclause
+
+    The negations of the literals of the lemma are passed to solver as assumptions: the unsat
+    core of the assumptions gives a smaller T-unsatisfiable conjunction, whose literals are then
+    dropped one at a time as long as the conjunction stays T-unsatisfiable. Nothing is asserted
+    in solver, so the same solver minimizes any number of lemmas.
+
+    Args:
+        solver: a pysmt mathsat solver, in the environment of lemma
+        lemma (FNode): a clause, which is returned unchanged if it is not T-valid
+
+    Returns:
+        FNode: the minimized clause
+    """
+    literals = _literals_or_none(lemma)
+    if literals is None or len(literals) <= 1:
+        return lemma
+    mgr = solver.environment.formula_manager
+    msat_env = solver.msat_env()
+    assumptions = [solver.converter.convert(mgr.Not(literal)) for literal in literals]
+    literal_of = {mathsat.msat_term_id(term): literal for term, literal in zip(assumptions, literals)}
+
+    core = _unsat_assumptions(msat_env, assumptions)
+    if core is None:
+        return lemma
+    core_ids = {mathsat.msat_term_id(term) for term in core}
+    core = [term for term in assumptions if mathsat.msat_term_id(term) in core_ids]
+    index = 0
+    while index < len(core) and len(core) > 1:
+        candidate = core[:index] + core[index + 1 :]
+        smaller = _unsat_assumptions(msat_env, candidate)
+        if smaller is None:
+            index += 1
+            continue
+        smaller_ids = {mathsat.msat_term_id(term) for term in smaller}
+        core = [term for term in candidate if mathsat.msat_term_id(term) in smaller_ids]
+
+    if len(core) == len(literals):
+        return lemma
+    return mgr.Or([literal_of[mathsat.msat_term_id(term)] for term in core])
+
+
+def remove_subsumed(lemmas: Iterable[FNode]) -> List[FNode]:
+    """removes the duplicate lemmas and the lemmas whose literals include those of another lemma
+
+    Args:
+        lemmas (Iterable[FNode]): a collection of clauses
+
+    Returns:
+        List[FNode]: the lemmas which are not implied by another lemma, in their original order
+    """
+    lemmas = list(dict.fromkeys(lemmas))
+    literal_sets = [frozenset(_literals_or_none(lemma) or (lemma,)) for lemma in lemmas]
+    kept = set()
+    # lemmas containing each literal, among the kept ones
+    occurrences: Dict[FNode, List[int]] = {}
+    for index in sorted(range(len(lemmas)), key=lambda i: len(literal_sets[i])):
+        literals = literal_sets[index]
+        hits: Dict[int, int] = {}
+        subsumed = False
+        for literal in literals:
+            for other in occurrences.get(literal, ()):
+                hits[other] = hits.get(other, 0) + 1
+                if hits[other] == len(literal_sets[other]):
+                    subsumed = True
+                    break
+            if subsumed:
+                break
+        if subsumed:
+            continue
+        kept.add(index)
+        for literal in literals:
+            occurrences.setdefault(literal, []).append(index)
+    return [lemma for index, lemma in enumerate(lemmas) if index in kept]
+
+
+def _initialize_worker(solver_options: dict) -> None:
+    """Initializes a worker with a solver, on which no formula is asserted"""
+    global _SOLVER
+    _SOLVER = get_env().factory.Solver(name="msat", solver_options=solver_options)
+
+
+def _minimize_worker(lemmas: List[FNode]) -> List[FNode]:
+    """Worker function for parallel lemma minimization"""
+    lemmas = _contextualize(FormulaContextualizer(), lemmas)
+    return [minimize_lemma(_SOLVER, lemma) for lemma in lemmas]
+
+
+class LemmaMinimizer:
+    """minimizes each lemma to a minimal T-valid subclause (see minimize_lemma), then removes the subsumed ones
+
+    With parallel_procs > 1, the lemmas are split in chunks which are minimized by a pool of processes.
+
+    After each call to minimize, stats holds the size statistics (see lemma_size_stats) of the lemmas
+    "before" and "after" minimization, the number of "shrunk" and "subsumed" lemmas and the "time" taken.
+    """
+
+    def __init__(self, parallel_procs: int = 1, env: Environment | None = None):
+        if parallel_procs < 1:
+            raise ValueError("parallel_procs must be at least 1")
+        self.parallel_procs = parallel_procs
+        self.env = env if env is not None else get_env()
+        self.stats = {}
+
+    def minimize(self, lemmas: Iterable[FNode]) -> List[FNode]:
+        """returns an equivalent set of smaller lemmas
+
+        Args:
+            lemmas (Iterable[FNode]): T-valid clauses, in the environment of the minimizer
+
+        Returns:
+            List[FNode]: the minimized lemmas
+        """
+        start_time = time.time()
+        lemmas = list(dict.fromkeys(lemmas))
+        if self.parallel_procs <= 1 or len(lemmas) <= 1:
+            with self.env.factory.Solver(name="msat", solver_options=MSAT_MINIMIZE_OPTIONS) as solver:
+                minimized = [minimize_lemma(solver, lemma) for lemma in lemmas]
+        else:
+            # a few chunks per process balance the load without sending each lemma separately
+            chunk_size = math.ceil(len(lemmas) / (4 * self.parallel_procs))
+            chunks = [lemmas[i : i + chunk_size] for i in range(0, len(lemmas), chunk_size)]
+            pool = multiprocessing.Pool(
+                processes=min(self.parallel_procs, len(chunks)),
+                initializer=_initialize_worker,
+                initargs=(MSAT_MINIMIZE_OPTIONS,),
+            )
+            minimized = []
+            with pool:
+                contextualizer = FormulaContextualizer(self.env)
+                for chunk in pool.imap(_minimize_worker, chunks):
+                    minimized.extend(_contextualize(contextualizer, chunk))
+
+        result = remove_subsumed(minimized)
+        self.stats = {
+            "before": lemma_size_stats(lemmas),
+            "after": lemma_size_stats(result),
+            "shrunk": sum(1 for lemma, small in zip(lemmas, minimized) if lemma is not small),
+            "subsumed": len(set(minimized)) - len(result),
+            "time": time.time() - start_time,
+        }
+        return result
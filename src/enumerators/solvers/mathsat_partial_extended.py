@@ -2,83 +2,123 @@
 
 import multiprocessing
 import time
-from typing import Dict, List
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Literal
 
 import mathsat
-from allsat_cnf.polarity_cnfizer import PolarityCNFizer
+from pysmt.environment import Environment
 from pysmt.fnode import FNode
 from pysmt.formula import FormulaContextualizer
-from pysmt.shortcuts import And, Solver
+from pysmt.shortcuts import BOOL, And, Solver
 from pysmt.solvers.msat import MathSAT5Solver
 
 from enumerators.constants import SAT, UNSAT
 from enumerators.formula import get_theory_atoms
 from enumerators.solvers.solver import SMTEnumerator
-from enumerators.util.collections import Nested, map_nested
-from enumerators.util.pysmt import SuspendTypeChecking
+from enumerators.util.checkpoint import Checkpointer, EnumerationCheckpoint, formula_fingerprint
+from enumerators.util.cnf_cache import CNFCache
+from enumerators.util.cpu import available_cpu_ids, available_cpus, choose_workers, pin_to_cpu
+from enumerators.util.custom_exceptions import CheckpointException
+from enumerators.util.formula_index import get_formula_index
+from enumerators.util.progress import SharedModelsCounter
+from enumerators.util.pysmt import contextualize as _contextualize
+from enumerators.util.resources import ResourceReport, WorkerUsageTracker
+from .mathsat_profiles import MathSATProfile, apply_profile
 from .mathsat_utils import (
     MSAT_PARTIAL_ENUM_OPTIONS,
     MSAT_TOTAL_ENUM_OPTIONS,
     _allsat_callback_count,
     _allsat_callback_store,
+    _check_preferred_terms_support,
+    _dump_smtlib_template,
+    _load_smtlib_template,
+    _set_preferred_terms,
 )
 
 
-def _contextualize(contextualizer: FormulaContextualizer, formulas: Nested[FNode]) -> Nested[FNode]:
-    """Contextualizes a collection of formulas using the provided contextualizer
+# the workers run in their own processes, in the global pysmt environment
+_PARTIAL_MODELS = []
+_PHI_ATOMS = []
+_SOLVER: MathSAT5Solver | None = None
+_MODELS_COUNTER: SharedModelsCounter | None = None
+_USAGE: WorkerUsageTracker | None = None
 
-    Args:
-        contextualizer: the FormulaContextualizer to use
-        formulas: collection of formulas to contextualize
+# seconds between two checks for cancellation while the pool runs
+_CANCEL_POLL_INTERVAL = 0.1
 
-    Returns:
-        the contextualized formulas
-    """
-    with SuspendTypeChecking():
-        return map_nested(lambda f: contextualizer.walk(f), formulas)
 
+@dataclass
+class _ExtensionRun:
+    """the state of the extension of the partial models to total ones during a call to check_all_sat"""
 
-_PARTIAL_MODELS = []
-_TLEMMAS = []
-_PHI = None
-_PHI_ATOMS = []
-_SOLVER: MathSAT5Solver | None = None
+    phi: FNode
+    atoms: List[FNode]
+    partial_models: List[set]
+    store_models: bool
+    incremental: bool
+    completed_tasks: set
+    build_checkpoint: Callable[[], EnumerationCheckpoint]
+    total_solver_ready: bool = False
+    converted_atoms: list = field(default_factory=list)
+    # seconds spent by mathsat on the last task extended sequentially, from its push to its pop
+    last_task_time: float = 0.0
 
 
 def _initialize_worker(
-    partial_models: List[List[FNode]], phi: FNode, phi_atoms: List[FNode], tlemmas: List[FNode], solver_options: dict
+    partial_models: List[List[FNode]],
+    template: str,
+    phi_atoms: List[FNode],
+    solver_options: dict,
+    prefer_projected_atoms: bool = False,
+    cpu_ids: List[int] | None = None,
+    cpu_counter=None,
+    models_counter=None,
+    progress_interval: float = 1.0,
 ) -> None:
-    global _PARTIAL_MODELS, _PHI, _TLEMMAS, _SOLVER, _PHI_ATOMS
+    """Initializes a worker with the template of phi and the lemmas built by _build_worker_template"""
+    global _PARTIAL_MODELS, _SOLVER, _PHI_ATOMS, _MODELS_COUNTER, _USAGE
+
+    _USAGE = WorkerUsageTracker()
+    if cpu_ids:
+        pin_to_cpu(cpu_ids, cpu_counter)
+    # the models found by the workers are aggregated in models_counter to report the progress
+    _MODELS_COUNTER = SharedModelsCounter(models_counter, progress_interval) if models_counter is not None else None
 
     contextualizer = FormulaContextualizer()
 
     _PARTIAL_MODELS = partial_models
-    _TLEMMAS = _contextualize(contextualizer, tlemmas)
-    _PHI = _contextualize(contextualizer, phi)
 
     _SOLVER = Solver("msat", solver_options=solver_options)
+    # phi and the lemmas are parsed natively by mathsat, without pysmt conversion
+    _load_smtlib_template(_SOLVER, template)
 
     _PHI_ATOMS = _contextualize(contextualizer, phi_atoms)
     _PHI_ATOMS = [_SOLVER.converter.convert(a) for a in _PHI_ATOMS]
 
-    _SOLVER.add_assertion(_PHI)
-    _SOLVER.add_assertion(And(_TLEMMAS))
+    if prefer_projected_atoms:
+        _set_preferred_terms(_SOLVER.msat_env(), _PHI_ATOMS)
 
 
 def _parallel_worker(args: tuple) -> tuple:
     """Worker function for parallel all-smt extension
 
     Args:
-        args: tuple of (partial_model, phi, atoms, solver_options_dict_total, tlemmas)
+        args: tuple of (model_id, store_models)
 
     Returns:
-        tuple of local_models, total_lemmas
+        tuple of model_id, local_models, local_models_count, total_lemmas, and the WorkerUsage of the worker
     """
-    global _SOLVER, _TLEMMAS, _PHI, _PHI_ATOMS, _PARTIAL_MODELS
+    with _USAGE.task():
+        model_id, found_models, found_models_count, found_tlemmas = _extend_partial_model(*args)
+    return model_id, found_models, found_models_count, found_tlemmas, _USAGE.snapshot()
 
-    model_id, store_models = args
+
+def _extend_partial_model(model_id: int, store_models: bool) -> tuple:
+    """extends a partial model to total ones with the solver of the worker"""
+    global _SOLVER, _PHI_ATOMS, _PARTIAL_MODELS
 
     local_solver = _SOLVER
+    on_model = _MODELS_COUNTER.model_found if _MODELS_COUNTER is not None else None
     local_converter = local_solver.converter
 
     contextualizer = FormulaContextualizer()
@@ -94,157 +134,483 @@ def _parallel_worker(args: tuple) -> tuple:
     found_models = []
     found_models_count = 0
     if store_models:
-        mathsat.msat_all_sat(
-            local_solver.msat_env(),
-            converted_atoms,
-            callback=lambda model: _allsat_callback_store(model, local_converter, found_models),
-        )
+        with _USAGE.solver():
+            mathsat.msat_all_sat(
+                local_solver.msat_env(),
+                converted_atoms,
+                callback=lambda model: _allsat_callback_store(model, local_converter, found_models, on_model),
+            )
         found_models_count = len(found_models)
     else:
         models_count_l = [0]
-        mathsat.msat_all_sat(
-            local_solver.msat_env(), converted_atoms, callback=lambda _: _allsat_callback_count(models_count_l)
-        )
+        with _USAGE.solver():
+            mathsat.msat_all_sat(
+                local_solver.msat_env(),
+                converted_atoms,
+                callback=lambda _: _allsat_callback_count(models_count_l, on_model),
+            )
         found_models_count = models_count_l[0]
 
     found_tlemmas = [local_converter.back(l) for l in mathsat.msat_get_theory_lemmas(local_solver.msat_env())]
 
     local_solver.pop()
     local_solver.add_assertion(And(found_tlemmas))
+    if _MODELS_COUNTER is not None:
+        _MODELS_COUNTER.flush()
 
-    return found_models, found_models_count, found_tlemmas
+    return model_id, found_models, found_models_count, found_tlemmas
 
 
 class MathSATExtendedPartialEnumerator(SMTEnumerator):
     """A wrapper for the mathsat T-solver.
 
     Computes all-SMT by first computing partial assignments and then extending them to total ones.
-    The result of the enumeration is a total enumeration of truth assignments."""
+    The result of the enumeration is a total enumeration of truth assignments.
+
+    If checkpoint_path is given, the state of the enumeration (partial models, completed extension
+    tasks, lemmas and models) is periodically saved there, at most once every checkpoint_interval
+    seconds, so that an interrupted run can be resumed with check_all_sat(..., resume_from=checkpoint_path).
+
+    The CNF conversions of phi are memoized across calls (see CNFCache), so that repeated runs on
+    phi conjoined with lemmas, as done by WithPartitioningWrapper, do not CNF-ize phi again.
+
+    With check_all_sat(..., incremental=True), phi stays asserted across calls on the same phi:
+    each call enumerates inside push/pop scopes and the lemmas it finds are then asserted
+    permanently, so that later calls (e.g. on other partitions of the atoms) reuse them.
+
+    If prefer_projected_atoms is True, mathsat branches on the atoms of the enumeration before any
+    other variable, in both phases. If prefer_cnf_labels is True, in the partial phase it then
+    branches on the labels introduced by the CNF conversion, before the other Boolean variables.
+
+    If parallel_procs is "auto", the first partial model is extended sequentially to estimate the
+    cost of each extension, and the others are extended either sequentially or by a pool whose size
+    (see choose_workers) is bounded by the CPUs actually available to the process, given its affinity
+    and its cgroup quota. If pin_workers is True, each worker of the pool is pinned to its own CPU.
+    The pool is started with the start method mp_context (see multiprocessing.get_context), the
+    default one of the platform if None; an enumerator which runs in a thread of a process with other
+    threads, e.g. in EnumerationServer, needs "forkserver" or "spawn", since forking that process
+    would copy the locks held by the other threads.
+
+    The workers of the pool send back the resources they used (CPU time, peak RSS, tasks, and time
+    spent running tasks and in msat_all_sat) with their results, stamped with the time they are sent
+    to measure the time spent in IPC; after a run which used a pool, they are aggregated by
+    get_resource_report, and logged as "Worker resources".
+
+    If msat_profile is given (by name, see load_profile), its options override the defaults of
+    mathsat in both phases and in the workers, except those which the lemmas rely on.
+    """
+
+    SUPPORTS_INCREMENTAL = True
 
     def __init__(
-        self, computation_logger: Dict | None = None, project_on_theory_atoms: bool = True, parallel_procs: int = 1
+        self,
+        computation_logger: Dict | None = None,
+        project_on_theory_atoms: bool = True,
+        parallel_procs: int | Literal["auto"] = 1,
+        checkpoint_path: str | None = None,
+        checkpoint_interval: float = 60.0,
+        models_buffer_size: int | None = None,
+        models_spill_path: str | None = None,
+        prefer_projected_atoms: bool = False,
+        prefer_cnf_labels: bool = False,
+        pin_workers: bool = False,
+        env: Environment | None = None,
+        lift_term_ite: bool = False,
+        msat_profile: str | MathSATProfile | None = None,
+        mp_context: str | None = None,
     ):
-        super().__init__(computation_logger=computation_logger)
-        if parallel_procs < 1 or parallel_procs > multiprocessing.cpu_count():
-            raise ValueError("parallel_procs must be between 1 and the number of CPU cores")
-        self.solver_partial = Solver("msat", solver_options=MSAT_PARTIAL_ENUM_OPTIONS)
-        self.solver_total = Solver("msat", solver_options=MSAT_TOTAL_ENUM_OPTIONS)
+        super().__init__(
+            computation_logger=computation_logger,
+            models_buffer_size=models_buffer_size,
+            models_spill_path=models_spill_path,
+            env=env,
+            lift_term_ite=lift_term_ite,
+        )
+        if parallel_procs != "auto" and (
+            not isinstance(parallel_procs, int) or parallel_procs < 1 or parallel_procs > multiprocessing.cpu_count()
+        ):
+            raise ValueError('parallel_procs must be between 1 and the number of CPU cores, or "auto"')
+        if checkpoint_path is not None and models_buffer_size is not None and models_spill_path is None:
+            # the temporary spill files are removed with their sink, the checkpoint could not be resumed
+            raise ValueError("models_spill_path must be given to checkpoint models kept in a bounded buffer")
+        if prefer_projected_atoms or prefer_cnf_labels:
+            _check_preferred_terms_support()
+        self._partial_options = apply_profile(MSAT_PARTIAL_ENUM_OPTIONS, msat_profile)
+        self._total_options = apply_profile(MSAT_TOTAL_ENUM_OPTIONS, msat_profile)
+        self.solver_partial = self.env.factory.Solver(name="msat", solver_options=self._partial_options)
+        self.solver_total = self.env.factory.Solver(name="msat", solver_options=self._total_options)
         self.reset()
         self._converter_partial = self.solver_partial.converter
         self._converter_total = self.solver_total.converter
         self._project_on_theory_atoms = project_on_theory_atoms
         self._parallel_procs = parallel_procs
+        self._pin_workers = pin_workers
+        self._mp_context = multiprocessing.get_context(mp_context)
+        self._prefer_projected_atoms = prefer_projected_atoms
+        self._prefer_cnf_labels = prefer_cnf_labels
+        self._checkpointer = Checkpointer(checkpoint_path, checkpoint_interval)
+        self._cnf_cache = CNFCache(env=self.env)
 
     def reset(self):
         self.solver_partial.reset_assertions()
         self.solver_total.reset_assertions()
+        self._incremental_phi = None
+        self._incremental_lemmas = set()
         self._tlemmas = []
-        self._models = []
+        self._models = self._new_models_store()
         self._models_count = 0
-
-    def check_all_sat(self, phi: FNode, atoms: List[FNode] | None = None, store_models: bool = False) -> bool:
-        self.check_supports(phi)
-        self.reset()
-
-        atoms = phi.get_atoms() if atoms is None else atoms
+        self._resource_report = None
+
+    def get_resource_report(self) -> ResourceReport | None:
+        """returns the resources used by the workers of the pool during the last call to check_all_sat,
+        or None if the partial models were not extended by a pool"""
+        return self._resource_report
+
+    def check_all_sat(
+        self,
+        phi: FNode,
+        atoms: List[FNode] | None = None,
+        store_models: bool = False,
+        resume_from: str | None = None,
+        incremental: bool = False,
+    ) -> bool:
+        """Runs All-SMT on the formula phi and stores t-lemmas
+
+        Args:
+            phi (FNode): a pysmt formula
+            atoms (List[FNode] | None) [None]: list of atoms to consider for All-SMT
+            store_models (bool) [False]: if True, the models found during All-SMT are stored
+            resume_from (str | None) [None]: path of a checkpoint of a previous run on the same phi and atoms,
+                the partial enumeration and the completed extension tasks are not repeated
+            incremental (bool) [False]: if True and phi is the formula of the previous incremental call,
+                phi and the lemmas found so far are not asserted again
+
+        Returns:
+            bool: SAT or UNSAT, depending on satisfiability of phi
+        """
+        if incremental and resume_from is not None:
+            raise ValueError("resume_from cannot be used in incremental mode")
+        phi, atoms = self._lift_term_ite(phi, atoms)
+        if self._is_lifted and (resume_from is not None or self._checkpointer.is_enabled()):
+            # the fresh variables of the lifted term-ITEs are not the same in another process
+            raise ValueError("checkpoints cannot be used on formulas with lifted term-ITEs")
+        if incremental and self._incremental_phi is phi:
+            self._tlemmas = []
+            self._models = self._new_models_store()
+            self._models_count = 0
+            self._resource_report = None
+        else:
+            self.check_supports(phi, self.env)
+            self.reset()
+            if incremental:
+                self.solver_partial.add_assertion(self._cnf_cache.convert(phi))
+                self.solver_total.add_assertion(phi)
+                self._incremental_phi = phi
+
+        atoms = get_formula_index(phi, self.env).atoms if atoms is None else atoms
         if self._project_on_theory_atoms:
             atoms = get_theory_atoms(atoms)
         self.atoms = atoms
+        self._progress.start("partial")
+        # lemmas learned by previous incremental calls are not streamed again
+        self._start_lemmas_stream(self._incremental_lemmas if incremental else ())
+
+        fingerprint = None
+        if resume_from is not None or self._checkpointer.is_enabled():
+            fingerprint = formula_fingerprint(phi, atoms)
+
+        checkpoint = None
+        if resume_from is not None:
+            checkpoint = EnumerationCheckpoint.load(resume_from, fingerprint, self.env)
+            if store_models and len(checkpoint.models) != checkpoint.models_count:
+                raise CheckpointException("Cannot store models when resuming from a checkpoint without models")
+
+        completed_tasks = set()
+        if checkpoint is not None and checkpoint.partial_models is not None:
+            partial_models = checkpoint.partial_models
+            completed_tasks = checkpoint.completed_tasks
+            self._tlemmas = checkpoint.tlemmas
+            self._models = checkpoint.resume_models() if store_models else self._new_models_store()
+            self._models_count = checkpoint.models_count
+            if self._computation_logger is not None:
+                self._computation_logger["Resumed tasks"] = len(completed_tasks)
+        else:
+            partial_models = self._enumerate_partial_models(phi, atoms, incremental)
+        self._stream_lemmas(self._tlemmas)
+
+        def build_checkpoint() -> EnumerationCheckpoint:
+            return EnumerationCheckpoint(
+                fingerprint=fingerprint,
+                partial_models=partial_models,
+                completed_tasks=completed_tasks,
+                tlemmas=list(set(self._tlemmas)),
+                models=self._models,
+                models_count=self._models_count,
+            )
 
-        phi_cnf = PolarityCNFizer(nnf=True, mutex_nnf_labels=True).convert_as_formula(phi)
-        self.solver_partial.add_assertion(phi_cnf)
-
-        start_time = time.time()
-        partial_models = []
-        mathsat.msat_all_sat(
-            self.solver_partial.msat_env(),
-            self.get_converted_atoms(atoms, self._converter_partial),
-            callback=lambda model: _allsat_callback_store(model, self._converter_partial, partial_models),
-        )
-
-        self._tlemmas = [
-            self._converter_partial.back(l) for l in mathsat.msat_get_theory_lemmas(self.solver_partial.msat_env())
-        ]
+        # the partial enumeration is the only phase which cannot be resumed halfway
+        self._checkpointer.maybe_save(build_checkpoint, force=True)
 
-        end_time = time.time()
         if self._computation_logger is not None:
-            self._computation_logger["Partial AllSMT time"] = end_time - start_time
             self._computation_logger["Partial models"] = len(partial_models)
 
+        self._progress.update(
+            phase="extension",
+            partial_models=len(partial_models),
+            tasks_total=len(partial_models),
+            tasks_completed=len(completed_tasks),
+            models=self._models_count,
+            lemmas=len(self._tlemmas),
+            force=True,
+        )
+
         if len(partial_models) == 0:
+            if incremental:
+                self._end_incremental_run()
+            self._progress.update(phase="done", force=True)
             return UNSAT
 
-        if self._parallel_procs <= 1:
-            self.solver_total.add_assertion(phi)
-            self.solver_total.add_assertions(self._tlemmas)
-            converted_atoms = self.get_converted_atoms(atoms, self._converter_total)
-
-            for m in partial_models:
-                self.solver_total.push()
-                self.solver_total.add_assertions(m)
-
-                if store_models:
-                    models = []
-                    mathsat.msat_all_sat(
-                        self.solver_total.msat_env(),
-                        converted_atoms,
-                        callback=lambda model: _allsat_callback_store(model, self._converter_total, models),
-                    )
-                    self._models_count += len(models)
-                    self._models.extend(models)
-                else:
-                    models_count_l = [0]
-                    mathsat.msat_all_sat(
-                        self.solver_total.msat_env(),
-                        converted_atoms,
-                        callback=lambda _: _allsat_callback_count(models_count_l),
-                    )
-                    self._models_count += models_count_l[0]
+        pending_tasks = [i for i in range(len(partial_models)) if i not in completed_tasks]
+        extension = _ExtensionRun(
+            phi, atoms, partial_models, store_models, incremental, completed_tasks, build_checkpoint
+        )
+
+        if self._parallel_procs == "auto":
+            procs = 1
+            max_procs = min(available_cpus(), len(pending_tasks))
+            if max_procs > 1:
+                # the first task is run sequentially to estimate the cost of the others
+                self._extend_sequentially(extension, pending_tasks[:1])
+                pending_tasks = pending_tasks[1:]
+                procs = choose_workers(len(pending_tasks), extension.last_task_time, max_procs)
+        else:
+            procs = self._parallel_procs
+        if self._computation_logger is not None:
+            self._computation_logger["Parallel processes"] = procs
+
+        if procs <= 1:
+            self._extend_sequentially(extension, pending_tasks)
+        elif len(pending_tasks) > 0:
+            self._extend_in_pool(extension, pending_tasks, procs)
+
+        if incremental:
+            self._end_incremental_run()
+        else:
+            self._tlemmas = list(set(self._tlemmas))
+        self._checkpointer.maybe_save(build_checkpoint, force=True)
 
-                tlemmas_total = [
-                    self._converter_total.back(l) for l in mathsat.msat_get_theory_lemmas(self.solver_total.msat_env())
-                ]
+        if self._computation_logger is not None:
+            self._computation_logger["Total models"] = self._models_count
+
+        self._progress.update(phase="done", models=self._models_count, lemmas=len(self._tlemmas), force=True)
+        return SAT
 
-                self._tlemmas += tlemmas_total
-                self.solver_total.pop()
+    def _extend_sequentially(self, extension: _ExtensionRun, tasks: List[int]) -> None:
+        """Extends the partial models with the given ids to total ones, with the total solver"""
+        if not extension.total_solver_ready:
+            if not extension.incremental:
+                self.solver_total.add_assertion(extension.phi)
+            self.solver_total.add_assertions(self._tlemmas)
+            extension.converted_atoms = self.get_converted_atoms(extension.atoms, self._converter_total)
+            if self._prefer_projected_atoms:
+                _set_preferred_terms(self.solver_total.msat_env(), extension.converted_atoms)
+            extension.total_solver_ready = True
+        converted_atoms = extension.converted_atoms
+        on_model = self._progress.model_found if self._progress.is_enabled() else None
+
+        for model_id in tasks:
+            # the time of the task leaves out the setup of the solver above and the conversion of the lemmas
+            task_start_time = time.perf_counter()
+            self.solver_total.push()
+            self.solver_total.add_assertions(extension.partial_models[model_id])
+
+            if extension.store_models:
+                models = []
+                mathsat.msat_all_sat(
+                    self.solver_total.msat_env(),
+                    converted_atoms,
+                    callback=lambda model: _allsat_callback_store(
+                        model, self._converter_total, models, on_model, self._cancel_event
+                    ),
+                )
+                self._models_count += len(models)
+                self._models.extend(models)
+            else:
+                models_count_l = [0]
+                mathsat.msat_all_sat(
+                    self.solver_total.msat_env(),
+                    converted_atoms,
+                    callback=lambda _: _allsat_callback_count(models_count_l, on_model, self._cancel_event),
+                )
+                self._models_count += models_count_l[0]
+            self._check_cancelled()
+
+            msat_lemmas = mathsat.msat_get_theory_lemmas(self.solver_total.msat_env())
+            self.solver_total.pop()
+            extension.last_task_time = time.perf_counter() - task_start_time
+
+            tlemmas_total = [self._converter_total.back(l) for l in msat_lemmas]
+            self._tlemmas += tlemmas_total
+            self._stream_lemmas(tlemmas_total)
+
+            self.solver_total.add_assertion(self.env.formula_manager.And(tlemmas_total))
+
+            extension.completed_tasks.add(model_id)
+            self._checkpointer.maybe_save(extension.build_checkpoint)
+            self._progress.update(
+                tasks_completed=len(extension.completed_tasks), models=self._models_count, lemmas=len(self._tlemmas)
+            )
 
-                self.solver_total.add_assertion(And(tlemmas_total))
+    def _extend_in_pool(self, extension: _ExtensionRun, tasks: List[int], procs: int) -> None:
+        """Extends the partial models with the given ids to total ones, with a pool of procs workers"""
+        # Prepare arguments for each worker
+        worker_args = [(i, extension.store_models) for i in tasks]
 
+        # phi and the lemmas are converted once here, and shared with the workers as a mathsat dump
+        start_time = time.time()
+        phi_and_lemmas = self.env.formula_manager.And(extension.phi, *self._tlemmas, *self._incremental_lemmas)
+        template = _dump_smtlib_template(self.solver_total, phi_and_lemmas)
+        if self._computation_logger is not None:
+            self._computation_logger["Worker template time"] = time.time() - start_time
+
+        cpu_ids = available_cpu_ids() if self._pin_workers else []
+        # the workers add the models they find to models_counter, the results only arrive at the end of each task
+        models_counter = self._mp_context.Value("q", 0) if self._progress.is_enabled() else None
+        models_before = self._models_count
+        usages = []
+        result_time = 0.0
+        ipc_time = 0.0
+        pool_start_time = time.monotonic()
+        # Use a process pool to maintain constant number of workers
+        pool = self._mp_context.Pool(
+            processes=procs,
+            initializer=_initialize_worker,
+            initargs=(
+                extension.partial_models,
+                template,
+                extension.atoms,
+                self._total_options,
+                self._prefer_projected_atoms,
+                cpu_ids,
+                self._mp_context.Value("i", 0),
+                models_counter,
+                self._progress.interval,
+            ),
+        )
+        with pool:
+            # Use imap_unordered to process results as they complete
+            results = pool.imap_unordered(_parallel_worker, worker_args)
+            # the loop wakes up periodically to report the progress and to check for cancellation,
+            # leaving the pool on cancellation terminates the workers
+            timeout = min(self._progress.interval, _CANCEL_POLL_INTERVAL)
+            while True:
+                try:
+                    model_id, models, models_count, lemmas_batch, usage = results.next(timeout)
+                    # the clocks of the processes are compared, a result cannot arrive before it is sent
+                    ipc_time += max(0.0, time.time() - usage.sent_at)
+                except multiprocessing.TimeoutError:
+                    self._check_cancelled()
+                    if models_counter is not None:
+                        self._progress.update(models=models_before + models_counter.value)
+                    continue
+                except StopIteration:
+                    break
+                self._check_cancelled()
+                result_start_time = time.monotonic()
+                usages.append(usage)
+                contextualizer = FormulaContextualizer(self.env)
+                self._models.extend(_contextualize(contextualizer, models))
+                lemmas_batch = _contextualize(contextualizer, lemmas_batch)
+                self._tlemmas.extend(lemmas_batch)
+                self._stream_lemmas(lemmas_batch)
+                self._models_count += models_count
+
+                extension.completed_tasks.add(model_id)
+                self._checkpointer.maybe_save(extension.build_checkpoint)
+                if models_counter is not None:
+                    self._progress.update(
+                        tasks_completed=len(extension.completed_tasks),
+                        models=models_before + models_counter.value,
+                        lemmas=len(self._tlemmas),
+                    )
+                result_time += time.monotonic() - result_start_time
+
+        self._resource_report = ResourceReport.from_usages(
+            procs, time.monotonic() - pool_start_time, result_time, usages, ipc_time
+        )
+        if self._computation_logger is not None:
+            self._computation_logger["Worker resources"] = self._resource_report.as_dict()
+
+    def _end_incremental_run(self) -> None:
+        """keeps only the new lemmas of the run, and asserts them for the next runs"""
+        # mathsat also reports the lemmas learned in previous runs
+        self._tlemmas = [l for l in dict.fromkeys(self._tlemmas) if l not in self._incremental_lemmas]
+        self._incremental_lemmas.update(self._tlemmas)
+        self.solver_partial.add_assertions(self._tlemmas)
+        self.solver_total.add_assertions(self._tlemmas)
+
+    def _enumerate_partial_models(self, phi: FNode, atoms: List[FNode], incremental: bool = False) -> List[set]:
+        """Enumerates the partial models of phi over atoms and stores the lemmas found
+
+        Args:
+            phi (FNode): a pysmt formula
+            atoms (List[FNode]): list of atoms to consider for All-SMT
+            incremental (bool) [False]: if True, phi is already asserted and the enumeration runs in a push/pop scope
+
+        Returns:
+            List[set]: the partial models of phi
+        """
+        start_time = time.time()
+        phi_cnf = self._cnf_cache.convert(phi)
+        if self._computation_logger is not None:
+            self._computation_logger["CNF time"] = time.time() - start_time
+        if incremental:
+            self.solver_partial.push()
         else:
-            # Prepare arguments for each worker
-            worker_args = [(i, store_models) for i in range(len(partial_models))]
-
-            # Use a process pool to maintain constant number of workers
-            new_tlemmas = []
-            pool = multiprocessing.Pool(
-                processes=self._parallel_procs,
-                initializer=_initialize_worker,
-                initargs=(partial_models, phi, atoms, self._tlemmas, MSAT_TOTAL_ENUM_OPTIONS),
+            self.solver_partial.add_assertion(phi_cnf)
+
+        converted_atoms = self.get_converted_atoms(atoms, self._converter_partial)
+        preferred = converted_atoms if self._prefer_projected_atoms else []
+        if self._prefer_cnf_labels:
+            labels = self.env.fvo.get_free_variables(phi_cnf) - self.env.fvo.get_free_variables(phi)
+            preferred = preferred + self.get_converted_atoms(
+                sorted((label for label in labels if label.is_symbol(BOOL)), key=lambda v: v.symbol_name()),
+                self._converter_partial,
             )
-            with pool:
-                # Use imap_unordered to process results as they complete
-                for models, models_count, lemmas_batch in pool.imap_unordered(_parallel_worker, worker_args):
-                    contextualizer = FormulaContextualizer()
-                    self._models.extend(_contextualize(contextualizer, models))
-                    new_tlemmas.extend(_contextualize(contextualizer, lemmas_batch))
-                    self._models_count += models_count
+        if len(preferred) > 0:
+            _set_preferred_terms(self.solver_partial.msat_env(), preferred)
 
-            self._tlemmas.extend(new_tlemmas)
+        start_time = time.time()
+        partial_models = []
+        on_model = self._progress.partial_model_found if self._progress.is_enabled() else None
+        mathsat.msat_all_sat(
+            self.solver_partial.msat_env(),
+            converted_atoms,
+            callback=lambda model: _allsat_callback_store(
+                model, self._converter_partial, partial_models, on_model, self._cancel_event
+            ),
+        )
+        self._check_cancelled()
 
-        self._tlemmas = list(set(self._tlemmas))
+        self._tlemmas = [
+            self._converter_partial.back(l) for l in mathsat.msat_get_theory_lemmas(self.solver_partial.msat_env())
+        ]
+        if incremental:
+            self.solver_partial.pop()
 
+        end_time = time.time()
         if self._computation_logger is not None:
-            self._computation_logger["Total models"] = self._models_count
+            self._computation_logger["Partial AllSMT time"] = end_time - start_time
 
-        return SAT
+        return partial_models
 
     def get_theory_lemmas(self) -> List[FNode]:
         """Returns the theory lemmas found during the All-SAT computation"""
-        return self._tlemmas
+        return self._restore_lemmas(self._tlemmas)
 
     def get_models(self) -> List:
         """Returns the models found during the All-SAT computation"""
-        return self._models
+        return self._restore_models(self._models)
 
     def get_models_count(self) -> int:
         return self._models_count
@@ -0,0 +1,123 @@
+"""this module defines the mathsat options which can be tuned without breaking the lemmas, and their profiles"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+# the options of MSAT_ENUM_OPTIONS which the lemmas rely on: without them mathsat may simplify phi
+# into a non-equivalent formula, introduce atoms which are not in phi (rational equality splits,
+# bit-blasting, branch-and-bound cuts once the internal limit is reached) or not store the lemmas
+PROTECTED_OPTIONS = frozenset(
+    {
+        "model_generation",
+        "preprocessor.toplevel_propagation",
+        "preprocessor.simplification",
+        "dpll.store_tlemmas",
+        "dpll.allsat_minimize_model",
+        "theory.la.split_rat_eq",
+        "theory.bv.eager",
+        "theory.la.laz_internal_branch_and_bound",
+        "theory.la.laz_internal_branch_and_bound_limit",
+    }
+)
+
+# the directory of the profiles loaded by name, if ENUMERATORS_PROFILES_DIR is not set
+DEFAULT_PROFILES_DIR = os.path.join(os.path.expanduser("~"), ".enumerators", "profiles")
+
+
+@dataclass(frozen=True)
+class TunableOption:
+    """a mathsat option which only affects the search, with the values tried by the autotuner"""
+
+    name: str
+    values: Tuple[str, ...]
+    # the theories whose formulas are affected by the option, all if empty
+    theories: Tuple[str, ...] = ()
+
+    def applies_to(self, theory: str) -> bool:
+        """True if the option affects the formulas of theory"""
+        return len(self.theories) == 0 or theory in self.theories
+
+
+# the autotuner starts from the defaults of mathsat and tries the other values; a value which mathsat
+# rejects (e.g. an option unknown to its version) is discarded
+TUNABLE_OPTIONS = (
+    TunableOption("dpll.branching_initial_phase", ("0", "1", "2")),
+    TunableOption("dpll.branching_cache_phase", ("0", "1", "2")),
+    TunableOption("dpll.branching_random_frequency", ("0", "0.01", "0.05")),
+    TunableOption("dpll.restart_strategy", ("0", "1", "2", "3")),
+    TunableOption("dpll.glucose_var_activity", ("true", "false")),
+    TunableOption("dpll.glucose_learnt_minimization", ("true", "false")),
+    TunableOption("theory.la.pure_equality_filtering", ("true", "false"), ("LRA", "LIA")),
+)
+
+
+@dataclass(frozen=True)
+class MathSATProfile:
+    """mathsat options tuned for the formulas of a theory, which override the defaults of the enumerators
+
+    Raises:
+        ValueError: if an option is protected, since overriding it would break the lemmas
+    """
+
+    name: str
+    theory: str
+    options: Dict[str, str] = field(default_factory=dict)
+    # how the profile was obtained, e.g. the corpus and the scores of the autotuner
+    info: Dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        protected = sorted(PROTECTED_OPTIONS.intersection(self.options))
+        if protected:
+            raise ValueError(f"the profile overrides protected options: {', '.join(protected)}")
+
+    def apply(self, solver_options: Dict[str, str]) -> Dict[str, str]:
+        """returns solver_options overridden by the options of the profile"""
+        return {**solver_options, **self.options}
+
+    def save(self, directory: str | None = None) -> str:
+        """writes the profile as JSON in directory (see profiles_dir), and returns its path"""
+        directory = profiles_dir(directory)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"name": self.name, "theory": self.theory, "options": self.options, "info": self.info},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        return path
+
+
+def profiles_dir(directory: str | None = None) -> str:
+    """returns directory, or the directory of the profiles given by ENUMERATORS_PROFILES_DIR or DEFAULT_PROFILES_DIR"""
+    if directory is not None:
+        return directory
+    return os.environ.get("ENUMERATORS_PROFILES_DIR", DEFAULT_PROFILES_DIR)
+
+
+def load_profile(name: str, directory: str | None = None) -> MathSATProfile:
+    """loads the profile saved with the given name
+
+    Args:
+        name (str): the name of the profile
+        directory (str | None) [None]: the directory of the profile, see profiles_dir
+
+    Returns:
+        MathSATProfile: the profile
+    """
+    path = os.path.join(profiles_dir(directory), f"{name}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return MathSATProfile(data["name"], data["theory"], data["options"], data.get("info", {}))
+
+
+def apply_profile(solver_options: Dict[str, str], profile: "str | MathSATProfile | None") -> Dict[str, str]:
+    """returns solver_options overridden by profile, which is loaded if given by name"""
+    if profile is None:
+        return solver_options
+    if isinstance(profile, str):
+        profile = load_profile(profile)
+    return profile.apply(solver_options)
@@ -3,22 +3,56 @@
 from typing import Dict, Iterable, List
 
 import mathsat
+from pysmt.environment import Environment
 from pysmt.fnode import FNode
-from pysmt.shortcuts import Solver
 
 from enumerators.constants import SAT, UNSAT
 from enumerators.formula import get_theory_atoms
 from enumerators.solvers.solver import SMTEnumerator
-from enumerators.solvers.mathsat_utils import MSAT_TOTAL_ENUM_OPTIONS, _allsat_callback_count, _allsat_callback_store
+from enumerators.solvers.mathsat_profiles import MathSATProfile, apply_profile
+from enumerators.solvers.mathsat_utils import (
+    MSAT_TOTAL_ENUM_OPTIONS,
+    _allsat_callback_count,
+    _allsat_callback_store,
+    _check_preferred_terms_support,
+    _set_preferred_terms,
+)
+from enumerators.util.formula_index import get_formula_index
 
 
 class MathSATTotalEnumerator(SMTEnumerator):
-    """A wrapper for the mathsat T-solver"""
-
-    def __init__(self, computation_logger: Dict | None = None, project_on_theory_atoms: bool = True) -> None:
-        super().__init__(computation_logger)
-        solver_options_dict = MSAT_TOTAL_ENUM_OPTIONS
-        self._solver = Solver("msat", solver_options=solver_options_dict)
+    """A wrapper for the mathsat T-solver
+
+    With check_all_sat(..., incremental=True), phi stays asserted across calls on the same phi:
+    each call enumerates inside a push/pop scope and the lemmas it finds are then asserted
+    permanently, so that later calls (e.g. on other partitions of the atoms) reuse them.
+
+    If prefer_projected_atoms is True, mathsat branches on the atoms of the enumeration before any
+    other variable, so that it does not assign variables which are then projected away.
+
+    If msat_profile is given (by name, see load_profile), its options override the defaults of
+    mathsat, except those which the lemmas rely on.
+    """
+
+    SUPPORTS_INCREMENTAL = True
+
+    def __init__(
+        self,
+        computation_logger: Dict | None = None,
+        project_on_theory_atoms: bool = True,
+        models_buffer_size: int | None = None,
+        models_spill_path: str | None = None,
+        prefer_projected_atoms: bool = False,
+        env: Environment | None = None,
+        lift_term_ite: bool = False,
+        msat_profile: str | MathSATProfile | None = None,
+    ) -> None:
+        super().__init__(computation_logger, models_buffer_size, models_spill_path, env, lift_term_ite)
+        if prefer_projected_atoms:
+            _check_preferred_terms_support()
+        self._prefer_projected_atoms = prefer_projected_atoms
+        solver_options_dict = apply_profile(MSAT_TOTAL_ENUM_OPTIONS, msat_profile)
+        self._solver = self.env.factory.Solver(name="msat", solver_options=solver_options_dict)
         self._converter = self._solver.converter
         self._project_on_theory_atoms = project_on_theory_atoms
         self.reset()
@@ -26,38 +60,87 @@ class MathSATTotalEnumerator(SMTEnumerator):
     def reset(self):
         """Resets the internal state of the solver"""
         self._solver.reset_assertions()
+        self._incremental_phi = None
+        self._incremental_lemmas = set()
         self._tlemmas = []
-        self._models = []
+        self._models = self._new_models_store()
         self._models_count = 0
 
-    def check_all_sat(self, phi: FNode, atoms: List[FNode] | None = None, store_models: bool = False) -> bool:
-        self.check_supports(phi)
-        self.reset()
+    def check_all_sat(
+        self, phi: FNode, atoms: List[FNode] | None = None, store_models: bool = False, incremental: bool = False
+    ) -> bool:
+        """Runs All-SMT on the formula phi and stores t-lemmas
+
+        Args:
+            phi (FNode): a pysmt formula
+            atoms (List[FNode] | None) [None]: list of atoms to consider for All-SMT
+            store_models (bool) [False]: if True, the models found during All-SMT are stored
+            incremental (bool) [False]: if True and phi is the formula of the previous incremental call,
+                phi and the lemmas found so far are not asserted again
+
+        Returns:
+            bool: SAT or UNSAT, depending on satisfiability of phi
+        """
+        phi, atoms = self._lift_term_ite(phi, atoms)
+        if incremental and self._incremental_phi is phi:
+            self._tlemmas = []
+            self._models = self._new_models_store()
+            self._models_count = 0
+        else:
+            self.check_supports(phi, self.env)
+            self.reset()
+            self._solver.add_assertion(phi)
+            if incremental:
+                self._incremental_phi = phi
+
+        self._progress.start("total")
+        on_model = self._progress.model_found if self._progress.is_enabled() else None
 
-        atoms = phi.get_atoms() if atoms is None else atoms
+        atoms = get_formula_index(phi, self.env).atoms if atoms is None else atoms
         if self._project_on_theory_atoms:
             atoms = get_theory_atoms(atoms)
         self.atoms = atoms
 
-        self._solver.add_assertion(phi)
+        if incremental:
+            self._solver.push()
+
+        converted_atoms = self.get_converted_atoms(atoms)
+        if self._prefer_projected_atoms:
+            _set_preferred_terms(self._solver.msat_env(), converted_atoms)
 
         if store_models:
             mathsat.msat_all_sat(
                 self._solver.msat_env(),
-                self.get_converted_atoms(atoms),
-                callback=lambda model: _allsat_callback_store(model, self._converter, self._models),
+                converted_atoms,
+                callback=lambda model: _allsat_callback_store(
+                    model, self._converter, self._models, on_model, self._cancel_event
+                ),
             )
             self._models_count = len(self._models)
         else:
             models_count_l = [0]
             mathsat.msat_all_sat(
                 self._solver.msat_env(),
-                self.get_converted_atoms(atoms),
-                callback=lambda _: _allsat_callback_count(models_count_l),
+                converted_atoms,
+                callback=lambda _: _allsat_callback_count(models_count_l, on_model, self._cancel_event),
             )
             self._models_count = models_count_l[0]
+        self._check_cancelled()
 
         self._tlemmas = [self._converter.back(l) for l in mathsat.msat_get_theory_lemmas(self._solver.msat_env())]
+        # lemmas learned by previous incremental calls are not streamed again
+        self._start_lemmas_stream(self._incremental_lemmas if incremental else ())
+        self._stream_lemmas(self._tlemmas)
+
+        if incremental:
+            # the blocking clauses of the enumeration are discarded, the lemmas are valid and kept;
+            # lemmas learned by previous calls are reported again by mathsat and are filtered out
+            self._solver.pop()
+            self._tlemmas = [l for l in dict.fromkeys(self._tlemmas) if l not in self._incremental_lemmas]
+            self._incremental_lemmas.update(self._tlemmas)
+            self._solver.add_assertions(self._tlemmas)
+
+        self._progress.update(phase="done", models=self._models_count, lemmas=len(self._tlemmas), force=True)
 
         if self._models_count == 0:
             return UNSAT
@@ -69,11 +152,11 @@ class MathSATTotalEnumerator(SMTEnumerator):
 
     def get_theory_lemmas(self) -> List[FNode]:
         """Returns the theory lemmas found during the All-SAT computation"""
-        return self._tlemmas
+        return self._restore_lemmas(self._tlemmas)
 
     def get_models(self) -> list:
         """Returns the models found during the All-SAT computation"""
-        return self._models
+        return self._restore_models(self._models)
 
     def get_models_count(self) -> int:
         """Returns the models found during the All-SAT computation"""
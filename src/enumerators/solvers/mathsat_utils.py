@@ -1,3 +1,5 @@
+import mathsat
+
 MSAT_ENUM_OPTIONS = {
     "model_generation": "false", # force to false so to avoid unnecessary lemmas
     "preprocessor.toplevel_propagation": "false",  # disable non-validity-preserving simplifications
@@ -13,16 +15,59 @@ MSAT_TOTAL_ENUM_OPTIONS = {"dpll.allsat_minimize_model": "false", **MSAT_ENUM_OP
 MSAT_PARTIAL_ENUM_OPTIONS = {"dpll.allsat_minimize_model": "true", **MSAT_ENUM_OPTIONS}  # partial truth assignments
 
 
-def _allsat_callback_count(models: list[int]):
-    """callback for total all-sat"""
+def _allsat_callback_count(models: list[int], on_model=None, cancel_event=None):
+    """callback for total all-sat, on_model (if given) is called for each model, e.g. to report progress,
+    and the enumeration stops when cancel_event (if given) is set"""
     # We cannot pass an int as it would be copied by value, so we
     # use a list with just one element, which is the number of models
     models[0] += 1
-    return 1
+    if on_model is not None:
+        on_model()
+    return _continue_allsat(cancel_event)
 
 
-def _allsat_callback_store(model, converter, models):
-    """callback for partial all-sat"""
+def _allsat_callback_store(model, converter, models, on_model=None, cancel_event=None):
+    """callback for partial all-sat, on_model (if given) is called for each model, e.g. to report progress,
+    and the enumeration stops when cancel_event (if given) is set"""
     py_model = {converter.back(v) for v in model}
     models.append(py_model)
+    if on_model is not None:
+        on_model()
+    return _continue_allsat(cancel_event)
+
+
+def _continue_allsat(cancel_event) -> int:
+    """returns the value which makes msat_all_sat continue (1), or stop (0) if cancel_event is set"""
+    if cancel_event is not None and cancel_event.is_set():
+        return 0
     return 1
+
+
+def _check_preferred_terms_support() -> None:
+    """raises ValueError if the mathsat bindings cannot clear the branching preferences"""
+    # without clearing them, the preferences of the previous runs would pile up
+    if not hasattr(mathsat, "msat_clear_preferred_for_branching"):
+        raise ValueError("branching preferences need msat_clear_preferred_for_branching, missing in mathsat")
+
+
+def _set_preferred_terms(msat_env, terms) -> None:
+    """makes mathsat branch first on the given terms (e.g. the projection atoms), in order"""
+    # preferences survive push/pop, so they are cleared before being set again
+    mathsat.msat_clear_preferred_for_branching(msat_env)
+    for term in terms:
+        mathsat.msat_add_preferred_for_branching(msat_env, term, mathsat.MSAT_UNDEF)
+
+
+def _dump_smtlib_template(solver, formula) -> str:
+    """converts formula in the environment of a pysmt mathsat solver and dumps it in SMT-LIB2 with mathsat"""
+    term = solver.converter.convert(formula)
+    return mathsat.msat_to_smtlib2(solver.msat_env(), term)
+
+
+def _load_smtlib_template(solver, template: str) -> None:
+    """asserts in a pysmt mathsat solver a formula dumped by _dump_smtlib_template"""
+    env = solver.msat_env()
+    term = mathsat.msat_from_smtlib2(env, template)
+    if mathsat.MSAT_ERROR_TERM(term):
+        raise RuntimeError(f"mathsat could not parse the template: {mathsat.msat_last_error_message(env)}")
+    mathsat.msat_assert_formula(env, term)
@@ -0,0 +1,353 @@
+"""this module races several enumerator configurations on the same formula"""
+
+import json
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from pysmt.environment import Environment
+from pysmt.fnode import FNode
+from pysmt.formula import FormulaContextualizer
+
+from enumerators.constants import SAT, UNSAT
+from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.solvers.solver import SMTEnumerator
+from enumerators.solvers.with_partitioning import WithPartitioningWrapper
+from enumerators.util.custom_exceptions import PortfolioException
+from enumerators.util.formula_index import get_formula_index
+from enumerators.util.pysmt import contextualize as _contextualize
+
+# seconds between two checks of the cancellation and of the configurations which died without a result
+_POLL_INTERVAL = 0.1
+# seconds given to a terminated configuration to stop its own pool before it is killed
+_TERMINATE_GRACE = 1.0
+
+
+@dataclass
+class PortfolioConfiguration:
+    """an enumerator configuration raced by PortfolioEnumerator
+
+    The enumerator is built in the process of the configuration, as enumerator_cls(**options), and
+    wrapped in a WithPartitioningWrapper if partitioned is True, so enumerator_cls and options must
+    be picklable.
+    """
+
+    name: str
+    enumerator_cls: type
+    options: Dict = field(default_factory=dict)
+    partitioned: bool = False
+
+    def build(self) -> SMTEnumerator:
+        """returns a new enumerator of this configuration, in the global pysmt environment"""
+        enumerator = self.enumerator_cls(**self.options)
+        if self.partitioned:
+            return WithPartitioningWrapper(base_solver=enumerator)
+        return enumerator
+
+
+# all of them project on the theory atoms, so that their results are interchangeable
+DEFAULT_CONFIGURATIONS = (
+    PortfolioConfiguration("total", MathSATTotalEnumerator),
+    PortfolioConfiguration("partial", MathSATExtendedPartialEnumerator),
+    PortfolioConfiguration("partial-parallel", MathSATExtendedPartialEnumerator, {"parallel_procs": "auto"}),
+    PortfolioConfiguration("partitioned-total", MathSATTotalEnumerator, partitioned=True),
+)
+
+
+def formula_features(phi: FNode, env: Environment | None = None) -> str:
+    """returns the features of phi on which the preferences of a portfolio are learned
+
+    The features are the theories of phi and the orders of magnitude of its numbers of Boolean atoms,
+    theory atoms and partitions of the theory atoms, so that similar formulas share their preferences.
+
+    Args:
+        phi (FNode): a pysmt formula
+        env (Environment | None) [None]: the pysmt environment of phi, the global one if None
+
+    Returns:
+        str: the features, as a key of PortfolioHistory
+    """
+    index = get_formula_index(phi, env)
+    theories = ",".join(sorted(str(theory) for theory in index.theories)) or "Bool"
+    theory_atoms = len(index.theory_atoms)
+    bool_atoms = len(index.atoms) - theory_atoms
+    partitions = len(index.partitions())
+    return f"{theories}|b{_magnitude(bool_atoms)}|t{_magnitude(theory_atoms)}|p{_magnitude(partitions)}"
+
+
+def _magnitude(count: int) -> int:
+    return 0 if count == 0 else math.ceil(math.log2(count + 1))
+
+
+class PortfolioHistory:
+    """the wins of the configurations of a portfolio, and their times, by formula features (see formula_features)
+
+    If path is given, the history is loaded from it, if it exists, and saved there as JSON after each record.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        # features -> configuration name -> [wins, total time of the wins]
+        self._wins: Dict[str, Dict[str, List[float]]] = {}
+        if path is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._wins = json.load(f)
+
+    def record(self, features: str, winner: str, elapsed: float) -> None:
+        """records that the configuration named winner was the first to complete a formula with features"""
+        wins = self._wins.setdefault(features, {}).setdefault(winner, [0, 0.0])
+        wins[0] += 1
+        wins[1] += elapsed
+        if self.path is not None:
+            self.save()
+
+    def wins(self, features: str, name: str) -> int:
+        """returns the number of wins of the configuration named name on formulas with features"""
+        return int(self._wins.get(features, {}).get(name, [0, 0.0])[0])
+
+    def rank(self, names: Sequence[str], features: str) -> List[str]:
+        """returns names from the most to the least preferred on formulas with features
+
+        The configurations are ranked by their wins, then by the mean time of their wins; those
+        which never won keep their relative order.
+        """
+        wins = self._wins.get(features, {})
+
+        def key(name: str) -> tuple:
+            count, total_time = wins.get(name, [0, 0.0])
+            return -count, total_time / count if count > 0 else math.inf
+
+        return sorted(names, key=key)
+
+    def save(self) -> None:
+        """writes the history to its path"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._wins, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _exit_on_sigterm(signum, frame) -> None:
+    # pylint: disable=unused-argument
+    # exiting through SystemExit lets the configuration terminate the pool of its enumerator
+    sys.exit(1)
+
+
+def _run_configuration(
+    configuration: PortfolioConfiguration,
+    index: int,
+    phi: FNode,
+    atoms: List[FNode] | None,
+    store_models: bool,
+    results: multiprocessing.Queue,
+) -> None:
+    """Process function of PortfolioEnumerator, puts the result of a configuration (or its error) in results"""
+    if hasattr(os, "setpgrp"):
+        # the workers of the pools of the configuration join its process group, so that they are killed with it
+        os.setpgrp()
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    try:
+        contextualizer = FormulaContextualizer()
+        phi = _contextualize(contextualizer, phi)
+        atoms = None if atoms is None else _contextualize(contextualizer, atoms)
+        enumerator = configuration.build()
+        start_time = time.time()
+        sat_result = enumerator.check_all_sat(phi, atoms, store_models)
+        elapsed = time.time() - start_time
+        models = list(enumerator.get_models()) if store_models else []
+        results.put(
+            (index, None, sat_result, enumerator.get_models_count(), enumerator.get_theory_lemmas(), models, elapsed)
+        )
+    except Exception as e:  # pylint: disable=broad-except
+        results.put((index, f"{type(e).__name__}: {e}", UNSAT, 0, [], [], 0.0))
+
+
+class PortfolioEnumerator(SMTEnumerator):
+    """Races several enumerator configurations on the same formula, and keeps the first complete result
+
+    Which enumerator is fastest varies widely from a formula to another, so check_all_sat runs each
+    configuration (DEFAULT_CONFIGURATIONS if configurations is None) in its own process, keeps the
+    lemmas and models of the first one which completes, and terminates the others; get_winner returns
+    the name of the first configuration which completes. Each configuration runs in its own process
+    group, which is killed with the processes of its pools if the configuration does not stop within
+    a grace period. A configuration which fails is ignored, unless they all fail, in which case
+    PortfolioException is raised. The configurations should agree on the projection on the theory
+    atoms, or their results will not be interchangeable.
+
+    If a history is given, the wins of the configurations are recorded by formula features (see
+    formula_features), and the configurations are started from the one which won most often on
+    similar formulas; if max_running is given, only the max_running most preferred configurations
+    are raced.
+    """
+
+    def __init__(
+        self,
+        configurations: Sequence[PortfolioConfiguration] | None = None,
+        computation_logger: Dict | None = None,
+        max_running: int | None = None,
+        history: PortfolioHistory | None = None,
+        models_buffer_size: int | None = None,
+        models_spill_path: str | None = None,
+        env: Environment | None = None,
+    ):
+        super().__init__(computation_logger, models_buffer_size, models_spill_path, env)
+        self._configurations = list(configurations if configurations is not None else DEFAULT_CONFIGURATIONS)
+        if len(self._configurations) == 0:
+            raise ValueError("a portfolio needs at least one configuration")
+        if len({configuration.name for configuration in self._configurations}) != len(self._configurations):
+            raise ValueError("the configurations of a portfolio must have distinct names")
+        if max_running is not None and max_running < 1:
+            raise ValueError("max_running must be at least 1")
+        self._max_running = max_running
+        self._history = history
+        self._converter = None
+        self.reset()
+
+    def reset(self) -> None:
+        self._tlemmas = []
+        self._models = self._new_models_store()
+        self._models_count = 0
+        self._winner = None
+
+    def select_configurations(self, phi: FNode) -> List[PortfolioConfiguration]:
+        """returns the configurations raced on phi, from the most preferred one"""
+        configurations = self._configurations
+        if self._history is not None:
+            by_name = {configuration.name: configuration for configuration in configurations}
+            ranking = self._history.rank(list(by_name), formula_features(phi, self.env))
+            configurations = [by_name[name] for name in ranking]
+        if self._max_running is not None:
+            configurations = configurations[: self._max_running]
+        return configurations
+
+    def check_all_sat(self, phi: FNode, atoms: List[FNode] | None = None, store_models: bool = False) -> bool:
+        """Runs All-SMT on the formula phi with each configuration, and keeps the first result
+
+        Args:
+            phi (FNode): a pysmt formula
+            atoms (List[FNode] | None) [None]: list of atoms to consider for All-SMT
+            store_models (bool) [False]: if True, the models found during All-SMT are stored
+
+        Returns:
+            bool: SAT or UNSAT, depending on satisfiability of phi
+        """
+        self.reset()
+        self._start_lemmas_stream()
+        self._progress.start("portfolio")
+        start_time = time.time()
+        configurations = self.select_configurations(phi)
+        self._progress.update(tasks_total=len(configurations), force=True)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_run_configuration,
+                args=(configuration, index, phi, atoms, store_models, results),
+                name=f"portfolio-{configuration.name}",
+            )
+            for index, configuration in enumerate(configurations)
+        ]
+        errors: Dict[int, str] = {}
+        try:
+            for process in processes:
+                process.start()
+            result = self._wait_first_result(processes, results, errors)
+        finally:
+            _stop_processes(processes)
+            results.close()
+
+        if result is None:
+            failures = "; ".join(f"{configurations[index].name}: {error}" for index, error in sorted(errors.items()))
+            raise PortfolioException(f"no configuration completed the enumeration ({failures})")
+        index, _, sat_result, models_count, lemmas, models, elapsed = result
+        winner = configurations[index]
+
+        contextualizer = FormulaContextualizer(self.env)
+        self._tlemmas = _contextualize(contextualizer, lemmas)
+        self._stream_lemmas(self._tlemmas)
+        self._models.extend(_contextualize(contextualizer, models))
+        self._models_count = models_count
+        self._winner = winner.name
+        if self._history is not None:
+            self._history.record(formula_features(phi, self.env), winner.name, elapsed)
+
+        self._progress.update(phase="done", models=self._models_count, lemmas=len(self._tlemmas), force=True)
+        if self._computation_logger is not None:
+            self._computation_logger["Portfolio configurations"] = [c.name for c in configurations]
+            self._computation_logger["Portfolio winner"] = winner.name
+            self._computation_logger["Portfolio failures"] = {configurations[i].name: e for i, e in errors.items()}
+            self._computation_logger["Portfolio time"] = time.time() - start_time
+            self._computation_logger["Total models"] = self._models_count
+        return SAT if sat_result else UNSAT
+
+    def _wait_first_result(
+        self, processes: List[multiprocessing.Process], results: multiprocessing.Queue, errors: Dict[int, str]
+    ) -> tuple | None:
+        """returns the first successful result, or None if all the configurations failed (recorded in errors)"""
+        while len(errors) < len(processes):
+            try:
+                result = results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                self._check_cancelled()
+                # a configuration killed (e.g. by the OOM killer) never puts its result
+                for index, process in enumerate(processes):
+                    if index not in errors and process.exitcode not in (None, 0):
+                        errors[index] = f"exited with code {process.exitcode}"
+                continue
+            index, error = result[0], result[1]
+            if error is None:
+                return result
+            errors[index] = error
+        return None
+
+    def get_winner(self) -> str | None:
+        """Returns the name of the configuration which completed the last enumeration first"""
+        return self._winner
+
+    def get_theory_lemmas(self) -> List[FNode]:
+        return self._tlemmas
+
+    def get_converter(self) -> object:
+        # the configurations have their own solvers, the converter is only built when needed
+        if self._converter is None:
+            self._converter = self.env.factory.Solver(name="msat").converter
+        return self._converter
+
+    def get_models(self) -> List:
+        return self._models
+
+    def get_models_count(self) -> int:
+        return self._models_count
+
+
+def _stop_processes(processes: List[multiprocessing.Process]) -> None:
+    """terminates the processes which are still running, and kills those which do not stop with their groups"""
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        if process.pid is None:
+            continue
+        process.join(_TERMINATE_GRACE)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        # the workers of a killed configuration would otherwise keep running as orphans
+        _kill_process_group(process.pid)
+
+
+def _kill_process_group(pgid: int) -> None:
+    if not hasattr(os, "killpg"):
+        return
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        # the group is empty, or the process was stopped before creating it
+        pass
@@ -1,24 +1,220 @@
 """interface that all solvers must implement."""
 
+import contextlib
+import multiprocessing
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence
 
+from pysmt.environment import Environment, get_env
 from pysmt.fnode import FNode
+from pysmt.formula import FormulaContextualizer
 
 from enumerators.constants import SAT, UNSAT
-from enumerators.formula import get_atom_partitioning, get_normalized, get_true_given_atoms
-from enumerators.walkers.term_ite_checker import TermIteChecker
+from enumerators.formula import get_atom_partitioning, get_normalized, get_theory_atoms, get_true_given_atoms
+from enumerators.util.custom_exceptions import EnumerationCancelled
+from enumerators.util.formula_index import get_formula_index
+from enumerators.util.model_sink import ModelSink, ObservedModels
+from enumerators.util.progress import ProgressCallback, ProgressReporter
+from enumerators.util.pysmt import contextualize as _contextualize
+from enumerators.walkers.term_ite_lifter import RestoredModels, TermIteLifter
+
+# the workers of enumerate_true run in their own processes, in the global pysmt environment
+_TRUE_ENUMERATOR = None
+
+
+def _initialize_true_worker(enumerator_factory: Callable[[], "SMTEnumerator"]) -> None:
+    """Initializes a worker of enumerate_true with its enumerator"""
+    global _TRUE_ENUMERATOR
+    _TRUE_ENUMERATOR = enumerator_factory()
+
+
+def _enumerate_true_worker(partition: List[FNode]) -> tuple:
+    """Worker function for parallel enumerate_true, returns SAT or UNSAT and the lemmas of the partition"""
+    partition = _contextualize(FormulaContextualizer(), partition)
+    partition_sat_result = _TRUE_ENUMERATOR.check_all_sat(get_true_given_atoms(partition), partition)
+    return partition_sat_result, _TRUE_ENUMERATOR.get_theory_lemmas()
+
+
+@dataclass
+class ProjectionResult:
+    """the result of the enumeration of a formula projected on a set of atoms (see check_all_sat_projections)"""
+
+    # the atoms of the projection, as given
+    atoms: List[FNode]
+    # SAT or UNSAT, depending on satisfiability of phi
+    sat: bool
+    # the number of models of the projection
+    models_count: int
+    # the lemmas found by this projection, which were not found by the previous ones
+    lemmas: List[FNode]
+    # the models of the projection, if they were stored
+    models: List | ModelSink = field(default_factory=list)
 
 
 class SMTEnumerator(ABC):
     """interface that all solvers must implement.
 
     This interface must be implemented by all the solvers that are used to compute all-SMT.
+
+    If models_buffer_size is given, stored models are kept in a ModelSink which holds at most
+    models_buffer_size models in memory and spills the others to models_spill_path
+    (or to a temporary file if models_spill_path is None).
+
+    Solvers with SUPPORTS_INCREMENTAL set accept check_all_sat(..., incremental=True), which keeps
+    phi and the lemmas found so far asserted across calls on the same phi.
+
+    A progress callback can be registered with set_progress_callback, it then receives an
+    EnumerationProgress at most once every interval seconds while check_all_sat runs.
+
+    A running check_all_sat can be stopped from another thread with cancel(): it then resets the
+    solver and raises EnumerationCancelled.
+
+    A listener registered with set_lemmas_listener receives the lemmas of check_all_sat in batches,
+    as soon as they are harvested from the solver, so that downstream work can start before the
+    enumeration ends. Each lemma is passed once per run.
+
+    Formulas, solvers and walkers of an enumerator live in its pysmt environment env (the global
+    one if None), so that enumerators with distinct environments can run concurrently in threads,
+    and the formulas of a job are released with its environment. The formulas passed to an
+    enumerator must belong to its environment (see FormulaContextualizer).
+
+    Enumerators built with lift_term_ite=True accept formulas with term-ITEs, which are replaced by
+    fresh variables defined in Boolean structure (see TermIteLifter) before the enumeration. The atoms
+    of the enumeration are the lifted atoms of phi (or of the given atoms), so that the models are
+    those of phi, and the lemmas and models are reported over the atoms and terms of phi.
     """
 
-    def __init__(self, computation_logger: Dict | None = None):
+    SUPPORTS_INCREMENTAL = False
+
+    def __init__(
+        self,
+        computation_logger: Dict | None = None,
+        models_buffer_size: int | None = None,
+        models_spill_path: str | None = None,
+        env: Environment | None = None,
+        lift_term_ite: bool = False,
+    ):
+        self.env = env if env is not None else get_env()
+        self._term_ite_lifter = TermIteLifter(self.env) if lift_term_ite else None
+        self._is_lifted = False
         self._tlemmas = []
         self._computation_logger = computation_logger
+        self._models_buffer_size = models_buffer_size
+        self._models_spill_path = models_spill_path
+        self._progress = ProgressReporter()
+        self._models_listener = None
+        self._lemmas_listener = None
+        self._streamed_lemmas = set()
+        self._cancel_event = threading.Event()
+
+    def set_progress_callback(self, callback: ProgressCallback | None, interval: float = 1.0) -> None:
+        """registers a callback to report the progress of check_all_sat
+
+        Args:
+            callback (ProgressCallback | None): called with an EnumerationProgress, None disables reporting
+            interval (float) [1.0]: minimum number of seconds between two reports, the reports at the
+                end of each phase are always sent
+        """
+        self._progress = ProgressReporter(callback, interval)
+
+    def _new_models_store(self) -> List | ModelSink:
+        """returns an empty container for the models found during All-SMT"""
+        if self._models_buffer_size is None:
+            store = []
+        else:
+            store = ModelSink(self._models_buffer_size, self._models_spill_path, self.env)
+        if self._models_listener is not None:
+            return ObservedModels(store, self._notify_models)
+        return store
+
+    def _notify_models(self, models: List) -> None:
+        """passes new models to the listener, over the atoms of the formula before lifting"""
+        if self._models_listener is not None:
+            self._models_listener(list(self._restore_models(models)))
+
+    def _lift_term_ite(self, phi: FNode, atoms: List[FNode] | None) -> tuple:
+        """returns phi without term-ITEs and the corresponding atoms (of phi if None), if lift_term_ite is set
+
+        Otherwise, or if phi has no term-ITEs, phi and atoms are returned unchanged.
+        """
+        self._is_lifted = False
+        if self._term_ite_lifter is None:
+            return phi, atoms
+        index = get_formula_index(phi, self.env)
+        if not index.has_term_ite:
+            return phi, atoms
+        self._is_lifted = True
+        atoms = index.atoms if atoms is None else atoms
+        return self._term_ite_lifter.lift(phi), self._term_ite_lifter.lift_atoms(atoms)
+
+    def _restore_lemmas(self, lemmas: List[FNode]) -> List[FNode]:
+        """maps the lemmas of a lifted formula to the terms of the original one"""
+        if not self._is_lifted:
+            return lemmas
+        return [self._term_ite_lifter.restore(lemma) for lemma in lemmas]
+
+    def _restore_models(self, models: Sequence) -> Sequence:
+        """maps the models of a lifted formula to the atoms of the original one"""
+        if not self._is_lifted:
+            return models
+        return RestoredModels(models, self._term_ite_lifter)
+
+    def set_models_listener(self, listener: Callable[[List], None] | None) -> None:
+        """registers a listener which receives the models stored by the next runs of check_all_sat as they are found
+
+        Args:
+            listener (Callable[[List], None] | None): called with lists of new models, from the thread
+                running check_all_sat; None removes the listener
+        """
+        self._models_listener = listener
+        if listener is None and isinstance(getattr(self, "_models", None), ObservedModels):
+            # the models of the last enumeration remain available
+            self._models = self._models.store
+
+    def set_lemmas_listener(self, listener: Callable[[List[FNode]], None] | None) -> None:
+        """registers a listener which receives the lemmas found by the next runs of check_all_sat as they are harvested
+
+        Args:
+            listener (Callable[[List[FNode]], None] | None): called with non-empty lists of lemmas not passed
+                before in the same run, from the thread running check_all_sat; None removes the listener
+        """
+        self._lemmas_listener = listener
+
+    def _start_lemmas_stream(self, known_lemmas: Iterable[FNode] = ()) -> None:
+        """starts a new run of the lemmas listener, which will not receive known_lemmas"""
+        self._streamed_lemmas = set(known_lemmas)
+
+    def _stream_lemmas(self, lemmas: Iterable[FNode]) -> None:
+        """passes the lemmas which were not streamed yet in this run to the lemmas listener"""
+        if self._lemmas_listener is None:
+            return
+        new_lemmas = [lemma for lemma in dict.fromkeys(lemmas) if lemma not in self._streamed_lemmas]
+        if len(new_lemmas) == 0:
+            return
+        self._streamed_lemmas.update(new_lemmas)
+        self._lemmas_listener(self._restore_lemmas(new_lemmas))
+
+    def cancel(self) -> None:
+        """asks the running check_all_sat to stop as soon as possible, it can be called from any thread
+
+        The request is consumed by the enumeration it stops. A request made while no enumeration is
+        running stops the next one, unless it is withdrawn with clear_cancel.
+        """
+        self._cancel_event.set()
+
+    def clear_cancel(self) -> None:
+        """withdraws a cancellation request which has not stopped an enumeration yet"""
+        self._cancel_event.clear()
+
+    def _check_cancelled(self) -> None:
+        """raises EnumerationCancelled, after resetting the solver, if the enumeration was cancelled"""
+        if self._cancel_event.is_set():
+            self._cancel_event.clear()
+            self.reset()
+            raise EnumerationCancelled("The enumeration was cancelled")
 
     @abstractmethod
     def reset(self) -> None:
@@ -44,18 +240,84 @@ class SMTEnumerator(ABC):
         """
         pass
 
+    def check_all_sat_projections(
+        self, phi: FNode, projections: Iterable[List[FNode]], store_models: bool = False
+    ) -> List[ProjectionResult]:
+        """Runs All-SMT on the formula phi projected on each set of atoms, in a single session
+
+        Solvers which support incremental runs assert phi (and CNF-ize it) once and keep the lemmas
+        of the previous projections asserted; the other solvers enumerate And(phi, *lemmas) with
+        the lemmas of the previous projections. Note that the solvers may restrict the projections
+        to their theory atoms (see project_on_theory_atoms).
+
+        Args:
+            phi (FNode): a pysmt formula
+            projections (Iterable[List[FNode]]): the sets of atoms to project on
+            store_models (bool) [False]: if True, the models of each projection are stored in its result
+
+        Returns:
+            List[ProjectionResult]: the result of each projection, in order
+        """
+        results = []
+        lemmas = {}
+        for atoms in projections:
+            atoms = list(atoms)
+            if self.SUPPORTS_INCREMENTAL:
+                sat = self.check_all_sat(phi, atoms, store_models, incremental=True)
+            else:
+                sat = self.check_all_sat(self.env.formula_manager.And(phi, *lemmas), atoms, store_models)
+            new_lemmas = [lemma for lemma in dict.fromkeys(self.get_theory_lemmas()) if lemma not in lemmas]
+            lemmas.update(dict.fromkeys(new_lemmas))
+            results.append(
+                ProjectionResult(
+                    atoms=atoms,
+                    sat=sat,
+                    models_count=self.get_models_count(),
+                    lemmas=new_lemmas,
+                    # each run stores its models in a new store, with its own spill files (see ModelSink),
+                    # so that the models of this projection are not changed by the next runs
+                    models=self.get_models() if store_models else [],
+                )
+            )
+        return results
+
     @abstractmethod
     def get_theory_lemmas(self) -> List[FNode]:
         """return the list of theory lemmas"""
         pass
 
+    def get_minimized_theory_lemmas(self, parallel_procs: int = 1) -> List[FNode]:
+        """return the theory lemmas, each shrunk to a minimal T-valid subclause, without the subsumed ones
+
+        The size statistics before and after minimization are reported in the computation logger.
+
+        Args:
+            parallel_procs (int) [1]: the number of processes minimizing the lemmas
+
+        Returns:
+            List[FNode]: the minimized lemmas, equivalent to get_theory_lemmas()
+        """
+        # imported here since the minimizer needs mathsat, which the other solvers do not
+        from enumerators.solvers.lemma_minimization import LemmaMinimizer
+
+        minimizer = LemmaMinimizer(parallel_procs, self.env)
+        lemmas = minimizer.minimize(self.get_theory_lemmas())
+        if self._computation_logger is not None:
+            stats = minimizer.stats
+            self._computation_logger["Lemmas before minimization"] = stats["before"]["lemmas"]
+            self._computation_logger["Lemma literals before minimization"] = stats["before"]["literals"]
+            self._computation_logger["Lemmas after minimization"] = stats["after"]["lemmas"]
+            self._computation_logger["Lemma literals after minimization"] = stats["after"]["literals"]
+            self._computation_logger["Lemma minimization time"] = stats["time"]
+        return lemmas
+
     @abstractmethod
     def get_converter(self) -> object:
         """return the converter for normalization of T-atoms"""
         pass
 
     @abstractmethod
-    def get_models(self) -> List:
+    def get_models(self) -> List | ModelSink:
         """return the list of models"""
         pass
 
@@ -65,61 +327,104 @@ class SMTEnumerator(ABC):
         pass
 
     @staticmethod
-    def check_supports(phi: FNode) -> None:
+    def check_supports(phi: FNode, env: Environment | None = None) -> None:
         """check if the solver supports the formula phi
 
+        The check uses the index of phi (see get_formula_index), which the enumerators then reuse.
+
         Args:
             phi (FNode): a pysmt formula
+            env (Environment | None) [None]: the pysmt environment of phi, the global one if None
         Returns:
             bool: True if the solver supports phi, False otherwise
         """
-        assert TermIteChecker().walk(phi), "Term-ITE are not supported yet"
+        index = get_formula_index(phi, env)
+        assert not index.has_term_ite, "Term-ITE are not supported yet"
+        assert not index.has_quantifiers, "Quantifiers are not supported yet"
+
+    def enumerate_true(
+        self,
+        phi: FNode,
+        stop_at_unsat: bool = False,
+        parallel_procs: int = 1,
+        enumerator_factory: Callable[[], "SMTEnumerator"] | None = None,
+    ) -> bool:
+        """enumerate all lemmas on the atoms of phi, regardless of the Boolean structure of phi
 
+        The atoms of phi are split by get_atom_partitioning, and All-SMT is run on the formula which is
+        True given the theory atoms of each partition (see get_true_given_atoms). The lemmas of the
+        partitions are merged without duplicates, and returned by get_theory_lemmas, e.g. to precompute
+        a library of lemmas for a set of atoms. No models are kept.
 
-    def enumerate_true(self, phi: FNode, stop_at_unsat: bool = False) -> bool:
-        """enumerate all lemmas on the formula phi
+        With parallel_procs > 1, the partitions are enumerated by a pool of processes, each with its
+        own enumerator built by enumerator_factory, which must be picklable (e.g. a class or a
+        functools.partial); if it is None, type(self) is built with its default arguments, so that
+        wrappers such as WithPartitioningWrapper need a factory.
 
         Args:
             phi (FNode): a pysmt formula
             stop_at_unsat (bool) [False]: if True, the enumeration stops as soon as an UNSAT partition is found
+            parallel_procs (int) [1]: the number of processes enumerating the partitions
+            enumerator_factory (Callable[[], SMTEnumerator] | None) [None]: builds the enumerators of the pool
 
         Returns:
-            bool: SAT or UNSAT, depending on satisfiability of phi
+            bool: SAT, or UNSAT if a partition was found UNSAT, which the theory solver should never do
         """
+        if parallel_procs < 1:
+            raise ValueError("parallel_procs must be at least 1")
+        start_time = time.time()
         # normalize phi
-        phi = get_normalized(phi, self.get_converter())
+        phi = get_normalized(phi, self.get_converter(), self.env)
 
-        # compute partitioning over the atoms of phi
-        partitions = get_atom_partitioning(phi)
+        # compute partitioning over the atoms of phi, the Boolean atoms have no lemmas
+        partitions = [list(partition) for partition in get_atom_partitioning(phi, self.env)]
+        partitions = [partition for partition in partitions if len(get_theory_atoms(partition)) > 0]
+        # the largest partitions first, so that the pool does not end waiting on one of them
+        partitions.sort(key=len, reverse=True)
 
         complessive_sat_result = SAT
+        all_lemmas = {}
+        results = self._enumerate_true_partitions(partitions, parallel_procs, enumerator_factory)
+        with contextlib.closing(results):
+            for partition_sat_result, lemmas in results:
+                all_lemmas.update(dict.fromkeys(lemmas))
+                # notice that partitions should never be UNSAT
+                # since it is always possible to find a T-model
+                # for a partition
+                if partition_sat_result == UNSAT:
+                    complessive_sat_result = UNSAT
+                    if stop_at_unsat:
+                        break
 
-        all_lemmas = set()
-
-        for partition in partitions:
-            # compute true formula of partition
-            partition_phi = get_true_given_atoms(partition)
-
-            # check if partition is SAT and extract lemmas
-            partition_sat_result = self.check_all_sat(partition_phi, boolean_mapping=None)
-
-            # add lemmas to the set of all lemmas
-            for lemma in self.get_theory_lemmas():
-                all_lemmas.add(lemma)
+        # store all lemmas, without the models of the last partition
+        self.reset()
+        self._tlemmas = list(all_lemmas)
 
-            # if partition is UNSAT, the whole formula is UNSAT
-            # therefore mark result as UNSAT
+        if self._computation_logger is not None:
+            self._computation_logger["True partitions"] = len(partitions)
+            self._computation_logger["True enumeration time"] = time.time() - start_time
 
-            # notice that partitions should never be UNSAT
-            # since it is always possible to find a T-model
-            # for a partition
-            if partition_sat_result == UNSAT:
-                complessive_sat_result = UNSAT
-                # should I continue enumerating lemmas?
-                if stop_at_unsat:
-                    return UNSAT
+        return complessive_sat_result
 
-        # store all lemmas
-        self._tlemmas = list(all_lemmas)
+    def _enumerate_true_partitions(
+        self, partitions: List[List[FNode]], parallel_procs: int, enumerator_factory: Callable | None
+    ) -> Iterator[tuple]:
+        """yields SAT or UNSAT and the lemmas of the True formula of each partition, as they are found"""
+        if parallel_procs <= 1 or len(partitions) <= 1:
+            for partition in partitions:
+                partition_phi = get_true_given_atoms(partition, self.env)
+                partition_sat_result = self.check_all_sat(partition_phi, partition)
+                yield partition_sat_result, self.get_theory_lemmas()
+            return
 
-        return complessive_sat_result
+        pool = multiprocessing.Pool(
+            processes=min(parallel_procs, len(partitions)),
+            initializer=_initialize_true_worker,
+            initargs=(enumerator_factory if enumerator_factory is not None else type(self),),
+        )
+        # leaving the pool, e.g. when stopping at an UNSAT partition, terminates the workers
+        with pool:
+            contextualizer = FormulaContextualizer(self.env)
+            for partition_sat_result, lemmas in pool.imap_unordered(_enumerate_true_worker, partitions):
+                self._check_cancelled()
+                yield partition_sat_result, _contextualize(contextualizer, lemmas)
@@ -1,84 +1,202 @@
-import itertools as it
 import time
 from typing import List
 
 from pysmt.fnode import FNode
-from pysmt.shortcuts import And
 
-from enumerators.formula import get_theory_atoms
+from enumerators.formula import get_theory_atoms, slice_formula
 from enumerators.solvers.solver import SMTEnumerator
-
-
-class UnionFind:
-    def __init__(self):
-        self.parent = {}
-
-    def find(self, item):
-        if item not in self.parent:
-            self.parent[item] = item
-        if self.parent[item] != item:
-            self.parent[item] = self.find(self.parent[item])
-        return self.parent[item]
-
-    def union(self, item1, item2):
-        root1 = self.find(item1)
-        root2 = self.find(item2)
-        if root1 != root2:
-            self.parent[root2] = root1
+from enumerators.util.checkpoint import Checkpointer, EnumerationCheckpoint, atoms_fingerprint, formula_fingerprint
+from enumerators.util.custom_exceptions import CheckpointException, EnumerationCancelled
+from enumerators.util.formula_index import get_formula_index
 
 
 class WithPartitioningWrapper(SMTEnumerator):
-
-    def __init__(self, base_solver: SMTEnumerator, computation_logger: dict | None = None):
-        super().__init__(computation_logger)
+    """Runs the base solver separately on each partition of the theory atoms
+
+    If checkpoint_path is given, the lemmas and models of the completed partitions are periodically
+    saved there, so that an interrupted run can be resumed with check_all_sat(..., resume_from=checkpoint_path).
+
+    If incremental is True, the base solver (which must support incremental runs) asserts phi only
+    once and keeps the lemmas of the previous partitions asserted, instead of being reset and
+    given And(phi, *lemmas) for each partition.
+
+    If slice_partitions is True, each partition is enumerated on a slice of phi, in which the theory
+    atoms of the other partitions are replaced by fresh Boolean variables (see slice_formula), so that
+    the theory solver only deals with the atoms of the partition. The lemmas are still T-lemmas of phi,
+    but the models of each partition are those of its slice, which may include assignments which are
+    consistent only with a T-inconsistent assignment of the other partitions: the models cannot be
+    stored, and get_models_count returns None. Slicing cannot be combined with incremental runs,
+    since each partition has its own formula.
+
+    The progress reported by the wrapper counts the partitions as tasks, the progress within
+    each partition can be reported by the base solver with its own callback.
+    """
+
+    def __init__(
+        self,
+        base_solver: SMTEnumerator,
+        computation_logger: dict | None = None,
+        checkpoint_path: str | None = None,
+        checkpoint_interval: float = 60.0,
+        models_buffer_size: int | None = None,
+        models_spill_path: str | None = None,
+        incremental: bool = False,
+        slice_partitions: bool = False,
+    ):
+        # the wrapper works in the environment of the base solver
+        super().__init__(computation_logger, models_buffer_size, models_spill_path, base_solver.env)
+        if incremental and not base_solver.SUPPORTS_INCREMENTAL:
+            raise ValueError(f"{type(base_solver).__name__} does not support incremental runs")
+        if incremental and slice_partitions:
+            raise ValueError("slice_partitions cannot be combined with incremental runs")
+        if checkpoint_path is not None and models_buffer_size is not None and models_spill_path is None:
+            # the temporary spill files are removed with their sink, the checkpoint could not be resumed
+            raise ValueError("models_spill_path must be given to checkpoint models kept in a bounded buffer")
         self._base_solver = base_solver
+        self._incremental = incremental
+        self._slice_partitions = slice_partitions
         self._project_on_theory_atoms = True
         self._tlemmas = []
-        self._models = []
+        self._models = self._new_models_store()
         self._models_count = 0
+        self._checkpointer = Checkpointer(checkpoint_path, checkpoint_interval)
+
+    def cancel(self) -> None:
+        super().cancel()
+        self._base_solver.cancel()
+
+    def clear_cancel(self) -> None:
+        super().clear_cancel()
+        self._base_solver.clear_cancel()
+
+    def _check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            # the request may have arrived after the base solver completed its run
+            self._base_solver.clear_cancel()
+        super()._check_cancelled()
 
     def reset(self):
         self._tlemmas = []
-        self._models = []
+        self._models = self._new_models_store()
         self._models_count = 0
         self._base_solver.reset()
 
-    def check_all_sat(self, phi, atoms=None, store_models=False) -> bool:
+    def check_all_sat(self, phi, atoms=None, store_models=False, resume_from: str | None = None) -> bool:
+        if store_models and self._slice_partitions:
+            raise ValueError("the models of sliced partitions cannot be stored")
         self.reset()
+        self._start_lemmas_stream()
+        self._progress.start("partitioning")
         # Partition atoms based on their variables
         start_time = time.time()
-        uf = UnionFind()
-        all_vars = set()
-        atoms = phi.get_atoms() if atoms is None else atoms
-        atoms = get_theory_atoms(atoms)
-        for atom in atoms:
-            theory_vars = [v for v in atom.get_free_variables()]
-            all_vars.update(theory_vars)
-            for v1, v2 in it.combinations(theory_vars, 2):
-                uf.union(v1, v2)
-
-        partitions = {}
-        for atom in atoms:
-            root = uf.find(next(iter(atom.get_free_variables())))
-            if root not in partitions:
-                partitions[root] = []
-            partitions[root].append(atom)
+        index = get_formula_index(phi, self.env)
+        if atoms is None:
+            atoms = index.theory_atoms
+            partitions = index.partitions()
+        else:
+            atoms = get_theory_atoms(atoms)
+            partitions = index.partitions(atoms, self.env)
         end_time = time.time()
         if self._computation_logger is not None:
             self._computation_logger["Partitioning time"] = end_time - start_time
             self._computation_logger["Number of partitions"] = len(partitions)
 
+        fingerprint = None
+        if resume_from is not None or self._checkpointer.is_enabled():
+            fingerprint = formula_fingerprint(phi, atoms)
+
         # Solve each partition separately
         overall_result = True
-        for part_atoms in sorted(partitions.values(), key=lambda x: len(x)):
-            self._base_solver.reset()
-            result = self._base_solver.check_all_sat(And(phi, *self._tlemmas), part_atoms, store_models)
+        completed_partitions = set()
+        if resume_from is not None:
+            checkpoint = EnumerationCheckpoint.load(resume_from, fingerprint, self.env)
+            if store_models and len(checkpoint.models) != checkpoint.models_count:
+                raise CheckpointException("Cannot store models when resuming from a checkpoint without models")
+            completed_partitions = checkpoint.completed_tasks
+            self._tlemmas = checkpoint.tlemmas
+            self._models = checkpoint.resume_models() if store_models else self._new_models_store()
+            self._models_count = checkpoint.models_count
+            self._stream_lemmas(self._tlemmas)
+            # each satisfiable partition has at least one model, sliced runs are checked at the end
+            overall_result = len(completed_partitions) == 0 or self._models_count > 0 or self._slice_partitions
+
+        def build_checkpoint() -> EnumerationCheckpoint:
+            return EnumerationCheckpoint(
+                fingerprint=fingerprint,
+                completed_tasks=completed_partitions,
+                tlemmas=self._tlemmas,
+                models=self._models,
+                models_count=self._models_count,
+            )
+
+        # in incremental mode, the lemmas of the resumed partitions are asserted with phi once
+        mgr = self.env.formula_manager
+        incremental_phi = mgr.And(phi, *self._tlemmas) if self._incremental else None
+        slices_abstraction = {}
+        slicing_time = 0.0
+        done_partitions = len(completed_partitions)
+        self._progress.update(
+            phase="partitions",
+            tasks_total=len(partitions),
+            tasks_completed=done_partitions,
+            models=self._models_count,
+            lemmas=len(self._tlemmas),
+            force=True,
+        )
+        for part_atoms in sorted(partitions, key=lambda x: len(x)):
+            part_key = atoms_fingerprint(part_atoms) if fingerprint is not None else None
+            if part_key in completed_partitions:
+                continue
+            try:
+                if self._incremental:
+                    result = self._base_solver.check_all_sat(
+                        incremental_phi, part_atoms, store_models, incremental=True
+                    )
+                elif self._slice_partitions:
+                    # the lemmas of the other partitions only involve atoms which are sliced away
+                    start_time = time.time()
+                    part_phi = slice_formula(phi, part_atoms, slices_abstraction, self.env)
+                    slicing_time += time.time() - start_time
+                    self._base_solver.reset()
+                    result = self._base_solver.check_all_sat(part_phi, part_atoms, store_models)
+                else:
+                    self._base_solver.reset()
+                    result = self._base_solver.check_all_sat(mgr.And(phi, *self._tlemmas), part_atoms, store_models)
+            except EnumerationCancelled:
+                # the base solver consumed the request, the wrapper stops as well
+                self._cancel_event.set()
+            self._check_cancelled()
             if not result:
                 overall_result = False
             self._tlemmas.extend(self._base_solver.get_theory_lemmas())
-            self._models_count += self._base_solver.get_models_count()
+            self._stream_lemmas(self._base_solver.get_theory_lemmas())
+            if not self._slice_partitions:
+                self._models_count += self._base_solver.get_models_count()
             if store_models:
                 self._models.extend(self._base_solver.get_models())
+            if part_key is not None:
+                completed_partitions.add(part_key)
+                self._checkpointer.maybe_save(build_checkpoint)
+            done_partitions += 1
+            self._progress.update(
+                tasks_completed=done_partitions, models=self._models_count, lemmas=len(self._tlemmas)
+            )
+
+        if self._slice_partitions:
+            if self._computation_logger is not None:
+                self._computation_logger["Slicing time"] = slicing_time
+            # an unsatisfiable slice already makes phi unsatisfiable
+            if overall_result:
+                # each slice may be satisfiable even if phi is not, but the lemmas of all the partitions
+                # block every T-inconsistent assignment, so that the Boolean abstraction of phi and the
+                # lemmas (with every theory atom sliced away) is satisfiable exactly when phi is
+                start_time = time.time()
+                abstraction = slice_formula(mgr.And(phi, *self._tlemmas), [], slices_abstraction, self.env)
+                overall_result = self.env.factory.is_sat(abstraction)
+                if self._computation_logger is not None:
+                    self._computation_logger["Slicing check time"] = time.time() - start_time
+        self._checkpointer.maybe_save(build_checkpoint, force=True)
+        self._progress.update(phase="done", models=self._models_count, lemmas=len(self._tlemmas), force=True)
         return overall_result
 
     def get_theory_lemmas(self) -> List[FNode]:
@@ -90,5 +208,8 @@ class WithPartitioningWrapper(SMTEnumerator):
     def get_models(self) -> List:
         return self._models
 
-    def get_models_count(self) -> int:
+    def get_models_count(self) -> int | None:
+        # the models of the slices are not models of phi, they are not counted
+        if self._slice_partitions:
+            return None
         return self._models_count
@@ -0,0 +1,279 @@
+"""this module tunes the mathsat options of the enumerators on a corpus of instances"""
+
+import multiprocessing
+import os
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Sequence
+
+from pysmt.environment import Environment
+from pysmt.fnode import FNode
+from pysmt.shortcuts import And, Not, is_sat
+from pysmt.typing import INT, REAL
+
+from enumerators.formula import read_phi
+from enumerators.generator import THEORIES
+from enumerators.solvers.mathsat_profiles import TUNABLE_OPTIONS, MathSATProfile, TunableOption
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.util.formula_index import get_formula_index
+
+
+def theory_of(phi: FNode, env: Environment | None = None) -> str | None:
+    """returns the theory of phi among THEORIES, or None if phi mixes theories or has no theory atom"""
+    theories = get_formula_index(phi, env).theories
+    if theories == {REAL}:
+        return "LRA"
+    if theories == {INT}:
+        return "LIA"
+    if len(theories) > 0 and all(theory.is_bv_type() for theory in theories):
+        return "BV"
+    return None
+
+
+def corpus_files(paths: Iterable[str]) -> List[str]:
+    """returns the SMT-LIB files among paths and in the directories among paths, recursively"""
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, _, names in sorted(os.walk(path)):
+            files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith((".smt2", ".smt")))
+    return files
+
+
+def _instance_theory(path: str) -> str | None:
+    return theory_of(read_phi(path))
+
+
+def split_corpus(paths: Iterable[str], processes: int = 1) -> Dict[str, List[str]]:
+    """returns the instances of the corpus by theory, without those which have no single theory
+
+    The instances are read by a pool of processes, so that their formulas are not kept in this process.
+    """
+    files = corpus_files(paths)
+    with multiprocessing.Pool(processes=max(1, min(processes, len(files)))) as pool:
+        theories = pool.map(_instance_theory, files)
+    corpus = {}
+    for path, theory in zip(files, theories):
+        if theory is not None:
+            corpus.setdefault(theory, []).append(path)
+    return corpus
+
+
+@dataclass
+class InstanceResult:
+    """the enumeration of an instance with a set of mathsat options"""
+
+    path: str
+    time: float
+    models: int = 0
+    lemmas: int = 0
+    timed_out: bool = False
+    # the error which stopped the enumeration, e.g. an option rejected by mathsat, or invalid lemmas
+    error: str | None = None
+
+
+@dataclass
+class Evaluation:
+    """the enumeration of the instances of a corpus with a set of mathsat options
+
+    The score is the PAR-2 time of the enumerations: the instances which time out count twice the timeout.
+    """
+
+    options: Dict[str, str]
+    results: List[InstanceResult] = field(default_factory=list)
+    timeout: float = 0.0
+
+    @property
+    def score(self) -> float:
+        return sum(2 * self.timeout if r.timed_out else r.time for r in self.results)
+
+    @property
+    def lemmas(self) -> int:
+        return sum(r.lemmas for r in self.results)
+
+    @property
+    def errors(self) -> List[str]:
+        return [f"{r.path}: {r.error}" for r in self.results if r.error is not None]
+
+    def is_consistent_with(self, reference: "Evaluation") -> bool:
+        """True if the enumerations which completed in both evaluations found the same number of models"""
+        reference_models = {r.path: r.models for r in reference.results if not r.timed_out and r.error is None}
+        return all(
+            r.models == reference_models[r.path]
+            for r in self.results
+            if not r.timed_out and r.error is None and r.path in reference_models
+        )
+
+
+def _enumerate_instance(enumerator_cls: type, profile: MathSATProfile, path: str, check_lemmas: bool) -> tuple:
+    """Worker function of the tuner, returns the time, the models and the lemmas of the enumeration of path"""
+    phi = read_phi(path)
+    enumerator = enumerator_cls(msat_profile=profile)
+    start_time = time.perf_counter()
+    enumerator.check_all_sat(phi)
+    elapsed = time.perf_counter() - start_time
+    lemmas = enumerator.get_theory_lemmas()
+    # a valid set of lemmas has no counter-model, checked with the default options of mathsat
+    if check_lemmas and len(lemmas) > 0 and is_sat(Not(And(lemmas)), solver_name="msat"):
+        raise ValueError("the options produced lemmas which are not T-valid")
+    return elapsed, enumerator.get_models_count(), len(lemmas)
+
+
+class OptionTuner:
+    """searches the mathsat options of TUNABLE_OPTIONS which minimize the enumeration time of a corpus
+
+    The search is a coordinate descent from the defaults of the enumerators: each option which applies
+    to the theory of the corpus is set in turn to each of its values, the others being fixed, and the
+    value is kept if it improves the score (see Evaluation) by at least min_improvement, relatively,
+    until a round over all the options changes nothing or after rounds rounds. The options which the
+    lemmas rely on cannot be tuned (see PROTECTED_OPTIONS), and the options whose enumerations fail,
+    find a different number of models or, if check_lemmas is True, invalid lemmas are discarded.
+
+    Each enumeration runs in its own process, which is terminated after timeout seconds.
+
+    Args:
+        enumerator_cls (type) [MathSATTotalEnumerator]: the enumerator tuned, which must accept msat_profile
+        timeout (float) [60.0]: the seconds allowed to each enumeration
+        options (Sequence[TunableOption]) [TUNABLE_OPTIONS]: the search space
+        rounds (int) [2]: the maximum number of rounds over the options
+        min_improvement (float) [0.05]: the relative improvement needed to change an option
+        check_lemmas (bool) [True]: if True, the lemmas of each enumeration are checked to be T-valid
+        log (Callable[[str], None] | None) [None]: called with a line for each evaluation
+    """
+
+    def __init__(
+        self,
+        enumerator_cls: type = MathSATTotalEnumerator,
+        timeout: float = 60.0,
+        options: Sequence[TunableOption] = TUNABLE_OPTIONS,
+        rounds: int = 2,
+        min_improvement: float = 0.05,
+        check_lemmas: bool = True,
+        log: Callable[[str], None] | None = None,
+    ):
+        if timeout <= 0 or rounds < 1 or min_improvement < 0:
+            raise ValueError("timeout and rounds must be positive, and min_improvement non-negative")
+        self.enumerator_cls = enumerator_cls
+        self.timeout = timeout
+        self.options = list(options)
+        self.rounds = rounds
+        self.min_improvement = min_improvement
+        self.check_lemmas = check_lemmas
+        self._log = log
+
+    def evaluate(self, theory: str, instances: Sequence[str], options: Dict[str, str]) -> Evaluation:
+        """enumerates each instance with the given options"""
+        profile = MathSATProfile("candidate", theory, options)
+        evaluation = Evaluation(dict(options), timeout=self.timeout)
+        for path in instances:
+            evaluation.results.append(self._run(profile, path))
+            # the other instances cannot make a failed candidate acceptable
+            if evaluation.results[-1].error is not None:
+                break
+        return evaluation
+
+    def _run(self, profile: MathSATProfile, path: str) -> InstanceResult:
+        # a process per enumeration, so that it can be stopped at the timeout
+        pool = multiprocessing.Pool(processes=1)
+        start_time = time.perf_counter()
+        try:
+            result = pool.apply_async(_enumerate_instance, (self.enumerator_cls, profile, path, self.check_lemmas))
+            elapsed, models, lemmas = result.get(self.timeout)
+            return InstanceResult(path, elapsed, models, lemmas)
+        except multiprocessing.TimeoutError:
+            return InstanceResult(path, time.perf_counter() - start_time, timed_out=True)
+        except Exception as e:  # pylint: disable=broad-except
+            return InstanceResult(path, time.perf_counter() - start_time, error=f"{type(e).__name__}: {e}")
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def tune(self, theory: str, instances: Sequence[str], name: str) -> MathSATProfile:
+        """returns the profile of the best options found for the instances of theory
+
+        Args:
+            theory (str): the theory of the instances, one of THEORIES
+            instances (Sequence[str]): the SMT-LIB files of the corpus
+            name (str): the name of the profile
+
+        Returns:
+            MathSATProfile: the profile, whose info records the corpus and the scores
+        """
+        if theory not in THEORIES:
+            raise ValueError(f"theory must be one of {', '.join(THEORIES)}")
+        if len(instances) == 0:
+            raise ValueError("the corpus of a theory needs at least one instance")
+        baseline = self.evaluate(theory, instances, {})
+        if baseline.errors:
+            raise ValueError(f"the enumerator fails with its default options: {'; '.join(baseline.errors)}")
+        self._report(theory, "defaults", baseline)
+
+        best = baseline
+        # the candidates already evaluated, e.g. in a previous round, are not enumerated again
+        evaluated = {frozenset(): baseline}
+        for _ in range(self.rounds):
+            changed = False
+            for option in self.options:
+                if not option.applies_to(theory):
+                    continue
+                for value in option.values:
+                    if best.options.get(option.name) == value:
+                        continue
+                    options = {**best.options, option.name: value}
+                    key = frozenset(options.items())
+                    if key not in evaluated:
+                        evaluated[key] = self.evaluate(theory, instances, options)
+                        self._report(theory, f"{option.name}={value}", evaluated[key])
+                    candidate = evaluated[key]
+                    if candidate.errors or not candidate.is_consistent_with(baseline):
+                        continue
+                    if candidate.score < best.score * (1 - self.min_improvement):
+                        best = candidate
+                        changed = True
+            if not changed:
+                break
+
+        info = {
+            "enumerator": self.enumerator_cls.__name__,
+            "instances": list(instances),
+            "timeout": self.timeout,
+            "evaluations": len(evaluated),
+            "default_score": baseline.score,
+            "tuned_score": best.score,
+            "default_lemmas": baseline.lemmas,
+            "tuned_lemmas": best.lemmas,
+            "median_time": statistics.median(r.time for r in best.results),
+        }
+        return MathSATProfile(name, theory, best.options, info)
+
+    def _report(self, theory: str, label: str, evaluation: Evaluation) -> None:
+        if self._log is None:
+            return
+        status = "failed" if evaluation.errors else f"score={evaluation.score:.3f}s lemmas={evaluation.lemmas}"
+        self._log(f"{theory} {label}: {status}")
+
+
+def tune_corpus(
+    paths: Iterable[str], prefix: str = "tuned", directory: str | None = None, **tuner_options
+) -> Dict[str, MathSATProfile]:
+    """tunes a profile for each theory of a corpus, and saves it with the name prefix-theory (e.g. tuned-lra)
+
+    Args:
+        paths (Iterable[str]): SMT-LIB files, or directories of SMT-LIB files
+        prefix (str) ["tuned"]: the prefix of the names of the profiles
+        directory (str | None) [None]: where the profiles are saved, see profiles_dir
+        **tuner_options: the arguments of OptionTuner
+
+    Returns:
+        Dict[str, MathSATProfile]: the profile of each theory of the corpus
+    """
+    tuner = OptionTuner(**tuner_options)
+    profiles = {}
+    for theory, instances in split_corpus(paths, multiprocessing.cpu_count()).items():
+        profile = tuner.tune(theory, instances, f"{prefix}-{theory.lower()}")
+        profile.save(directory)
+        profiles[theory] = profile
+    return profiles
@@ -0,0 +1,275 @@
+"""this module implements a bidirectional mapping between atoms and integer ids"""
+
+from array import array
+from itertools import islice
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from pysmt.fnode import FNode
+from pysmt.formula import FormulaContextualizer
+from pysmt.shortcuts import get_env
+
+from enumerators.util.pysmt import contextualize
+
+
+def _import_numpy():
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        raise ImportError("numpy is required for the as_numpy option, please install it") from e
+    return numpy
+
+
+def _is_numpy_array(values) -> bool:
+    return type(values).__module__ == "numpy" and hasattr(values, "dtype")
+
+
+class AtomTable:
+    """this class assigns to each atom a positive integer id
+
+    Literals are encoded DIMACS-style: an atom is encoded by its id and its negation by the opposite of its id.
+    Ids are assigned incrementally starting from 1, in order of first appearance.
+
+    Whole models can be encoded and decoded in a single call (encode_models, decode_models), as a flat
+    array of literals and the end offset of each model. Literals are looked up in plain lists and
+    dictionaries, so that batches of millions of literals are translated without dispatching on each
+    formula. If numpy is installed, arrays can also be given and returned as numpy arrays.
+    """
+
+    # atoms, the atom with id i is at position i - 1
+    atoms: List[FNode]
+    # id of each atom
+    ids: Dict[FNode, int]
+
+    def __init__(self, atoms: Iterable[FNode] = (), env=None):
+        self.env = env if env is not None else get_env()
+        self.atoms = []
+        self.ids = {}
+        self._negations: List[FNode | None] = []
+        # signed id of each literal encoded so far
+        self._codes: Dict[FNode, int] = {}
+        # the literal with signed id c is at position len(self) + c, see _get_lookup
+        self._lookup: List[FNode | None] = [None]
+        self._lookup_numpy = None
+        for atom in atoms:
+            self.get_id(atom)
+
+    def __len__(self) -> int:
+        return len(self.atoms)
+
+    def __contains__(self, atom: FNode) -> bool:
+        return atom in self.ids
+
+    def get_id(self, atom: FNode) -> int:
+        """returns the id of the atom, adding it to the table if needed"""
+        atom_id = self.ids.get(atom)
+        if atom_id is None:
+            self.atoms.append(atom)
+            self._negations.append(None)
+            atom_id = len(self.atoms)
+            self.ids[atom] = atom_id
+        return atom_id
+
+    def get_atom(self, atom_id: int) -> FNode:
+        """returns the atom with the given (positive) id"""
+        return self.atoms[atom_id - 1]
+
+    def encode_literal(self, literal: FNode) -> int:
+        """returns the signed id of a literal"""
+        code = self._codes.get(literal)
+        if code is None:
+            if literal.is_not():
+                code = -self.get_id(literal.arg(0))
+            else:
+                code = self.get_id(literal)
+            self._codes[literal] = code
+        return code
+
+    def decode_literal(self, code: int) -> FNode:
+        """returns the literal with the given signed id"""
+        if code > 0:
+            return self.atoms[code - 1]
+        negation = self._negations[-code - 1]
+        if negation is None:
+            negation = self.env.formula_manager.Not(self.atoms[-code - 1])
+            self._negations[-code - 1] = negation
+        return negation
+
+    def encode_literals(self, literals: Iterable[FNode]) -> array:
+        """returns the signed ids of a collection of literals (e.g. a model or a clause)"""
+        codes = self._codes
+        return array("i", [codes.get(literal) or self.encode_literal(literal) for literal in literals])
+
+    def _get_lookup(self) -> List[FNode]:
+        size = len(self.atoms)
+        if len(self._lookup) != 2 * size + 1:
+            negations = [self.decode_literal(-atom_id) for atom_id in range(size, 0, -1)]
+            self._lookup = negations + [None] + self.atoms
+            self._lookup_numpy = None
+        return self._lookup
+
+    def decode_literals(self, codes: Iterable[int]) -> List[FNode]:
+        """returns the literals with the given signed ids
+
+        If codes is a numpy array, the literals are returned as a numpy array of objects.
+        """
+        lookup = self._get_lookup()
+        size = len(self.atoms)
+        if _is_numpy_array(codes):
+            if self._lookup_numpy is None:
+                numpy = _import_numpy()
+                self._lookup_numpy = numpy.empty(len(lookup), dtype=object)
+                self._lookup_numpy[:] = lookup
+            return self._lookup_numpy[codes + size]
+        return [lookup[size + code] for code in codes]
+
+    def encode_models(self, models: Iterable[Iterable[FNode]], as_numpy: bool = False) -> Tuple[Sequence, Sequence]:
+        """encodes a batch of models (or clauses)
+
+        Args:
+            models (Iterable[Iterable[FNode]]): the models, as collections of literals
+            as_numpy (bool) [False]: if True, numpy arrays are returned instead of arrays
+
+        Returns:
+            Tuple[Sequence, Sequence]: the int32 signed ids of all the literals and the int64
+                end offset of each model in the first array
+        """
+        codes = self._codes
+        encode_literal = self.encode_literal
+        literals = array("i")
+        offsets = array("q")
+        for model in models:
+            literals.extend([codes.get(literal) or encode_literal(literal) for literal in model])
+            offsets.append(len(literals))
+        if as_numpy:
+            numpy = _import_numpy()
+            return numpy.array(literals, dtype=numpy.int32), numpy.array(offsets, dtype=numpy.int64)
+        return literals, offsets
+
+    def decode_models(self, literals: Sequence[int], offsets: Sequence[int]) -> List[List[FNode]]:
+        """decodes a batch of models encoded by encode_models
+
+        Args:
+            literals (Sequence[int]): the signed ids of all the literals
+            offsets (Sequence[int]): the end offset of each model
+
+        Returns:
+            List[List[FNode]]: the models, as lists of literals
+        """
+        decoded = self.decode_literals(literals)
+        if _is_numpy_array(decoded):
+            decoded = decoded.tolist()
+        models = []
+        start = 0
+        for end in offsets:
+            models.append(decoded[start:end])
+            start = end
+        return models
+
+    def __getstate__(self):
+        return {"atoms": self.atoms}
+
+    def __setstate__(self, state):
+        self.__init__(state["atoms"])
+
+    def contextualize(self, contextualizer: FormulaContextualizer) -> None:
+        """recreates the atoms of the table in the environment of contextualizer"""
+        atoms = contextualize(contextualizer, self.atoms)
+        self.__init__(atoms, contextualizer.env)
+
+
+class AbstractionTable:
+    """this class maps batches of literals between atoms and their Boolean abstraction
+
+    The abstraction is a dictionary from atoms to Boolean variables, such as
+    BooleanAbstractionWalker.abstraction. The atoms and their abstraction are kept in two
+    AtomTables which give the same id to an atom and to its abstraction: models are refined (or
+    abstracted) through a literal-to-literal map derived from the two tables, and can be encoded
+    once as arrays of ids and decoded on either side.
+    Boolean variables which are not in the abstraction are mapped to themselves.
+
+    The dictionary is shared, not copied: entries added to it later (e.g. by the walker) are
+    picked up on the next call.
+    """
+
+    def __init__(self, abstraction: Dict[FNode, FNode] | None = None, env=None):
+        self.abstraction = abstraction if abstraction is not None else {}
+        self.atoms = AtomTable(env=env)
+        self.variables = AtomTable(env=env)
+        self._synced = 0
+        self._mapping: Dict[FNode, FNode] = {}
+        self._mapping_key = None
+
+    def _sync(self) -> None:
+        if self._synced == len(self.abstraction):
+            return
+        for atom, variable in islice(self.abstraction.items(), self._synced, None):
+            self._add(atom, variable)
+        self._synced = len(self.abstraction)
+
+    def _add(self, atom: FNode, variable: FNode) -> None:
+        # both ids are checked before adding anything, so that the tables stay aligned on errors
+        atom_id = self.atoms.ids.get(atom)
+        if self.variables.ids.get(variable) != atom_id:
+            raise ValueError(f"{atom} and {variable} are already mapped to different literals")
+        if atom_id is None:
+            self.atoms.get_id(atom)
+            self.variables.get_id(variable)
+
+    def _get_mapping(self, source: AtomTable, target: AtomTable) -> Dict[FNode, FNode]:
+        key = (id(source), len(source))
+        if self._mapping_key != key:
+            # lookups of both tables are aligned, since literals with the same id correspond
+            self._mapping = dict(zip(source._get_lookup(), target._get_lookup()))
+            self._mapping_key = key
+        return self._mapping
+
+    def _translate(self, models, source: AtomTable, target: AtomTable) -> List[List[FNode]]:
+        self._sync()
+        mapping = self._get_mapping(source, target)
+        translated = []
+        for model in models:
+            try:
+                translated.append([mapping[literal] for literal in model])
+            except KeyError:
+                # literals not in the abstraction (e.g. Boolean variables) are mapped to themselves
+                for literal in model:
+                    atom = literal.arg(0) if literal.is_not() else literal
+                    if atom not in source:
+                        self._add(atom, atom)
+                mapping = self._get_mapping(source, target)
+                translated.append([mapping[literal] for literal in model])
+        return translated
+
+    def refine_models(self, models: Iterable[Iterable[FNode]]) -> List[List[FNode]]:
+        """refines a batch of models over the abstraction into models over the atoms
+
+        Args:
+            models (Iterable[Iterable[FNode]]): the models of the abstraction
+
+        Returns:
+            List[List[FNode]]: the refined models, as lists of literals
+        """
+        return self._translate(models, self.variables, self.atoms)
+
+    def abstract_models(self, models: Iterable[Iterable[FNode]]) -> List[List[FNode]]:
+        """abstracts a batch of models over the atoms into models over the abstraction
+
+        Args:
+            models (Iterable[Iterable[FNode]]): the models over the atoms
+
+        Returns:
+            List[List[FNode]]: the abstracted models, as lists of literals
+        """
+        return self._translate(models, self.atoms, self.variables)
+
+    def encode_models(self, models: Iterable[Iterable[FNode]], as_numpy: bool = False) -> Tuple[Sequence, Sequence]:
+        """encodes a batch of models over the abstraction, with the ids shared by atoms and variables"""
+        self._sync()
+        return self.variables.encode_models(models, as_numpy)
+
+    def decode_models(
+        self, literals: Sequence[int], offsets: Sequence[int], refine: bool = True
+    ) -> List[List[FNode]]:
+        """decodes a batch of encoded models, over the atoms if refine is True, else over the abstraction"""
+        self._sync()
+        return (self.atoms if refine else self.variables).decode_models(literals, offsets)
@@ -0,0 +1,193 @@
+"""this module implements checkpointing of the state of long-running enumerations"""
+
+import hashlib
+import os
+import pickle
+import time
+from typing import Iterable, List, Set
+
+from pysmt.fnode import FNode
+from pysmt.formula import FormulaContextualizer
+from pysmt.shortcuts import to_smtlib
+
+from enumerators.util.custom_exceptions import CheckpointException
+from enumerators.util.model_sink import ModelSink
+from enumerators.util.pysmt import contextualize
+
+CHECKPOINT_VERSION = 1
+
+
+def atoms_fingerprint(atoms: Iterable[FNode]) -> str:
+    """computes a fingerprint of a set of atoms, stable across processes
+
+    Args:
+        atoms (Iterable[FNode]): a collection of pysmt atoms
+
+    Returns:
+        str: an hex digest identifying the set of atoms
+    """
+    digest = hashlib.sha256()
+    for atom in sorted(to_smtlib(a, daggify=False) for a in atoms):
+        digest.update(atom.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def formula_fingerprint(phi: FNode, atoms: Iterable[FNode]) -> str:
+    """computes a fingerprint of the enumeration problem, stable across processes
+
+    Args:
+        phi (FNode): the enumerated formula
+        atoms (Iterable[FNode]): the atoms on which the enumeration is projected
+
+    Returns:
+        str: an hex digest identifying phi and the projection atoms
+    """
+    digest = hashlib.sha256(to_smtlib(phi, daggify=True).encode())
+    digest.update(atoms_fingerprint(atoms).encode())
+    return digest.hexdigest()
+
+
+class EnumerationCheckpoint:
+    """snapshot of the state of an enumeration
+
+    The snapshot is saved atomically on disk, so that a preempted run can be resumed
+    from the last checkpoint, skipping the work that was already completed.
+    """
+
+    # fingerprint of the enumerated formula and projection atoms
+    fingerprint: str
+    # partial models of the partial enumeration phase, None if the phase did not complete
+    partial_models: List[List[FNode]] | None
+    # identifiers of the completed tasks (extension tasks or partitions)
+    completed_tasks: Set
+    # theory lemmas found so far
+    tlemmas: List[FNode]
+    # models found so far (only if models are stored), a ModelSink only refers to its spilled files
+    models: List | ModelSink
+    # number of models found so far
+    models_count: int
+
+    def __init__(
+        self,
+        fingerprint: str,
+        partial_models: List[List[FNode]] | None = None,
+        completed_tasks: Iterable | None = None,
+        tlemmas: List[FNode] | None = None,
+        models: List | ModelSink | None = None,
+        models_count: int = 0,
+    ):
+        self.fingerprint = fingerprint
+        self.partial_models = partial_models
+        self.completed_tasks = set(completed_tasks) if completed_tasks is not None else set()
+        self.tlemmas = tlemmas if tlemmas is not None else []
+        self.models = models if models is not None else []
+        self.models_count = models_count
+
+    def resume_models(self) -> List | ModelSink:
+        """returns the models of the checkpoint, ready to be extended by the resumed enumeration
+
+        The spilled files of a ModelSink are truncated back to the checkpoint (see ModelSink.resume).
+        """
+        if isinstance(self.models, ModelSink):
+            self.models.resume()
+        return self.models
+
+    def save(self, path: str) -> None:
+        """writes the checkpoint to path
+
+        The checkpoint is first written to a temporary file which then replaces path,
+        so that a crash while saving never corrupts the previous checkpoint.
+        """
+        tmp_path = f"{path}.tmp"
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "fingerprint": self.fingerprint,
+            "partial_models": self.partial_models,
+            "completed_tasks": self.completed_tasks,
+            "tlemmas": self.tlemmas,
+            "models": self.models,
+            "models_count": self.models_count,
+        }
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str | None = None, env=None) -> "EnumerationCheckpoint":
+        """reads a checkpoint from path and recreates its formulas in the current environment
+
+        Args:
+            path (str): the checkpoint file
+            fingerprint (str | None) [None]: if given, the checkpoint must have been taken for this fingerprint
+            env (Environment | None) [None]: the pysmt environment of the formulas, the global one if None
+
+        Returns:
+            EnumerationCheckpoint: the loaded checkpoint
+
+        Raises:
+            CheckpointException: if the checkpoint is not readable or refers to a different problem
+        """
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            # also raised when the spilled models of a ModelSink are missing
+            raise CheckpointException(f"Cannot read checkpoint {path}") from e
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise CheckpointException(f"Unsupported checkpoint version {state.get('version')}")
+        if fingerprint is not None and state["fingerprint"] != fingerprint:
+            raise CheckpointException(f"Checkpoint {path} was taken for a different formula or projection")
+
+        contextualizer = FormulaContextualizer(env)
+        partial_models = state["partial_models"]
+        if partial_models is not None:
+            partial_models = contextualize(contextualizer, partial_models)
+        models = state["models"]
+        if isinstance(models, ModelSink):
+            models.contextualize(contextualizer)
+        else:
+            models = contextualize(contextualizer, models)
+        return cls(
+            fingerprint=state["fingerprint"],
+            partial_models=partial_models,
+            completed_tasks=state["completed_tasks"],
+            tlemmas=contextualize(contextualizer, state["tlemmas"]),
+            models=models,
+            models_count=state["models_count"],
+        )
+
+
+class Checkpointer:
+    """saves checkpoints to a file at most once every interval seconds"""
+
+    def __init__(self, path: str | None, interval: float = 60.0):
+        self.path = path
+        self.interval = interval
+        self._last_save = time.monotonic()
+
+    def is_enabled(self) -> bool:
+        """returns True if checkpoints are saved"""
+        return self.path is not None
+
+    def maybe_save(self, checkpoint_builder, force: bool = False) -> bool:
+        """saves a checkpoint if the interval has elapsed since the last one
+
+        Args:
+            checkpoint_builder: a callable returning the EnumerationCheckpoint to save,
+                only invoked when a checkpoint is actually written
+            force (bool) [False]: if True, the checkpoint is saved regardless of the interval
+
+        Returns:
+            bool: True if a checkpoint was saved
+        """
+        if self.path is None:
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_save < self.interval:
+            return False
+        checkpoint_builder().save(self.path)
+        self._last_save = time.monotonic()
+        return True
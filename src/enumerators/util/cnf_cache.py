@@ -0,0 +1,84 @@
+"""this module memoizes the CNF conversion of formulas conjoined with lemmas"""
+
+from collections import OrderedDict
+from typing import List
+
+from allsat_cnf.polarity_cnfizer import PolarityCNFizer
+from pysmt.fnode import FNode
+from pysmt.shortcuts import get_env
+
+from enumerators.formula import get_clause_literals
+from enumerators.util.custom_exceptions import FormulaException
+
+
+class CNFCache:
+    """converts formulas to CNF with PolarityCNFizer(nnf=True, mutex_nnf_labels=True), reusing previous conversions
+
+    The top-level conjuncts of a formula are split into clauses, which are kept as they are, and
+    the other conjuncts, which are converted together. The conversion is memoized on the
+    (hash-consed) conjunction of the non-clause conjuncts, so that a formula phi conjoined with
+    a growing set of lemmas, as in And(phi, *lemmas), is CNF-ized only once: the lemmas, which are
+    clauses, are just appended to the memoized CNF of phi.
+
+    Args:
+        max_size (int) [16]: the number of conversions kept, the least recently used are discarded
+        env (Environment | None) [None]: the pysmt environment of the formulas, the global one if None
+    """
+
+    def __init__(self, max_size: int = 16, env=None):
+        self.max_size = max_size
+        self.env = env if env is not None else get_env()
+        self._cache: OrderedDict[FNode, FNode] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        """discards all the memoized conversions"""
+        self._cache.clear()
+
+    def convert(self, phi: FNode) -> FNode:
+        """returns a CNF formula equisatisfiable to phi, with the same models over the atoms of phi
+
+        Args:
+            phi (FNode): a pysmt formula
+
+        Returns:
+            FNode: the CNF formula
+        """
+        clauses: List[FNode] = []
+        others: List[FNode] = []
+        stack = [phi]
+        while stack:
+            conjunct = stack.pop()
+            if conjunct.is_and():
+                stack.extend(reversed(conjunct.args()))
+                continue
+            if conjunct.is_true():
+                continue
+            try:
+                get_clause_literals(conjunct)
+                clauses.append(conjunct)
+            except FormulaException:
+                others.append(conjunct)
+
+        mgr = self.env.formula_manager
+        if len(others) == 0:
+            return mgr.And(clauses)
+
+        key = mgr.And(others)
+        cnf = self._cache.get(key)
+        if cnf is None:
+            self.misses += 1
+            cnf = PolarityCNFizer(nnf=True, mutex_nnf_labels=True, environment=self.env).convert_as_formula(key)
+            self._cache[key] = cnf
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        if len(clauses) == 0:
+            return cnf
+        return mgr.And([cnf] + clauses)
@@ -28,7 +28,7 @@ def map_nested(func: Callable[[T], U], data: Nested[T]) -> Nested[U]:
         if was_expanded:
             if isinstance(item, Collection):
                 args = [output_stack.pop() for _ in range(len(item))]
-                output_stack.append(type(item)(reversed(args)))
+                output_stack.append(type(item)(args))
             else:
                 output_stack.append(func(item))
         else:
@@ -38,5 +38,5 @@ def map_nested(func: Callable[[T], U], data: Nested[T]) -> Nested[U]:
                     stack.append((False, element))
 
     if isinstance(data, Collection):
-        return type(data)(reversed([output_stack.pop() for _ in range(len(data))]))
+        return type(data)([output_stack.pop() for _ in range(len(data))])
     return output_stack.pop()
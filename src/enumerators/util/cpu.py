@@ -0,0 +1,97 @@
+"""this module detects the CPUs available to the process and sizes process pools accordingly"""
+
+import math
+import multiprocessing
+import os
+from typing import List
+
+# estimated time (in seconds) to start a pool and initialize its workers
+POOL_STARTUP_TIME = 0.5
+
+_CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+_CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+_CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read_first_line(path: str) -> str | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> int | None:
+    """returns the number of CPUs allowed by the cgroup CPU quota, or None if there is no quota"""
+    line = _read_first_line(_CGROUP_V2_CPU_MAX)
+    if line is not None:
+        quota, _, period = line.partition(" ")
+        if quota == "max" or not period:
+            return None
+        quota, period = int(quota), int(period)
+    else:
+        quota_line = _read_first_line(_CGROUP_V1_CPU_QUOTA)
+        period_line = _read_first_line(_CGROUP_V1_CPU_PERIOD)
+        if quota_line is None or period_line is None:
+            return None
+        quota, period = int(quota_line), int(period_line)
+    if quota <= 0 or period <= 0:
+        return None
+    return max(1, math.ceil(quota / period))
+
+
+def available_cpu_ids() -> List[int]:
+    """returns the ids of the CPUs on which the process can run"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(multiprocessing.cpu_count()))
+
+
+def available_cpus() -> int:
+    """returns the number of CPUs the process can actually use, given its affinity and its cgroup quota"""
+    cpus = len(available_cpu_ids())
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, limit)
+    return max(1, cpus)
+
+
+def choose_workers(
+    tasks: int, task_time: float, max_workers: int, startup_time: float = POOL_STARTUP_TIME
+) -> int:
+    """chooses the number of workers which minimizes the estimated time to run independent tasks
+
+    The estimated time is tasks * task_time for a sequential run (1 worker), and
+    startup_time + ceil(tasks / workers) * task_time with a pool of workers.
+
+    Args:
+        tasks (int): the number of tasks
+        task_time (float): the estimated time of a task, in seconds
+        max_workers (int): the maximum number of workers
+        startup_time (float) [POOL_STARTUP_TIME]: the estimated time to start the pool
+
+    Returns:
+        int: the number of workers, 1 means that the tasks should run sequentially
+    """
+    best_workers = 1
+    best_time = tasks * task_time
+    for workers in range(2, min(max_workers, tasks) + 1):
+        estimated_time = startup_time + math.ceil(tasks / workers) * task_time
+        if estimated_time < best_time:
+            best_workers, best_time = workers, estimated_time
+    return best_workers
+
+
+def pin_to_cpu(cpu_ids: List[int], counter) -> None:
+    """pins the calling process to one of cpu_ids, chosen round-robin with a shared counter
+
+    Args:
+        cpu_ids (List[int]): the CPUs to choose from
+        counter: a multiprocessing.Value("i") shared by the processes being pinned
+    """
+    if not hasattr(os, "sched_setaffinity") or len(cpu_ids) == 0:
+        return
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    os.sched_setaffinity(0, {cpu_ids[index % len(cpu_ids)]})
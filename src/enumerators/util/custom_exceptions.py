@@ -47,3 +47,33 @@ class InvalidVTreeException(Exception):
 
     def __init__(self, message):
         super().__init__(message)
+
+class CheckpointException(Exception):
+    '''An exception for checkpoints that cannot be used to resume an enumeration'''
+
+    def __init__(self, message):
+        super().__init__(message)
+
+class CompilerException(Exception):
+    '''An exception for external knowledge compilers which fail or time out'''
+
+    def __init__(self, message):
+        super().__init__(message)
+
+class EnumerationCancelled(Exception):
+    '''An exception for enumerations stopped by a call to cancel'''
+
+    def __init__(self, message):
+        super().__init__(message)
+
+class PortfolioException(Exception):
+    '''An exception for portfolios in which no configuration completes the enumeration'''
+
+    def __init__(self, message):
+        super().__init__(message)
+
+class ServerException(Exception):
+    '''An exception for jobs which the enumeration server rejects or fails to run'''
+
+    def __init__(self, message):
+        super().__init__(message)
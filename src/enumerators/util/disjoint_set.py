@@ -102,3 +102,29 @@ class DisjointSet:
                 sets[root] = set()
             sets[root].add(node.get_data())
         return sets
+
+
+class UnionFind:
+    """a disjoint set data structure whose items are added as they are first found"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        if item not in self.parent:
+            self.parent[item] = item
+        if self.parent[item] != item:
+            self.parent[item] = self.find(self.parent[item])
+        return self.parent[item]
+
+    def union(self, item1, item2):
+        root1 = self.find(item1)
+        root2 = self.find(item2)
+        if root1 != root2:
+            self.parent[root2] = root1
+
+    def copy(self) -> "UnionFind":
+        """returns an independent copy of the sets"""
+        other = UnionFind()
+        other.parent = dict(self.parent)
+        return other
@@ -0,0 +1,286 @@
+"""this module analyses the structure of a formula once, and shares the analysis between its users"""
+
+import weakref
+from collections import OrderedDict
+from typing import Collection, Dict, FrozenSet, Iterable, List, Set
+
+from pysmt.environment import Environment, get_env
+from pysmt.fnode import FNode
+from pysmt.typing import BOOL, PySMTType
+
+from enumerators.util.disjoint_set import UnionFind
+
+
+class FormulaIndex:
+    """the atoms of a formula, their variables and the features of the formula, computed in one pass over its DAG
+
+    The Boolean structure of the formula is walked down to its atoms, as by the atoms oracle of pysmt,
+    and the terms of the theory atoms are walked to collect their variables, so that each node of
+    the formula is visited once. The index records:
+        - the atoms, in the order they are first found, and which of them are theory atoms;
+        - the variables of each theory atom, and the theory atoms of each variable;
+        - the signature of each theory atom, i.e. the types of its variables;
+        - whether the formula has term-ITEs or quantifiers, which the enumerators do not support;
+        - the partitioning of the theory atoms into sets which share no variable, even transitively.
+
+    An index of And(phi, *lemmas) is obtained from the index of phi with conjoin, which only walks the lemmas.
+    The index does not keep a reference to the pysmt environment, which is only used to type the terms.
+    """
+
+    def __init__(self, phi: FNode | None = None, env: Environment | None = None):
+        self._atoms: Dict[FNode, None] = {}
+        self._atom_vars: Dict[FNode, FrozenSet[FNode]] = {}
+        self._var_atoms: Dict[FNode, Set[FNode]] = {}
+        self._term_info: Dict[FNode, tuple] = {}
+        self._visited: Set[FNode] = set()
+        self._union_find = UnionFind()
+        self._partitions = None
+        self.has_term_ite = False
+        self.has_quantifiers = False
+        if phi is not None:
+            self._add(phi, env if env is not None else get_env())
+
+    @property
+    def atoms(self) -> List[FNode]:
+        """the atoms of the formula"""
+        return list(self._atoms)
+
+    @property
+    def theory_atoms(self) -> List[FNode]:
+        """the atoms of the formula which are not Boolean variables"""
+        return [atom for atom in self._atoms if not atom.is_symbol(BOOL)]
+
+    @property
+    def is_supported(self) -> bool:
+        """True if the formula has neither term-ITEs nor quantifiers"""
+        return not self.has_term_ite and not self.has_quantifiers
+
+    @property
+    def theories(self) -> FrozenSet[PySMTType]:
+        """the types of the variables of the theory atoms"""
+        return frozenset(var.symbol_type() for var in self._var_atoms)
+
+    def variables(self, atom: FNode) -> FrozenSet[FNode]:
+        """returns the variables of a theory atom of the formula"""
+        return self._atom_vars[atom]
+
+    def atoms_of(self, var: FNode) -> Set[FNode]:
+        """returns the theory atoms of the formula in which var occurs"""
+        return self._var_atoms.get(var, set())
+
+    def signature(self, atom: FNode) -> FrozenSet[PySMTType]:
+        """returns the types of the variables of a theory atom of the formula"""
+        return frozenset(var.symbol_type() for var in self._atom_vars[atom])
+
+    def partitions(
+        self, atoms: Collection[FNode] | None = None, env: Environment | None = None
+    ) -> List[List[FNode]]:
+        """returns the theory atoms (the given ones if not None) split into sets which share no variable
+
+        Args:
+            atoms (Collection[FNode] | None) [None]: theory atoms, all those of the formula if None
+            env (Environment | None) [None]: the pysmt environment of the given atoms which are not
+                in the formula, the global one if None
+
+        Returns:
+            List[List[FNode]]: the partitions, in the order of their first atom
+        """
+        if atoms is None:
+            if self._partitions is None:
+                self._partitions = self._group(self._atom_vars, self._union_find)
+            return [list(partition) for partition in self._partitions]
+        env = env if env is not None else get_env()
+        atoms_vars = {
+            atom: self._atom_vars[atom] if atom in self._atom_vars else self._get_term_info(atom, env)[0]
+            for atom in atoms
+        }
+        union_find = UnionFind()
+        for atom_vars in atoms_vars.values():
+            atom_vars = list(atom_vars)
+            for var in atom_vars[1:]:
+                union_find.union(atom_vars[0], var)
+        return self._group(atoms_vars, union_find)
+
+    @staticmethod
+    def _group(atoms_vars: Dict[FNode, FrozenSet[FNode]], union_find: UnionFind) -> List[List[FNode]]:
+        partitions: Dict[FNode, List[FNode]] = {}
+        singletons = []
+        for atom, atom_vars in atoms_vars.items():
+            if len(atom_vars) == 0:
+                singletons.append([atom])
+            else:
+                partitions.setdefault(union_find.find(next(iter(atom_vars))), []).append(atom)
+        return list(partitions.values()) + singletons
+
+    def conjoin(self, formulas: Iterable[FNode], env: Environment | None = None) -> "FormulaIndex":
+        """returns the index of the conjunction of the formula with formulas, e.g. with lemmas
+
+        Args:
+            formulas (Iterable[FNode]): the conjuncts added to the formula
+            env (Environment | None) [None]: the pysmt environment of the formulas, the global one if None
+
+        Returns:
+            FormulaIndex: the new index, this one is unchanged
+        """
+        index = FormulaIndex()
+        index._atoms = dict(self._atoms)
+        index._atom_vars = dict(self._atom_vars)
+        index._var_atoms = {var: set(atoms) for var, atoms in self._var_atoms.items()}
+        index._term_info = self._term_info
+        index._visited = set(self._visited)
+        index._union_find = self._union_find.copy()
+        index.has_term_ite = self.has_term_ite
+        index.has_quantifiers = self.has_quantifiers
+        env = env if env is not None else get_env()
+        for formula in formulas:
+            index._add(formula, env)
+        return index
+
+    def _add(self, formula: FNode, env: Environment) -> None:
+        """walks the Boolean structure of formula down to its atoms"""
+        stack = [formula]
+        while stack:
+            node = stack.pop()
+            if node in self._visited:
+                continue
+            self._visited.add(node)
+            if _is_atom(node, env):
+                self._add_atom(node, env)
+                continue
+            if node.is_quantifier():
+                self.has_quantifiers = True
+            stack.extend(reversed(node.args()))
+
+    def _add_atom(self, atom: FNode, env: Environment) -> None:
+        self._atoms[atom] = None
+        if atom.is_symbol(BOOL):
+            return
+        atom_vars, has_term_ite, has_quantifiers = self._get_term_info(atom, env)
+        self.has_term_ite |= has_term_ite
+        self.has_quantifiers |= has_quantifiers
+        self._atom_vars[atom] = atom_vars
+        first_var = None
+        for var in atom_vars:
+            self._var_atoms.setdefault(var, set()).add(atom)
+            if first_var is None:
+                first_var = var
+            else:
+                self._union_find.union(first_var, var)
+        self._partitions = None
+
+    def _get_term_info(self, term: FNode, env: Environment) -> tuple:
+        """returns the free variables of term, and whether it has term-ITEs and quantifiers
+
+        The information on the subterms is memoized, and the memo is shared by the indexes built
+        with conjoin, which only add to it.
+        """
+        memo = self._term_info
+        stack = [term]
+        while stack:
+            node = stack[-1]
+            if node in memo:
+                stack.pop()
+                continue
+            pending = [arg for arg in node.args() if arg not in memo]
+            if len(pending) > 0:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if node.is_symbol():
+                memo[node] = (frozenset([node]), False, False)
+                continue
+            args_info = [memo[arg] for arg in node.args()]
+            node_vars = frozenset().union(*(info[0] for info in args_info))
+            has_term_ite = any(info[1] for info in args_info)
+            has_quantifiers = any(info[2] for info in args_info)
+            if node.is_function_application():
+                node_vars |= {node.function_name()}
+            elif node.is_quantifier():
+                has_quantifiers = True
+                node_vars -= set(node.quantifier_vars())
+            elif node.is_ite() and not env.stc.get_type(node).is_bool_type():
+                has_term_ite = True
+            memo[node] = (node_vars, has_term_ite, has_quantifiers)
+        return memo[term]
+
+
+def _is_atom(node: FNode, env: Environment) -> bool:
+    """True if node is an atom for the atoms oracle of pysmt"""
+    if node.is_symbol():
+        return node.is_symbol(BOOL)
+    if node.is_theory_relation():
+        return True
+    if node.is_function_application():
+        return node.function_name().symbol_type().return_type.is_bool_type()
+    if node.is_select():
+        return env.stc.get_type(node).is_bool_type()
+    return False
+
+
+class FormulaIndexCache:
+    """memoizes the indexes of the last formulas, and builds the index of And(phi, *lemmas) from the one of phi
+
+    Args:
+        max_size (int) [16]: the number of indexes kept, the least recently used are discarded
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._cache: OrderedDict[FNode, FormulaIndex] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        """discards all the memoized indexes"""
+        self._cache.clear()
+
+    def get(self, phi: FNode, env: Environment | None = None) -> FormulaIndex:
+        """returns the index of phi
+
+        Args:
+            phi (FNode): a pysmt formula
+            env (Environment | None) [None]: the pysmt environment of phi, the global one if None
+
+        Returns:
+            FormulaIndex: the index
+        """
+        index = self._cache.get(phi)
+        if index is not None:
+            self.hits += 1
+            self._cache.move_to_end(phi)
+            return index
+        self.misses += 1
+        # And(phi, *lemmas) is indexed from the index of phi, which is its first conjunct
+        base = self._cache.get(phi.arg(0)) if phi.is_and() and len(phi.args()) > 1 else None
+        if base is not None:
+            index = base.conjoin(phi.args()[1:], env)
+        else:
+            index = FormulaIndex(phi, env)
+        self._cache[phi] = index
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return index
+
+
+# the caches do not keep their environment alive, since the indexes do not refer to it
+_CACHES: "weakref.WeakKeyDictionary[Environment, FormulaIndexCache]" = weakref.WeakKeyDictionary()
+
+
+def get_formula_index(phi: FNode, env: Environment | None = None) -> FormulaIndex:
+    """returns the index of phi, from the cache of its environment
+
+    Args:
+        phi (FNode): a pysmt formula
+        env (Environment | None) [None]: the pysmt environment of phi, the global one if None
+
+    Returns:
+        FormulaIndex: the index of phi
+    """
+    env = env if env is not None else get_env()
+    cache = _CACHES.get(env)
+    if cache is None:
+        cache = _CACHES[env] = FormulaIndexCache()
+    return cache.get(phi, env)
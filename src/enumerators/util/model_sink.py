@@ -0,0 +1,290 @@
+"""this module implements a memory-bounded storage for the models found during enumeration"""
+
+import mmap
+import os
+import tempfile
+from array import array
+from collections.abc import Sequence
+from typing import Callable, Iterable, List, Set
+
+from pysmt.fnode import FNode
+from pysmt.formula import FormulaContextualizer
+
+from enumerators.util.atom_table import AtomTable
+from enumerators.util.custom_exceptions import CheckpointException
+from enumerators.util.pysmt import contextualize
+
+_LITERAL_TYPECODE = "i"
+_OFFSET_TYPECODE = "q"
+
+
+class ModelSink(Sequence):
+    """an append-only sequence of models which spills to disk
+
+    Models are kept in an in-memory buffer. Once the buffer holds more than max_in_memory models,
+    they are encoded as arrays of signed atom ids (see AtomTable) and appended to a binary file of
+    32-bit literals, while a second file stores the 64-bit end offset of each model. Both files are
+    memory-mapped for reading, so that the sink is a lazy, sliceable sequence of models regardless
+    of how many of them were spilled.
+
+    The files of each sink have their own unique name, starting with spill_path, so that sinks created
+    with the same spill_path (e.g. by successive enumerations) never share them. If spill_path is None,
+    the files are created in the temporary directory and removed when the sink is closed. The spilled
+    models are decoded in env (the global pysmt environment if None).
+
+    A pickled sink refers to its files, which are append-only: a sink restored from a checkpoint
+    reads the models spilled when it was pickled, and must be resumed before new models are added
+    to it. The spilled models of a temporary sink cannot be pickled, since they are removed with it.
+    """
+
+    def __init__(self, max_in_memory: int = 100000, spill_path: str | None = None, env=None):
+        if max_in_memory < 0:
+            raise ValueError("max_in_memory must be non-negative")
+        self.max_in_memory = max_in_memory
+        self.atom_table = AtomTable(env=env)
+        self._buffer: List[Set[FNode]] = []
+        self._spilled = 0
+        self._spilled_literals = 0
+        self._is_temporary = spill_path is None
+        self._spill_prefix = spill_path
+        # the unique path of the files of the sink, chosen when it first spills
+        self._spill_path = None
+        self._literals_file = None
+        self._offsets_file = None
+        self._literals_map = None
+        self._offsets_map = None
+
+    def _get_paths(self) -> tuple[str, str]:
+        return f"{self._spill_path}.lits", f"{self._spill_path}.idx"
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._buffer)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return _ModelSinkView(self, range(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("model index out of range")
+        if index >= self._spilled:
+            return self._buffer[index - self._spilled]
+        return self._read_spilled(index)
+
+    def __iter__(self):
+        for index in range(self._spilled):
+            yield self._read_spilled(index)
+        yield from self._buffer
+
+    def __repr__(self) -> str:
+        return f"ModelSink({len(self)} models, {self._spilled} on disk)"
+
+    def append(self, model: Iterable[FNode]) -> None:
+        """adds a model to the sink"""
+        self._buffer.append(model)
+        if len(self._buffer) > self.max_in_memory:
+            self.spill()
+
+    def extend(self, models: Iterable[Iterable[FNode]]) -> None:
+        """adds a collection of models to the sink"""
+        for model in models:
+            self.append(model)
+
+    def is_spilled(self) -> bool:
+        """returns True if some models were written to disk"""
+        return self._spilled > 0
+
+    def spill(self) -> None:
+        """writes all buffered models to disk"""
+        if len(self._buffer) == 0:
+            return
+        if self._literals_file is None:
+            if self._spilled > 0:
+                raise ValueError("a restored ModelSink must be resumed before adding models to it")
+            self._open_files()
+        literals, offsets = self.atom_table.encode_models(self._buffer)
+        # offsets are relative to the batch, and must be made relative to the file
+        offsets = array(_OFFSET_TYPECODE, [self._spilled_literals + end for end in offsets])
+        self._literals_file.write(literals.tobytes())
+        self._offsets_file.write(offsets.tobytes())
+        self._literals_file.flush()
+        self._offsets_file.flush()
+        self._spilled += len(self._buffer)
+        self._spilled_literals += len(literals)
+        self._buffer = []
+        self._close_maps()
+
+    def _open_files(self) -> None:
+        if self._spill_prefix is None:
+            fd, self._spill_path = tempfile.mkstemp(prefix="tlemmas_models_")
+        else:
+            directory, name = os.path.split(self._spill_prefix)
+            fd, self._spill_path = tempfile.mkstemp(prefix=f"{name}_", dir=directory or None)
+        os.close(fd)
+        os.remove(self._spill_path)
+        literals_path, offsets_path = self._get_paths()
+        # never append to the files of another sink
+        self._literals_file = open(literals_path, "xb")
+        self._offsets_file = open(offsets_path, "xb")
+
+    def _map_files(self) -> None:
+        literals_path, offsets_path = self._get_paths()
+        with open(literals_path, "rb") as f:
+            literals_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._spilled_literals > 0 else None
+        with open(offsets_path, "rb") as f:
+            offsets_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._literals_map = literals_map
+        self._offsets_map = offsets_map
+        self._literals = memoryview(literals_map).cast(_LITERAL_TYPECODE) if literals_map is not None else ()
+        self._offsets = memoryview(offsets_map).cast(_OFFSET_TYPECODE)
+
+    def _close_maps(self) -> None:
+        if self._offsets_map is None:
+            return
+        # views must be released before closing the maps
+        if isinstance(self._literals, memoryview):
+            self._literals.release()
+        self._offsets.release()
+        if self._literals_map is not None:
+            self._literals_map.close()
+        self._offsets_map.close()
+        self._literals_map = None
+        self._offsets_map = None
+
+    def _read_spilled(self, index: int) -> Set[FNode]:
+        if self._offsets_map is None:
+            self._map_files()
+        start = self._offsets[index - 1] if index > 0 else 0
+        end = self._offsets[index]
+        return set(self.atom_table.decode_literals(self._literals[start:end]))
+
+    def close(self) -> None:
+        """releases the files of the sink, removing them if they are temporary"""
+        self._close_maps()
+        if self._literals_file is not None:
+            self._literals_file.close()
+            self._offsets_file.close()
+            self._literals_file = None
+            self._offsets_file = None
+            if self._is_temporary:
+                for path in self._get_paths():
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def __getstate__(self):
+        if self._is_temporary and self._spilled > 0:
+            raise CheckpointException("the spilled models of a ModelSink without spill_path cannot be saved")
+        return {
+            "max_in_memory": self.max_in_memory,
+            "spill_prefix": self._spill_prefix,
+            "spill_path": self._spill_path,
+            "is_temporary": self._is_temporary,
+            "atom_table": self.atom_table,
+            "buffer": self._buffer,
+            "spilled": self._spilled,
+            "spilled_literals": self._spilled_literals,
+        }
+
+    def __setstate__(self, state):
+        self.max_in_memory = state["max_in_memory"]
+        self.atom_table = state["atom_table"]
+        self._buffer = state["buffer"]
+        self._spilled = state["spilled"]
+        self._spilled_literals = state["spilled_literals"]
+        self._is_temporary = state["is_temporary"]
+        self._spill_prefix = state["spill_prefix"]
+        self._spill_path = state["spill_path"]
+        self._literals_file = None
+        self._offsets_file = None
+        self._literals_map = None
+        self._offsets_map = None
+        if self._spilled > 0 and not all(os.path.exists(path) for path in self._get_paths()):
+            raise FileNotFoundError(f"Spilled models not found at {self._spill_path}")
+
+    def resume(self) -> None:
+        """prepares a sink restored from a checkpoint to receive new models
+
+        The spilled files are truncated back to the models of the sink, discarding those appended
+        after it was pickled, and reopened for appending: the sink which was pickled must no longer be used.
+        """
+        if self._spilled == 0 or self._literals_file is not None:
+            return
+        self._close_maps()
+        literals_path, offsets_path = self._get_paths()
+        os.truncate(literals_path, self._spilled_literals * array(_LITERAL_TYPECODE).itemsize)
+        os.truncate(offsets_path, self._spilled * array(_OFFSET_TYPECODE).itemsize)
+        self._literals_file = open(literals_path, "ab")
+        self._offsets_file = open(offsets_path, "ab")
+
+    def contextualize(self, contextualizer: FormulaContextualizer) -> None:
+        """recreates the atoms of the sink in the environment of contextualizer"""
+        self.atom_table.contextualize(contextualizer)
+        self._buffer = contextualize(contextualizer, self._buffer)
+
+
+class _ModelSinkView(Sequence):
+    """a lazy view over a range of the models of a ModelSink"""
+
+    def __init__(self, sink: ModelSink, indices: range):
+        self._sink = sink
+        self._indices = indices
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return _ModelSinkView(self._sink, self._indices[index])
+        return self._sink[self._indices[index]]
+
+    def __repr__(self) -> str:
+        return f"ModelSinkView({len(self)} models)"
+
+
+def _unwrap(store: List | ModelSink) -> List | ModelSink:
+    return store
+
+
+class ObservedModels(Sequence):
+    """a store of models (a list or a ModelSink) which notifies a listener of the models added to it
+
+    The listener is called with the list of the models added by each call to append or extend.
+    An ObservedModels is pickled as the store it wraps, so that the listener is not saved in checkpoints.
+    """
+
+    def __init__(self, store: List | ModelSink, listener: Callable[[List], None]):
+        self.store = store
+        self.listener = listener
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, index):
+        return self.store[index]
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __repr__(self) -> str:
+        return f"ObservedModels({self.store!r})"
+
+    def __reduce__(self):
+        return _unwrap, (self.store,)
+
+    def append(self, model: Iterable[FNode]) -> None:
+        """adds a model to the store"""
+        self.store.append(model)
+        self.listener([model])
+
+    def extend(self, models: Iterable[Iterable[FNode]]) -> None:
+        """adds a collection of models to the store"""
+        models = list(models)
+        self.store.extend(models)
+        if len(models) > 0:
+            self.listener(models)
@@ -0,0 +1,135 @@
+"""this module implements rate-limited progress reporting for long-running enumerations"""
+
+import time
+from dataclasses import dataclass, replace
+from typing import Callable
+
+
+@dataclass
+class EnumerationProgress:
+    """snapshot of the progress of an enumeration, passed to the progress callbacks"""
+
+    # current phase of the enumeration (e.g. "partial", "extension", "total", "done")
+    phase: str
+    # seconds elapsed since the start of the enumeration
+    elapsed: float
+    # partial models found by the partial enumeration
+    partial_models: int = 0
+    # completed tasks (extension tasks or partitions)
+    tasks_completed: int = 0
+    # total number of tasks, 0 if not known yet
+    tasks_total: int = 0
+    # models found so far
+    models: int = 0
+    # theory lemmas found so far
+    lemmas: int = 0
+
+    @property
+    def models_per_second(self) -> float:
+        """returns the average number of models found per second"""
+        return self.models / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def tasks_per_second(self) -> float:
+        """returns the average number of tasks completed per second"""
+        return self.tasks_completed / self.elapsed if self.elapsed > 0 else 0.0
+
+
+ProgressCallback = Callable[[EnumerationProgress], None]
+
+
+class ProgressReporter:
+    """invokes a progress callback at most once every interval seconds
+
+    The counters are updated by the enumerators (also from the callbacks of msat_all_sat),
+    but the callback only sees a snapshot of them when the interval has elapsed since the
+    previous report, or when a report is forced (e.g. at the end of a phase).
+    """
+
+    def __init__(self, callback: ProgressCallback | None = None, interval: float = 1.0):
+        self.callback = callback
+        self.interval = interval
+        self._progress = EnumerationProgress(phase="", elapsed=0.0)
+        self._start = time.monotonic()
+        self._last_report = self._start
+
+    def is_enabled(self) -> bool:
+        """returns True if progress is reported"""
+        return self.callback is not None
+
+    def start(self, phase: str) -> None:
+        """resets the counters and the elapsed time at the start of an enumeration"""
+        self._start = time.monotonic()
+        self._last_report = self._start
+        self._progress = EnumerationProgress(phase=phase, elapsed=0.0)
+
+    def update(self, force: bool = False, **counters) -> None:
+        """sets some fields of the progress (see EnumerationProgress) and reports it if it is time to
+
+        Args:
+            force (bool) [False]: if True, the progress is reported regardless of the interval
+            **counters: the fields of EnumerationProgress to set
+        """
+        if self.callback is None:
+            return
+        for name, value in counters.items():
+            setattr(self._progress, name, value)
+        self.maybe_report(force)
+
+    def partial_model_found(self) -> None:
+        """counts a partial model, to be called from the callbacks of msat_all_sat"""
+        self._progress.partial_models += 1
+        self.maybe_report()
+
+    def model_found(self) -> None:
+        """counts a model, to be called from the callbacks of msat_all_sat"""
+        self._progress.models += 1
+        self.maybe_report()
+
+    def maybe_report(self, force: bool = False) -> bool:
+        """reports the progress if the interval has elapsed since the last report
+
+        Args:
+            force (bool) [False]: if True, the progress is reported regardless of the interval
+
+        Returns:
+            bool: True if the progress was reported
+        """
+        if self.callback is None:
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return False
+        self._last_report = now
+        self._progress.elapsed = now - self._start
+        # the callback gets a copy, which is not affected by later updates
+        self.callback(replace(self._progress))
+        return True
+
+
+class SharedModelsCounter:
+    """counts the models found by the workers of a pool in a shared multiprocessing.Value
+
+    Each worker accumulates its models locally and adds them to the shared value at most
+    once every interval seconds, so that workers do not contend for its lock on every model.
+    """
+
+    def __init__(self, value, interval: float = 1.0):
+        self.value = value
+        self.interval = interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def model_found(self) -> None:
+        """counts a model, to be called from the callbacks of msat_all_sat"""
+        self._pending += 1
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """adds the models counted since the last flush to the shared value"""
+        if self._pending > 0:
+            with self.value.get_lock():
+                self.value.value += self._pending
+            self._pending = 0
+        self._last_flush = time.monotonic()
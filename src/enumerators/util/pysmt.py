@@ -1,20 +1,49 @@
+from pysmt.fnode import FNode
+from pysmt.formula import FormulaContextualizer
 from pysmt.shortcuts import get_env
 
+from enumerators.util.collections import Nested, map_nested
+
 
 class SuspendTypeChecking(object):
-    """Context to disable type-checking during formula creation."""
+    """Context to disable type-checking during formula creation.
+
+    Only the formula manager of env (the global environment if None) is affected, and nested
+    contexts restore the state of the enclosing one.
+    """
 
     def __init__(self, env=None):
         if env is None:
             env = get_env()
         self.env = env
         self.mgr = env.formula_manager
+        self._previous = []
 
     def __enter__(self):
         """Entering a Context: Disable type-checking."""
+        # the type check is suspended by shadowing the method of the class on the manager instance
+        self._previous.append(self.mgr.__dict__.get("_do_type_check"))
         self.mgr._do_type_check = lambda x: x
         return self.env
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Exiting the Context: Re-enable type-checking."""
-        self.mgr._do_type_check = self.mgr._do_type_check_real
+        previous = self._previous.pop()
+        if previous is None:
+            del self.mgr._do_type_check
+        else:
+            self.mgr._do_type_check = previous
+
+
+def contextualize(contextualizer: FormulaContextualizer, formulas: Nested[FNode]) -> Nested[FNode]:
+    """Contextualizes a collection of formulas using the provided contextualizer
+
+    Args:
+        contextualizer: the FormulaContextualizer to use
+        formulas: collection of formulas to contextualize
+
+    Returns:
+        the contextualized formulas
+    """
+    with SuspendTypeChecking(contextualizer.env):
+        return map_nested(lambda f: contextualizer.walk(f), formulas)
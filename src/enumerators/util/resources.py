@@ -0,0 +1,162 @@
+"""this module accounts for the resources used by the workers of a process pool"""
+
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List
+
+
+def peak_rss() -> int:
+    """returns the peak resident set size of the calling process, in bytes"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+@dataclass
+class WorkerUsage:
+    """resources used by a worker since it started"""
+
+    pid: int
+    # tasks completed by the worker
+    tasks: int
+    # CPU time (user and system) of the worker process, including its initialization
+    cpu_time: float
+    # peak resident set size of the worker process, in bytes
+    peak_rss: int
+    # wall time spent running tasks
+    busy_time: float
+    # wall time spent in msat_all_sat, part of busy_time
+    solver_time: float
+    # wall clock time (see time.time) at which the usage was sent to the parent, with the result of a task
+    sent_at: float = 0.0
+
+
+class WorkerUsageTracker:
+    """records the resources used by the worker process which creates it"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.tasks = 0
+        self.busy_time = 0.0
+        self.solver_time = 0.0
+
+    @contextmanager
+    def task(self):
+        """context of a task of the worker"""
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            self.busy_time += time.monotonic() - start_time
+            self.tasks += 1
+
+    @contextmanager
+    def solver(self):
+        """context of a call to the solver within a task"""
+        start_time = time.monotonic()
+        try:
+            yield
+        finally:
+            self.solver_time += time.monotonic() - start_time
+
+    def snapshot(self) -> WorkerUsage:
+        """returns the resources used so far"""
+        return WorkerUsage(
+            pid=self.pid,
+            tasks=self.tasks,
+            cpu_time=time.process_time(),
+            peak_rss=peak_rss(),
+            busy_time=self.busy_time,
+            solver_time=self.solver_time,
+            sent_at=time.time(),
+        )
+
+
+@dataclass
+class ResourceReport:
+    """resources used by the workers of a pool during a run
+
+    The idle time is the wall time of the pool during which the workers were not running a task:
+    their startup and the time spent waiting for tasks. The IPC time is the time spent by the
+    results between their sending by a worker and their receipt by the parent, including their
+    wait while the parent handles the previous results; the workers run their next tasks meanwhile,
+    so it overlaps with the busy time and is not part of the idle time.
+    """
+
+    # processes in the pool
+    processes: int
+    # wall time from the creation of the pool to the last result
+    wall_time: float
+    # wall time spent by the parent handling the results of the workers
+    result_time: float
+    # last usage reported by each worker which completed a task
+    workers: List[WorkerUsage]
+    # time spent by the results between the workers and the parent
+    ipc_time: float = 0.0
+
+    @classmethod
+    def from_usages(
+        cls,
+        processes: int,
+        wall_time: float,
+        result_time: float,
+        usages: Iterable[WorkerUsage],
+        ipc_time: float = 0.0,
+    ) -> "ResourceReport":
+        """builds a report from the usages sent by the workers, keeping the last one of each worker"""
+        latest: Dict[int, WorkerUsage] = {}
+        for usage in usages:
+            if usage.pid not in latest or usage.tasks >= latest[usage.pid].tasks:
+                latest[usage.pid] = usage
+        return cls(processes, wall_time, result_time, sorted(latest.values(), key=lambda u: u.pid), ipc_time)
+
+    @property
+    def tasks(self) -> int:
+        return sum(w.tasks for w in self.workers)
+
+    @property
+    def cpu_time(self) -> float:
+        return sum(w.cpu_time for w in self.workers)
+
+    @property
+    def busy_time(self) -> float:
+        return sum(w.busy_time for w in self.workers)
+
+    @property
+    def solver_time(self) -> float:
+        return sum(w.solver_time for w in self.workers)
+
+    @property
+    def idle_time(self) -> float:
+        return max(0.0, self.processes * self.wall_time - self.busy_time)
+
+    @property
+    def peak_rss(self) -> int:
+        return max((w.peak_rss for w in self.workers), default=0)
+
+    @property
+    def utilization(self) -> float:
+        """the fraction of the wall time of the pool that the workers spent running tasks"""
+        capacity = self.processes * self.wall_time
+        return self.busy_time / capacity if capacity > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        """returns the report as a dictionary, e.g. to be logged as JSON"""
+        return {
+            "processes": self.processes,
+            "wall_time": self.wall_time,
+            "result_time": self.result_time,
+            "tasks": self.tasks,
+            "cpu_time": self.cpu_time,
+            "busy_time": self.busy_time,
+            "solver_time": self.solver_time,
+            "ipc_time": self.ipc_time,
+            "idle_time": self.idle_time,
+            "peak_rss": self.peak_rss,
+            "utilization": self.utilization,
+            "workers": [asdict(w) for w in self.workers],
+        }
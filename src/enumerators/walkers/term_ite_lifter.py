@@ -0,0 +1,109 @@
+from typing import Dict, Iterable, List, Sequence
+
+from pysmt.fnode import FNode
+from pysmt.walkers import IdentityDagWalker
+
+
+class TermIteLifter(IdentityDagWalker):
+    '''A walker that replaces the term-ITEs of a formula with fresh variables, defined in Boolean structure
+
+    Each term Ite(c, t, e) is replaced by a fresh variable v, defined by (c -> v = t) & (~c -> v = e).
+    Since the definitions determine v, the models of lift(phi) projected on the lifted atoms of phi
+    (see lift_atoms) are those of phi projected on its atoms, and each T-lemma of lift(phi) is mapped
+    to a T-lemma of phi by restore, which replaces the fresh variables with their terms.
+
+    The walker memoizes the lifted subterms, so that lifting a formula which grew since the last
+    call, e.g. And(phi, *lemmas), only walks its new part, and the same term-ITE is always replaced
+    by the same variable.
+    '''
+
+    def __init__(self, env=None):
+        IdentityDagWalker.__init__(self, env)
+        self.mgr = self.env.formula_manager
+        # the fresh variable of each term-ITE, after lifting its arguments
+        self._variables: Dict[FNode, FNode] = {}
+        self._definitions: Dict[FNode, FNode] = {}
+        self._terms: Dict[FNode, FNode] = {}
+
+    def walk_ite(self, formula: FNode, args, **kwargs):
+        '''lifts term ITE nodes, and keeps Boolean ones'''
+        # pylint: disable=unused-argument
+        lifted = self.mgr.Ite(*args)
+        if self.env.stc.get_type(formula).is_bool_type():
+            return lifted
+        if lifted not in self._variables:
+            condition, then_term, else_term = args
+            variable = self.mgr.FreshSymbol(self.env.stc.get_type(formula), template="TERM_ITE%d")
+            self._variables[lifted] = variable
+            self._definitions[variable] = self.mgr.And(
+                self.mgr.Implies(condition, self.mgr.Equals(variable, then_term)),
+                self.mgr.Implies(self.mgr.Not(condition), self.mgr.Equals(variable, else_term)),
+            )
+            self._terms[variable] = formula
+        return self._variables[lifted]
+
+    def lift(self, phi: FNode) -> FNode:
+        '''returns phi without term-ITEs, conjoined with the definitions of its fresh variables
+
+        The lifting of And(phi, *lemmas) is the conjunction of the lifting of phi with the lifted lemmas
+        and the definitions they add, so that it can be indexed from phi (see get_formula_index).
+        '''
+        if phi.is_and() and len(phi.args()) > 1:
+            base = self.lift(phi.arg(0))
+            others = [self.walk(arg) for arg in phi.args()[1:]]
+            known = set(self._get_definitions(base))
+            definitions = [d for d in self._get_definitions(self.mgr.And(others)) if d not in known]
+            return self.mgr.And(base, *others, *definitions)
+        lifted = self.walk(phi)
+        definitions = self._get_definitions(lifted)
+        if len(definitions) == 0:
+            return lifted
+        return self.mgr.And(lifted, *definitions)
+
+    def lift_atoms(self, atoms: Iterable[FNode]) -> List[FNode]:
+        '''returns the atoms of the lifted formula which correspond to the given atoms'''
+        return [self.walk(atom) for atom in atoms]
+
+    def restore(self, formula: FNode) -> FNode:
+        '''replaces the fresh variables of formula with the term-ITEs they stand for'''
+        # the terms are those of the original formula, which have no fresh variables
+        fresh_variables = {v: self._terms[v] for v in self.env.fvo.get_free_variables(formula) if v in self._terms}
+        if len(fresh_variables) == 0:
+            return formula
+        return self.env.substituter.substitute(formula, fresh_variables)
+
+    def restore_model(self, model: Iterable[FNode]) -> set:
+        '''maps a model of the lifted formula to the atoms of the original one'''
+        return {self.restore(literal) for literal in model}
+
+    def _get_definitions(self, formula: FNode) -> List[FNode]:
+        '''returns the definitions of the fresh variables of formula, and of those they depend on'''
+        definitions = {}
+        stack = [v for v in self.env.fvo.get_free_variables(formula) if v in self._definitions]
+        while stack:
+            variable = stack.pop()
+            if variable in definitions:
+                continue
+            definitions[variable] = self._definitions[variable]
+            stack.extend(v for v in self.env.fvo.get_free_variables(definitions[variable]) if v in self._definitions)
+        return [definitions[v] for v in sorted(definitions, key=lambda v: v.node_id())]
+
+
+class RestoredModels(Sequence):
+    '''a lazy view of the models of a lifted formula, mapped to the atoms of the original one'''
+
+    def __init__(self, models: Sequence, lifter: TermIteLifter):
+        self._models = models
+        self._lifter = lifter
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RestoredModels(self._models[index], self._lifter)
+        return self._lifter.restore_model(self._models[index])
+
+    def __iter__(self):
+        for model in self._models:
+            yield self._lifter.restore_model(model)
@@ -2,8 +2,9 @@ from pysmt.walkers import DagWalker, handles
 import pysmt.operators as op
 from pysmt.fnode import FNode
 
-from pysmt.shortcuts import And, Or, Iff, Implies, TRUE, FALSE, Not, Ite, BOOL
+from pysmt.shortcuts import BOOL
 
+from enumerators.util.atom_table import AbstractionTable
 from enumerators.util.custom_exceptions import UnsupportedNodeException
 
 
@@ -12,6 +13,7 @@ class BooleanAbstractionWalker(DagWalker):
 
     def __init__(self, atoms=None, abstraction=None, env=None, invalidate_memoization=False):
         DagWalker.__init__(self, env, invalidate_memoization)
+        self.mgr = self.env.formula_manager
         self.atoms = atoms if atoms is not None else {}
         self.abstraction = abstraction if abstraction is not None else {}
 
@@ -21,17 +23,17 @@ class BooleanAbstractionWalker(DagWalker):
     def walk_and(self, formula: FNode, args, **kwargs):
         '''translate AND node'''
         # pylint: disable=unused-argument
-        return And(*args)
+        return self.mgr.And(*args)
 
     def walk_or(self, formula: FNode, args, **kwargs):
         '''translate OR node'''
         # pylint: disable=unused-argument
-        return Or(*args)
+        return self.mgr.Or(*args)
 
     def walk_not(self, formula: FNode, args, **kwargs):
         '''translate NOT node'''
         # pylint: disable=unused-argument
-        return Not(args[0])
+        return self.mgr.Not(args[0])
 
     def walk_symbol(self, formula: FNode, args, **kwargs):
         '''translate SYMBOL node'''
@@ -41,22 +43,26 @@ class BooleanAbstractionWalker(DagWalker):
     def walk_iff(self, formula, args, **kwargs):
         '''translate IFF node'''
         # pylint: disable=unused-argument
-        return Iff(args[0], args[1])
+        return self.mgr.Iff(args[0], args[1])
 
     def walk_implies(self, formula, args, **kwargs):
         '''translate IMPLIES node'''  # a -> b === (~ a) v b
         # pylint: disable=unused-argument
-        return Implies(args[0], args[1])
+        return self.mgr.Implies(args[0], args[1])
 
     def walk_ite(self, formula, args, **kwargs):
         '''translate ITE node'''
         # pylint: disable=unused-argument
-        return Ite(args[0], args[1], args[2])
+        return self.mgr.Ite(args[0], args[1], args[2])
+
+    def get_abstraction_table(self) -> AbstractionTable:
+        '''returns a table which refines and abstracts batches of models with the abstraction of this walker'''
+        return AbstractionTable(self.abstraction, self.env)
 
     def _abstract(self, formula):
         if formula not in self.abstraction:
             var_name = f"v{len(self.abstraction)}"
-            abstr_var = self.env.formula_manager.Symbol(var_name, BOOL)
+            abstr_var = self.mgr.Symbol(var_name, BOOL)
             self.abstraction[formula] = abstr_var
         return self.abstraction[formula]
 
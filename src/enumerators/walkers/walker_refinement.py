@@ -2,8 +2,6 @@ from pysmt.walkers import DagWalker, handles
 import pysmt.operators as op
 from pysmt.fnode import FNode
 
-from pysmt.shortcuts import And, Or, Iff, Implies, TRUE, FALSE, Not, Ite, BOOL
-
 from enumerators.util.custom_exceptions import UnsupportedNodeException
 
 
@@ -12,23 +10,24 @@ class RefinementWalker(DagWalker):
 
     def __init__(self, abstraction, env=None, invalidate_memoization=False):
         DagWalker.__init__(self, env, invalidate_memoization)
+        self.mgr = self.env.formula_manager
         self.refinment = {v: k for k, v in abstraction.items()}
         return
 
     def walk_and(self, formula: FNode, args, **kwargs):
         '''translate AND node'''
         # pylint: disable=unused-argument
-        return And(*args)
+        return self.mgr.And(*args)
 
     def walk_or(self, formula: FNode, args, **kwargs):
         '''translate OR node'''
         # pylint: disable=unused-argument
-        return Or(*args)
+        return self.mgr.Or(*args)
 
     def walk_not(self, formula: FNode, args, **kwargs):
         '''translate NOT node'''
         # pylint: disable=unused-argument
-        return Not(args[0])
+        return self.mgr.Not(args[0])
 
     def walk_symbol(self, formula: FNode, args, **kwargs):
         '''translate SYMBOL node'''
@@ -46,17 +45,17 @@ class RefinementWalker(DagWalker):
     def walk_iff(self, formula, args, **kwargs):
         '''translate IFF node'''
         # pylint: disable=unused-argument
-        return Iff(args[0], args[1])
+        return self.mgr.Iff(args[0], args[1])
 
     def walk_implies(self, formula, args, **kwargs):
         '''translate IMPLIES node'''  # a -> b === (~ a) v b
         # pylint: disable=unused-argument
-        return Implies(args[0], args[1])
+        return self.mgr.Implies(args[0], args[1])
 
     def walk_ite(self, formula, args, **kwargs):
         '''translate ITE node'''
         # pylint: disable=unused-argument
-        return Ite(args[0], args[1], args[2])
+        return self.mgr.Ite(args[0], args[1], args[2])
 
     def _refine(self, formula):
         if formula not in self.refinment:
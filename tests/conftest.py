@@ -22,6 +22,11 @@ SOLVERS = [
     ("partial-project-1", MathSATExtendedPartialEnumerator, {"project_on_theory_atoms": True, "parallel_procs": 1}),
     ("partial-8", MathSATExtendedPartialEnumerator, {"project_on_theory_atoms": False, "parallel_procs": 8}),
     ("partial-project-8", MathSATExtendedPartialEnumerator, {"project_on_theory_atoms": True, "parallel_procs": 8}),
+    (
+        "partial-project-auto",
+        MathSATExtendedPartialEnumerator,
+        {"project_on_theory_atoms": True, "parallel_procs": "auto", "pin_workers": True},
+    ),
 ]
 
 
@@ -30,11 +35,11 @@ def solver(request) -> SMTEnumerator:
     _, solver_cls, params = request.param
     return solver_cls(**params)
 
-@pytest.fixture(params=["raw", "partitioned"], ids=["mode:raw", "mode:part"])
+@pytest.fixture(params=["raw", "partitioned", "incremental"], ids=["mode:raw", "mode:part", "mode:incr"])
 def wsolver(solver, request):
     if request.param == "raw":
         return solver
-    return WithPartitioningWrapper(base_solver=solver)
+    return WithPartitioningWrapper(base_solver=solver, incremental=request.param == "incremental")
 
 
 @pytest.fixture
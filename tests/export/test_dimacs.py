@@ -0,0 +1,123 @@
+import itertools
+import os
+import stat
+
+import pytest
+from pysmt.shortcuts import FALSE, TRUE, And, Exists, ForAll, Iff, Implies, Ite, Not, Or
+
+from enumerators.compilers.compiler import ExternalCompiler
+from enumerators.export.dimacs import write_dimacs
+from enumerators.util.custom_exceptions import CompilerException, UnsupportedNodeException
+
+
+def _read_dimacs(path):
+    comments, clauses, header = [], [], None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("c"):
+                comments.append(line.strip())
+            elif line.startswith("p"):
+                header = tuple(int(v) for v in line.split()[2:])
+            else:
+                literals = [int(v) for v in line.split()]
+                assert literals[-1] == 0
+                clauses.append(literals[:-1])
+    return header, comments, clauses
+
+
+def _projected_models(n_vars, clauses, n_atoms):
+    """returns the assignments to the first n_atoms variables which extend to a model of the clauses"""
+    models = set()
+    for values in itertools.product([False, True], repeat=n_vars):
+        if all(any(values[abs(lit) - 1] == (lit > 0) for lit in clause) for clause in clauses):
+            models.add(values[:n_atoms])
+    return models
+
+
+def _abstraction_models(phi, atoms):
+    models = set()
+    for values in itertools.product([False, True], repeat=len(atoms)):
+        subs = {atom: TRUE() if value else FALSE() for atom, value in zip(atoms, values)}
+        if phi.substitute(subs).simplify().is_true():
+            models.add(values)
+    return models
+
+
+@pytest.mark.parametrize("kind", ["and-or", "iff", "ite", "implies", "constants"])
+def test_dimacs_encoding_preserves_models(tmp_path, kind, x, y, z, a, b):
+    formulas = {
+        "and-or": Or(And(a, x < y), And(Not(a), Not(Or(b, y < z)))),
+        "iff": And(Iff(a, x < y), Or(b, Not(Iff(b, y < z)))),
+        "ite": Not(Ite(a, x < y, And(b, y < z))),
+        "implies": And(Implies(Or(a, b), x < y), Implies(y < z, Not(a))),
+        "constants": Or(And(a, TRUE()), And(b, FALSE())),
+    }
+    phi = formulas[kind]
+    path = str(tmp_path / "phi.cnf")
+    table = write_dimacs(phi, path)
+    (n_vars, n_clauses), _, clauses = _read_dimacs(path)
+    assert n_clauses == len(clauses)
+    assert all(0 < abs(lit) <= n_vars for clause in clauses for lit in clause)
+    assert _projected_models(n_vars, clauses, len(table)) == _abstraction_models(phi, table.atoms)
+
+
+def test_dimacs_lemmas_and_projection(tmp_path, x, y, z, a):
+    phi = Or(And(a, x < y), y < z)
+    lemmas = [Or(Not(x < y), Not(y < x)), Or(Not(y < z), x < z)]
+    path = str(tmp_path / "phi.cnf")
+    map_path = str(tmp_path / "phi.map")
+    table = write_dimacs(phi, path, lemmas, projected_atoms=[x < y, y < z], atom_map_path=map_path)
+
+    # projected atoms come first and are listed in the projection comment
+    assert table.atoms[:2] == [x < y, y < z]
+    (n_vars, _), comments, clauses = _read_dimacs(path)
+    assert "c p show 1 2 0" in comments
+    # lemmas are clauses over the atoms, without labels
+    for lemma in lemmas:
+        assert sorted(table.encode_literals(lemma.args())) in [sorted(clause) for clause in clauses]
+    assert _projected_models(n_vars, clauses, len(table)) == _abstraction_models(And([phi] + lemmas), table.atoms)
+
+    with open(map_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == len(table)
+    assert lines[0] == "1 (< x y)"
+
+
+@pytest.mark.parametrize("quantifier", [ForAll, Exists])
+def test_dimacs_rejects_quantifiers(tmp_path, quantifier, x, y, a):
+    path = str(tmp_path / "phi.cnf")
+    with pytest.raises(UnsupportedNodeException, match="Quantifiers"):
+        write_dimacs(quantifier([x], x < y), path)
+    with pytest.raises(UnsupportedNodeException, match="Quantifiers"):
+        write_dimacs(Or(a, Not(quantifier([x], x < y))), path)
+
+
+def _stub_binary(tmp_path, body):
+    path = tmp_path / "stub_compiler"
+    path.write_text("#!/bin/sh\n" + body + "\n")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def test_external_compiler(tmp_path, sat_formula):
+    command = _stub_binary(tmp_path, 'grep -v "^c" "$1" > "$2"\necho compiled')
+    compiler = ExternalCompiler(command, ["{cnf}", "{output}"])
+    output_path = str(tmp_path / "phi.nnf")
+    table = compiler.compile(sat_formula, output_path)
+    assert len(table) == 4
+    with open(output_path, encoding="utf-8") as f:
+        assert f.readline().startswith("p cnf")
+
+
+def test_external_compiler_errors(tmp_path, sat_formula):
+    with pytest.raises(FileNotFoundError):
+        ExternalCompiler(str(tmp_path / "missing"), [])
+
+    failing = ExternalCompiler(_stub_binary(tmp_path, "echo broken >&2\nexit 3"), ["{cnf}"])
+    with pytest.raises(CompilerException, match="broken"):
+        failing.compile(sat_formula, str(tmp_path / "out.nnf"))
+
+    slow = ExternalCompiler(_stub_binary(tmp_path, "sleep 5"), [], timeout=0.1)
+    with pytest.raises(CompilerException, match="timed out"):
+        slow.compile(sat_formula, str(tmp_path / "out.nnf"))
+    assert not os.path.exists(tmp_path / "out.nnf")
@@ -0,0 +1,108 @@
+import pytest
+from pysmt.shortcuts import And, Iff, Not, Or, Symbol
+from pysmt.typing import BOOL
+
+from enumerators.export.binary import MODELS_KIND, BinaryWriter, read_binary, read_binary_lemmas, read_binary_models
+from enumerators.export.smtlib import SmtLibWriter, read_smtlib_lemmas, read_smtlib_models, write_smtlib_lemmas
+from enumerators.formula import read_phi, save_phi
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.util.custom_exceptions import FormulaException
+
+
+@pytest.fixture
+def clauses(x, y, z, a):
+    return [
+        Or(x < y, Not(y < z)),
+        Not(x.Equals(5)),
+        Or(a, z < x, Not(x < y)),
+        a,
+    ]
+
+
+def test_smtlib_lemmas_roundtrip(tmp_path, clauses, x, a):
+    path = str(tmp_path / "lemmas.smt2")
+    lemmas = clauses + [Iff(a, x < 0)]
+    write_smtlib_lemmas(lemmas, path)
+    assert read_smtlib_lemmas(path) == lemmas
+
+    # atoms are defined once and shared by all the lemmas
+    with open(path, encoding="utf-8") as f:
+        assert f.read().count("(< x y)") == 1
+
+
+def test_smtlib_streaming(tmp_path, clauses, sat_formula):
+    path = str(tmp_path / "phi_and_lemmas.smt2")
+    with SmtLibWriter(path) as writer:
+        writer.write_formula(sat_formula)
+        for lemma in clauses:
+            writer.write_lemmas([lemma])
+    assert read_smtlib_lemmas(path) == [sat_formula] + clauses
+
+
+def test_smtlib_models_roundtrip(tmp_path, x, y, a):
+    path = str(tmp_path / "models.smt2")
+    models = [{x < y, Not(a)}, {Not(x < y), a}, {a}]
+    with SmtLibWriter(path) as writer:
+        writer.write_models(models)
+    assert read_smtlib_models(path) == models
+
+
+def test_smtlib_names_are_portable(tmp_path, x, y, a):
+    path = str(tmp_path / "models.smt2")
+    with SmtLibWriter(path) as writer:
+        writer.write_models([{x < y, a}])
+    with open(path, encoding="utf-8") as f:
+        # SMT-LIB2 reserves the symbols starting with "." to the solvers
+        assert "(define-fun ." not in f.read()
+    with SmtLibWriter(str(tmp_path / "clash.smt2")) as writer:
+        with pytest.raises(FormulaException):
+            writer.write_lemmas([Symbol("__a0", BOOL)])
+
+
+def test_binary_lemmas_roundtrip(tmp_path, clauses):
+    path = str(tmp_path / "lemmas.bin")
+    with BinaryWriter(path, block_size=2) as writer:
+        writer.write_lemmas(clauses[:1])
+        writer.write_lemmas(clauses[1:])
+    assert read_binary_lemmas(path) == clauses
+
+    _, table, literal_sets = read_binary(path)
+    assert len(table) == 5
+    assert [len(literals) for literals in literal_sets] == [2, 1, 3, 1]
+
+
+def test_binary_models_roundtrip(tmp_path, x, y, a):
+    path = str(tmp_path / "models.bin")
+    models = [{x < y, Not(a)}, {Not(x < y), a}]
+    with BinaryWriter(path, kind=MODELS_KIND) as writer:
+        writer.write_models(models)
+    assert read_binary_models(path) == models
+    with pytest.raises(FormulaException):
+        read_binary_lemmas(path)
+
+
+def test_binary_rejects_non_clauses(tmp_path, x, a):
+    with BinaryWriter(str(tmp_path / "lemmas.bin")) as writer:
+        with pytest.raises(FormulaException):
+            writer.write_lemmas([And(a, x < 0)])
+
+
+def test_enumerated_lemmas_roundtrip(tmp_path, rangen_formula):
+    solver = MathSATTotalEnumerator()
+    solver.check_all_sat(rangen_formula)
+    lemmas = solver.get_theory_lemmas()
+
+    smtlib_path = str(tmp_path / "lemmas.smt2")
+    write_smtlib_lemmas(lemmas, smtlib_path)
+    assert read_smtlib_lemmas(smtlib_path) == lemmas
+
+    binary_path = str(tmp_path / "lemmas.bin")
+    with BinaryWriter(binary_path) as writer:
+        writer.write_lemmas(lemmas)
+    assert read_binary_lemmas(binary_path) == lemmas
+
+
+def test_save_phi(tmp_path, sat_formula):
+    path = str(tmp_path / "phi.smt2")
+    save_phi(sat_formula, path)
+    assert read_phi(path) == sat_formula
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from enumerators.solvers.async_enumerator import AsyncEnumerator
+from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.util.custom_exceptions import EnumerationCancelled
+
+
+def test_async_check_all_sat(solver, rangen_formula):
+    async_solver = AsyncEnumerator(solver)
+    sat = asyncio.run(async_solver.check_all_sat(rangen_formula, store_models=True))
+    models_count = solver.get_models_count()
+    assert sat == (models_count > 0)
+    assert sat == solver.check_all_sat(rangen_formula)
+    assert solver.get_models_count() == models_count
+
+
+def test_async_iter_models(solver, rangen_formula):
+    async def collect():
+        return [model async for model in AsyncEnumerator(solver).iter_models(rangen_formula)]
+
+    models = asyncio.run(collect())
+    assert len(models) == solver.get_models_count()
+    assert models == list(solver.get_models())
+
+
+def test_async_iter_theory_lemmas(solver, rangen_formula):
+    async def collect():
+        return [lemma async for lemma in AsyncEnumerator(solver).iter_theory_lemmas(rangen_formula)]
+
+    lemmas = asyncio.run(collect())
+    assert len(lemmas) == len(set(lemmas))
+    assert set(lemmas) == set(solver.get_theory_lemmas())
+
+
+def test_async_iter_models_early_exit(solver, rangen_formula):
+    async def first_model():
+        async_solver = AsyncEnumerator(solver)
+        async for model in async_solver.iter_models(rangen_formula):
+            return model
+        return None
+
+    asyncio.run(first_model())
+    # the cancelled enumeration leaves the solver ready for the next one
+    solver.check_all_sat(rangen_formula)
+    reference = MathSATTotalEnumerator(project_on_theory_atoms=solver._project_on_theory_atoms)
+    reference.check_all_sat(rangen_formula)
+    assert solver.get_models_count() == reference.get_models_count()
+
+
+@pytest.mark.parametrize("solver_cls", [MathSATTotalEnumerator, MathSATExtendedPartialEnumerator])
+def test_cancel_before_run(solver_cls, rangen_formula):
+    solver = solver_cls()
+    solver.cancel()
+    with pytest.raises(EnumerationCancelled):
+        solver.check_all_sat(rangen_formula)
+    # the request is consumed by the cancelled run
+    solver.check_all_sat(rangen_formula)
@@ -0,0 +1,115 @@
+import shutil
+
+import pytest
+from pysmt.shortcuts import Solver
+
+from enumerators.formula import get_normalized
+from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
+from enumerators.solvers.with_partitioning import WithPartitioningWrapper
+from enumerators.util.checkpoint import EnumerationCheckpoint, formula_fingerprint
+from enumerators.util.custom_exceptions import CheckpointException
+
+
+@pytest.fixture
+def partitionable_formula(x, y, z):
+    return (x + y <= 1) | (x >= 2) | (y >= 1) | (z <= 0) | (z >= 1)
+
+
+def test_checkpoint_roundtrip(tmp_path, sat_formula):
+    atoms = list(sat_formula.get_atoms())
+    fingerprint = formula_fingerprint(sat_formula, atoms)
+    checkpoint = EnumerationCheckpoint(fingerprint, partial_models=[set(atoms)], completed_tasks={0}, models_count=1)
+    path = str(tmp_path / "checkpoint.pkl")
+    checkpoint.save(path)
+
+    loaded = EnumerationCheckpoint.load(path, fingerprint)
+    assert loaded.partial_models == [set(atoms)], "Formulas should be recreated in the current environment"
+    assert loaded.completed_tasks == {0}
+    assert loaded.models_count == 1
+
+    with pytest.raises(CheckpointException):
+        EnumerationCheckpoint.load(path, formula_fingerprint(sat_formula, atoms[1:]))
+
+
+@pytest.mark.parametrize("parallel_procs", [1, 2])
+def test_extended_partial_resume(tmp_path, partitionable_formula, parallel_procs):
+    phi = get_normalized(partitionable_formula, Solver("msat").converter)
+    path = str(tmp_path / "checkpoint.pkl")
+
+    solver = MathSATExtendedPartialEnumerator(parallel_procs=parallel_procs, checkpoint_path=path)
+    solver.check_all_sat(phi, store_models=True)
+    expected_count = solver.get_models_count()
+
+    # simulate a run preempted right after the partial enumeration
+    checkpoint = EnumerationCheckpoint.load(path)
+    checkpoint.completed_tasks = set()
+    checkpoint.models = []
+    checkpoint.models_count = 0
+    checkpoint.save(path)
+
+    resumed = MathSATExtendedPartialEnumerator(parallel_procs=parallel_procs)
+    resumed.check_all_sat(phi, store_models=True, resume_from=path)
+    assert resumed.get_models_count() == expected_count
+    assert len(resumed.get_models()) == expected_count
+
+    # resuming a completed run does not repeat any work
+    done = MathSATExtendedPartialEnumerator(parallel_procs=parallel_procs, checkpoint_path=path)
+    done.check_all_sat(phi, resume_from=path)
+    assert done.get_models_count() == expected_count
+
+
+@pytest.mark.parametrize("parallel_procs", [1, 2])
+def test_extended_partial_resume_halfway(tmp_path, monkeypatch, partitionable_formula, parallel_procs):
+    phi = get_normalized(partitionable_formula, Solver("msat").converter)
+    path = str(tmp_path / "checkpoint.pkl")
+
+    # keep a copy of every checkpoint saved during an uninterrupted run
+    snapshots = []
+    save = EnumerationCheckpoint.save
+
+    def save_and_copy(checkpoint, save_path):
+        save(checkpoint, save_path)
+        snapshots.append(f"{save_path}.{len(snapshots)}")
+        shutil.copy(save_path, snapshots[-1])
+
+    monkeypatch.setattr(EnumerationCheckpoint, "save", save_and_copy)
+    solver = MathSATExtendedPartialEnumerator(
+        parallel_procs=parallel_procs, checkpoint_path=path, checkpoint_interval=0.0
+    )
+    solver.check_all_sat(phi, store_models=True)
+    monkeypatch.undo()
+    expected_models = {frozenset(model) for model in solver.get_models()}
+
+    # simulate a run preempted after the first extension task, the others being still pending
+    checkpoint = next(c for c in map(EnumerationCheckpoint.load, snapshots) if len(c.completed_tasks) == 1)
+    assert len(checkpoint.partial_models) > 1, "The resumed run should still have pending tasks"
+    checkpoint.save(path)
+
+    resumed = MathSATExtendedPartialEnumerator(parallel_procs=parallel_procs)
+    resumed.check_all_sat(phi, store_models=True, resume_from=path)
+    assert resumed.get_models_count() == solver.get_models_count()
+    assert len(resumed.get_models()) == len(expected_models)
+    assert {frozenset(model) for model in resumed.get_models()} == expected_models
+
+
+def test_partitioning_resume(tmp_path, partitionable_formula):
+    phi = get_normalized(partitionable_formula, Solver("msat").converter)
+    path = str(tmp_path / "checkpoint.pkl")
+
+    solver = WithPartitioningWrapper(MathSATExtendedPartialEnumerator(), checkpoint_path=path)
+    solver.check_all_sat(phi)
+    expected_count = solver.get_models_count()
+    assert len(EnumerationCheckpoint.load(path).completed_tasks) == 2, "Both partitions should be checkpointed"
+
+    resumed = WithPartitioningWrapper(MathSATExtendedPartialEnumerator())
+    assert resumed.check_all_sat(phi, resume_from=path)
+    assert resumed.get_models_count() == expected_count
+    assert set(resumed.get_theory_lemmas()) == set(solver.get_theory_lemmas())
+
+
+def test_checkpoint_needs_spill_path(tmp_path):
+    path = str(tmp_path / "checkpoint.pkl")
+    with pytest.raises(ValueError, match="models_spill_path"):
+        MathSATExtendedPartialEnumerator(checkpoint_path=path, models_buffer_size=2)
+    with pytest.raises(ValueError, match="models_spill_path"):
+        WithPartitioningWrapper(MathSATExtendedPartialEnumerator(), checkpoint_path=path, models_buffer_size=2)
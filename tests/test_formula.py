@@ -1,5 +1,6 @@
 """tests for module formula"""
 
+from pysmt.environment import Environment
 from pysmt.fnode import FNode
 from pysmt.shortcuts import And, BOOL, FALSE, LE, Not, Or, Plus, REAL, Real, Symbol, TRUE, Times
 
@@ -81,3 +82,50 @@ def test_normalization():
     assert len(formula.get_atoms(normal)) < len(
         formula.get_atoms(phi)
     ), "equivalent atoms should be normalized into the same atom"
+
+
+def test_slice_formula():
+    """tests for formula.slice_formula()"""
+    x, y, z = Symbol("X", REAL), Symbol("Y", REAL), Symbol("Z", REAL)
+    f = Symbol("F", BOOL)
+    phi = Or(And(f, LE(x, y)), LE(y, x), LE(z, Real(0)))
+    abstraction = {}
+    sliced = formula.slice_formula(phi, [LE(z, Real(0))], abstraction)
+    assert set(abstraction) == {LE(x, y), LE(y, x)}, "the atoms of the other partition are replaced"
+    assert all(v.is_symbol(BOOL) for v in abstraction.values())
+    assert sliced.get_free_variables() == {f, z} | set(abstraction.values())
+
+    # slices of the same formula share the fresh variables
+    other = formula.slice_formula(phi, [LE(x, y), LE(y, x)], abstraction)
+    assert other.get_free_variables() == {f, x, y, abstraction[LE(z, Real(0))]}
+    assert formula.slice_formula(phi, [LE(x, y), LE(y, x), LE(z, Real(0))]) == phi
+
+
+def test_slice_formula_environment():
+    """tests for formula.slice_formula() in a non-global environment"""
+    env = Environment()
+    mgr = env.formula_manager
+    x, y = mgr.Symbol("X", REAL), mgr.Symbol("Y", REAL)
+    kept, other = mgr.LE(x, mgr.Real(0)), mgr.LE(y, mgr.Real(0))
+    phi = mgr.Or(kept, other)
+    abstraction = {}
+    sliced = formula.slice_formula(phi, [kept], abstraction, env)
+    assert sliced is mgr.Or(kept, abstraction[other])
+    assert formula.get_true_given_atoms([kept], env) is mgr.Or(kept, mgr.Not(kept))
+
+
+def test_get_atom_partitioning():
+    """tests for formula.get_atom_partitioning()"""
+    x, y, z, w = (Symbol(name, REAL) for name in "xyzw")
+    a = Symbol("a", BOOL)
+    phi = And(
+        Or(LE(x, y), a),
+        LE(Plus(y, z), Real(1)),
+        Not(LE(w, Real(0))),
+        Or(LE(z, Real(3)), LE(w, Real(2))),
+    )
+    partitions = formula.get_atom_partitioning(phi)
+    assert sorted(len(p) for p in partitions) == [1, 2, 3], "x, y and z share a partition, w another, a its own"
+    assert {a} in partitions
+    assert {LE(w, Real(0)), LE(w, Real(2))} in partitions
+    assert formula.get_atom_partitioning(LE(x, y)) == [{LE(x, y)}]
@@ -0,0 +1,56 @@
+"""tests for module generator"""
+
+import pytest
+from pysmt.environment import Environment
+from pysmt.shortcuts import is_sat
+
+from enumerators.constants import SAT, UNSAT
+from enumerators.generator import THEORIES, FormulaParameters, random_formula
+
+
+@pytest.mark.parametrize("theory", THEORIES)
+def test_random_formula_is_reproducible(theory):
+    params = FormulaParameters(theory=theory, seed=7)
+    phi = random_formula(params)
+    assert random_formula(params) is phi, "The same parameters should generate the same formula"
+    assert str(random_formula(params, Environment())) == str(phi)
+    assert random_formula(FormulaParameters(theory=theory, seed=8)) is not phi
+
+
+def test_random_formula_atoms():
+    params = FormulaParameters(bool_vars=4, theory_vars=6, theory_atoms=8, depth=6)
+    phi = random_formula(params)
+    atoms = phi.get_atoms()
+    assert len([a for a in atoms if a.is_symbol()]) <= 4
+    assert len([a for a in atoms if not a.is_symbol()]) <= 8
+    assert all(len(a.get_free_variables()) <= params.atom_vars for a in atoms if not a.is_symbol())
+
+
+def test_random_formula_partitions():
+    params = FormulaParameters(bool_vars=6, theory_vars=6, theory_atoms=9, depth=6, partitions=3)
+    phi = random_formula(params)
+    assert len(phi.args()) == 3
+    variables = [subformula.get_free_variables() for subformula in phi.args()]
+    assert all(v1.isdisjoint(v2) for i, v1 in enumerate(variables) for v2 in variables[i + 1 :])
+
+
+@pytest.mark.parametrize("bool_vars, theory_atoms", [(1, 2), (0, 3), (3, 0), (2, 2)])
+def test_random_formula_few_atoms(bool_vars, theory_atoms):
+    params = FormulaParameters(bool_vars=bool_vars, theory_vars=3, theory_atoms=theory_atoms, partitions=3)
+    phi = random_formula(params)
+    assert len(phi.args()) == 3
+    assert all(len(subformula.get_atoms()) > 0 for subformula in phi.args())
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        FormulaParameters(theory="NRA")
+    with pytest.raises(ValueError):
+        FormulaParameters(theory_vars=2, partitions=3)
+
+
+def test_enumerate_random_formula(solver):
+    phi = random_formula(FormulaParameters(bool_vars=4, theory_vars=4, theory_atoms=6, depth=4, seed=1))
+    expected = SAT if is_sat(phi, solver_name="msat") else UNSAT
+    assert solver.check_all_sat(phi) == expected
+    assert (solver.get_models_count() > 0) == (expected == SAT)
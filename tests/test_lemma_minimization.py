@@ -0,0 +1,48 @@
+import pytest
+from pysmt.shortcuts import LE, Not, Or, Real, Solver
+
+from enumerators.formula import get_clause_literals
+from enumerators.solvers.lemma_minimization import (
+    LemmaMinimizer,
+    lemma_size_stats,
+    minimize_lemma,
+    remove_subsumed,
+)
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+
+
+def test_minimize_lemma(x, y):
+    x_le_1, x_le_0, y_le_0 = LE(x, Real(1)), LE(x, Real(0)), LE(y, Real(0))
+    with Solver("msat") as solver:
+        assert minimize_lemma(solver, Or(x_le_1, Not(x_le_0), y_le_0)) == Or(x_le_1, Not(x_le_0))
+        # the same solver is reused, and clauses which are not T-valid are kept as they are
+        not_valid = Or(Not(x_le_1), y_le_0)
+        assert minimize_lemma(solver, not_valid) is not_valid
+        assert minimize_lemma(solver, Or(x_le_1, Not(x_le_0))) == Or(x_le_1, Not(x_le_0))
+
+
+def test_remove_subsumed(a, b, x):
+    x_le_0 = LE(x, Real(0))
+    lemmas = [Or(a, b, x_le_0), Or(b, a), Or(a, b), Or(Not(a), x_le_0), x_le_0]
+    assert remove_subsumed(lemmas) == [Or(b, a), x_le_0]
+    assert lemma_size_stats(lemmas) == {"lemmas": 5, "literals": 10, "max_literals": 3}
+
+
+@pytest.mark.parametrize("parallel_procs", [1, 2])
+def test_minimized_theory_lemmas(parallel_procs, rangen_formula):
+    logger = {}
+    solver = MathSATTotalEnumerator(computation_logger=logger)
+    solver.check_all_sat(rangen_formula)
+    lemmas = solver.get_theory_lemmas()
+    minimized = solver.get_minimized_theory_lemmas(parallel_procs)
+
+    assert logger["Lemmas before minimization"] == len(set(lemmas))
+    assert logger["Lemma literals after minimization"] <= logger["Lemma literals before minimization"]
+    with Solver("msat") as check_solver:
+        for lemma in minimized:
+            assert check_solver.is_valid(lemma), f"Lemma {lemma.serialize()} is not valid"
+    # each lemma is implied by a minimized lemma made of some of its literals
+    minimized_literals = [set(get_clause_literals(lemma)) for lemma in minimized]
+    for lemma in lemmas:
+        literals = set(get_clause_literals(lemma))
+        assert any(small <= literals for small in minimized_literals)
@@ -1,17 +1,25 @@
 import multiprocessing
 import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Callable, Iterable
 
+import mathsat
 import pytest
+from pysmt.environment import Environment
 from pysmt.fnode import FNode
+from pysmt.formula import FormulaContextualizer
 from pysmt.oracles import get_logic
-from pysmt.shortcuts import Array, BV, BVSGE, And, Iff, Int, Ite, Or, Real, Solver, ToReal, read_smtlib
+from pysmt.shortcuts import Array, BV, BVSGE, And, ForAll, Iff, Int, Ite, Not, Or, Real, Solver, ToReal, read_smtlib
 from pysmt.typing import INT
 
-from enumerators.formula import get_normalized
+from enumerators.formula import get_normalized, get_theory_atoms
 from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
 from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.solvers.mathsat_utils import _dump_smtlib_template, _load_smtlib_template
+from enumerators.solvers.with_partitioning import WithPartitioningWrapper
+from enumerators.util.pysmt import contextualize
 from enumerators.walkers.walker_bool_abstraction import BooleanAbstractionWalker
 from enumerators.walkers.walker_refinement import RefinementWalker
 
@@ -289,8 +297,251 @@ def test_term_ite_exception(solver, x, y, a):
         solver.check_supports(phi)
 
 
+def test_quantifier_exception(solver, x, a):
+    phi = Or(ForAll([x], x >= 0), a)
+
+    with pytest.raises(AssertionError, match="Quantifiers are not supported yet"):
+        solver.check_supports(phi)
+
+
 @pytest.mark.parametrize("parallel_procs", [0, -1, multiprocessing.cpu_count() + 1])
 def test_invalid_parallel_procs(parallel_procs, sat_formula):
     """Test that invalid parallel_procs (0) raises error"""
     with pytest.raises(ValueError, match="parallel_procs must be between 1"):
         _ = MathSATExtendedPartialEnumerator(parallel_procs=parallel_procs)
+
+
+def test_incremental_runs(solver, sat_formula):
+    atoms = list(sat_formula.get_atoms())
+    solver.check_all_sat(sat_formula, atoms=atoms)
+    expected_count = solver.get_models_count()
+
+    solver.check_all_sat(sat_formula, atoms=atoms, incremental=True)
+    assert solver.get_models_count() == expected_count
+    first_lemmas = set(solver.get_theory_lemmas())
+
+    # phi and the first lemmas are still asserted, only new lemmas are reported
+    solver.check_all_sat(sat_formula, atoms=atoms, incremental=True)
+    assert solver.get_models_count() == expected_count
+    assert first_lemmas.isdisjoint(solver.get_theory_lemmas())
+
+
+def test_sliced_partitions_lemmas(example, solver):
+    phi, mc, _, _ = example
+    normalize_solver = Solver("msat")
+    phi = get_normalized(phi, normalize_solver.converter)
+    wrapper = WithPartitioningWrapper(base_solver=solver, slice_partitions=True)
+    phi_sat = wrapper.check_all_sat(phi, atoms=list(phi.get_atoms()))
+
+    lemmas = [get_normalized(lemma, normalize_solver.converter) for lemma in wrapper.get_theory_lemmas()]
+    if not get_logic(phi).theory.arrays:
+        assert_lemmas_are_tvalid(lemmas)
+
+    # phi & lemmas is still T-reduced
+    phi_and_lemmas = And(phi, And(lemmas))
+    bool_walker = BooleanAbstractionWalker(atoms=phi_and_lemmas.get_atoms())
+    solver_abstr = MathSATTotalEnumerator(project_on_theory_atoms=False)
+    abstr_sat = solver_abstr.check_all_sat(
+        bool_walker.walk(phi_and_lemmas), atoms=list(bool_walker.walk(phi).get_atoms()), store_models=True
+    )
+    assert abstr_sat == phi_sat
+    assert solver_abstr.get_models_count() == mc
+    assert wrapper.get_models_count() is None, "The models of the slices are not models of phi"
+
+
+def test_sliced_partitions_incremental_conflict(solver):
+    with pytest.raises(ValueError, match="slice_partitions"):
+        WithPartitioningWrapper(base_solver=solver, incremental=True, slice_partitions=True)
+
+
+def test_sliced_partitions_store_models(solver, sat_formula):
+    wrapper = WithPartitioningWrapper(base_solver=solver, slice_partitions=True)
+    with pytest.raises(ValueError, match="sliced partitions"):
+        wrapper.check_all_sat(sat_formula, store_models=True)
+
+
+@pytest.mark.parametrize(
+    "solver_cls, options",
+    [
+        (MathSATTotalEnumerator, {"prefer_projected_atoms": True}),
+        (MathSATExtendedPartialEnumerator, {"prefer_projected_atoms": True}),
+        (MathSATExtendedPartialEnumerator, {"prefer_cnf_labels": True}),
+        (MathSATExtendedPartialEnumerator, {"prefer_projected_atoms": True, "parallel_procs": 2}),
+    ],
+)
+def test_branching_preferences(solver_cls, options, rangen_formula):
+    reference = solver_cls()
+    reference.check_all_sat(rangen_formula)
+    solver = solver_cls(**options)
+    solver.check_all_sat(rangen_formula)
+    assert solver.get_models_count() == reference.get_models_count()
+    assert_lemmas_are_tvalid(solver.get_theory_lemmas())
+
+
+@pytest.mark.parametrize("solver_cls", [MathSATTotalEnumerator, MathSATExtendedPartialEnumerator])
+def test_branching_preferences_need_clear(solver_cls, monkeypatch):
+    monkeypatch.delattr(mathsat, "msat_clear_preferred_for_branching", raising=False)
+    with pytest.raises(ValueError, match="msat_clear_preferred_for_branching"):
+        solver_cls(prefer_projected_atoms=True)
+    solver_cls()
+
+
+def test_worker_template(rangen_formula):
+    with Solver("msat") as source, Solver("msat") as target:
+        template = _dump_smtlib_template(source, rangen_formula)
+        _load_smtlib_template(target, template)
+        assert target.solve() == source.is_sat(rangen_formula)
+        # the symbols of the template are shared with the pysmt converter of the target
+        target.add_assertion(Not(rangen_formula))
+        assert not target.solve()
+
+
+def test_progress_callback(wsolver, rangen_formula):
+    reports = []
+    wsolver.set_progress_callback(reports.append, interval=0.0)
+    wsolver.check_all_sat(rangen_formula)
+    assert len(reports) > 0
+    last = reports[-1]
+    assert last.phase == "done"
+    assert last.models == wsolver.get_models_count()
+    assert last.lemmas == len(wsolver.get_theory_lemmas())
+    assert last.tasks_completed == last.tasks_total
+    assert all(r1.elapsed <= r2.elapsed for r1, r2 in zip(reports, reports[1:]))
+
+
+def test_lemmas_listener(wsolver, rangen_formula):
+    batches = []
+    wsolver.set_lemmas_listener(batches.append)
+    wsolver.check_all_sat(rangen_formula)
+    streamed = [lemma for batch in batches for lemma in batch]
+    assert all(len(batch) > 0 for batch in batches)
+    # each lemma is streamed once, and the stream covers the lemmas of the enumeration
+    assert len(streamed) == len(set(streamed))
+    assert set(streamed) == set(wsolver.get_theory_lemmas())
+
+    # the stream restarts with each run
+    batches.clear()
+    wsolver.check_all_sat(rangen_formula)
+    assert {lemma for batch in batches for lemma in batch} == set(wsolver.get_theory_lemmas())
+
+
+def test_worker_resource_report(rangen_formula):
+    logger = {}
+    solver = MathSATExtendedPartialEnumerator(computation_logger=logger, parallel_procs=8)
+    solver.check_all_sat(rangen_formula)
+    report = solver.get_resource_report()
+    assert report is not None
+    assert report.processes == 8
+    assert report.tasks == logger["Partial models"]
+    assert len(report.workers) <= 8
+    assert all(w.solver_time <= w.busy_time for w in report.workers)
+    assert report.busy_time <= report.processes * report.wall_time
+    assert report.ipc_time >= 0.0 and report.idle_time >= 0.0
+    assert logger["Worker resources"] == report.as_dict()
+
+    solver = MathSATExtendedPartialEnumerator(parallel_procs=1)
+    solver.check_all_sat(rangen_formula)
+    assert solver.get_resource_report() is None, "No report should be built without a pool"
+
+
+def test_worker_resource_report_slow_results(rangen_formula):
+    delay = 0.05
+    batches = []
+
+    def slow_listener(batch):
+        time.sleep(delay)
+        batches.append(batch)
+
+    solver = MathSATExtendedPartialEnumerator(parallel_procs=2)
+    solver.set_lemmas_listener(slow_listener)
+    solver.check_all_sat(rangen_formula)
+    report = solver.get_resource_report()
+    assert len(batches) > 0
+    # the results queue up while the parent handles the previous ones, the workers keep running meanwhile
+    assert report.ipc_time > 0.0
+    assert report.idle_time == pytest.approx(report.processes * report.wall_time - report.busy_time)
+    # both workers are idle at least while the parent handles the last result
+    assert report.idle_time >= report.processes * delay
+
+
+@pytest.mark.parametrize("solver_cls", [MathSATTotalEnumerator, MathSATExtendedPartialEnumerator])
+def test_isolated_environments(solver_cls, rangen_formula):
+    reference = solver_cls()
+    reference.check_all_sat(rangen_formula)
+
+    def run_in_own_environment(_):
+        env = Environment()
+        contextualizer = FormulaContextualizer(env)
+        solver = solver_cls(env=env)
+        solver.check_all_sat(contextualize(contextualizer, rangen_formula), store_models=True)
+        lemmas = solver.get_theory_lemmas()
+        assert contextualize(contextualizer, lemmas) == lemmas, "The lemmas should belong to the solver environment"
+        return solver.get_models_count()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        models_counts = list(executor.map(run_in_own_environment, range(4)))
+    assert models_counts == [reference.get_models_count()] * 4
+
+
+def test_enumerate_true(rangen_formula):
+    sequential = MathSATTotalEnumerator()
+    assert sequential.enumerate_true(rangen_formula)
+    lemmas = sequential.get_theory_lemmas()
+    assert len(lemmas) == len(set(lemmas))
+    assert_lemmas_are_tvalid(lemmas)
+
+    logger = {}
+    parallel = MathSATTotalEnumerator(computation_logger=logger)
+    assert parallel.enumerate_true(rangen_formula, parallel_procs=min(4, multiprocessing.cpu_count()))
+    assert set(parallel.get_theory_lemmas()) == set(lemmas)
+    assert logger["True partitions"] >= 1
+
+    wrapper = WithPartitioningWrapper(MathSATExtendedPartialEnumerator())
+    wrapper.enumerate_true(rangen_formula, parallel_procs=2, enumerator_factory=MathSATExtendedPartialEnumerator)
+    assert_lemmas_are_tvalid(wrapper.get_theory_lemmas())
+
+
+def test_check_all_sat_projections(solver, rangen_formula):
+    atoms = list(rangen_formula.get_atoms())
+    projections = [atoms, atoms[: len(atoms) // 2], atoms[len(atoms) // 2 :], atoms]
+    results = solver.check_all_sat_projections(rangen_formula, projections, store_models=True)
+
+    assert [result.atoms for result in results] == projections
+    all_lemmas = [lemma for result in results for lemma in result.lemmas]
+    assert len(all_lemmas) == len(set(all_lemmas)), "Each lemma should be reported by a single projection"
+    assert_lemmas_are_tvalid(all_lemmas)
+    for atoms, result in zip(projections, results):
+        reference = type(solver)(project_on_theory_atoms=solver._project_on_theory_atoms)
+        assert result.sat == reference.check_all_sat(rangen_formula, atoms)
+        assert result.models_count == reference.get_models_count()
+        assert len(result.models) == result.models_count
+
+
+@pytest.mark.parametrize("solver_cls", [MathSATTotalEnumerator, MathSATExtendedPartialEnumerator])
+def test_check_all_sat_projections_spilled(solver_cls, rangen_formula, tmp_path):
+    atoms = list(rangen_formula.get_atoms())
+    projections = [atoms, atoms[: len(atoms) // 2], atoms]
+    solver = solver_cls(project_on_theory_atoms=False, models_buffer_size=2, models_spill_path=str(tmp_path / "m"))
+    results = solver.check_all_sat_projections(rangen_formula, projections, store_models=True)
+
+    # the models of each projection are read after the runs of the next ones
+    for atoms, result in zip(projections, results):
+        reference = solver_cls(project_on_theory_atoms=False)
+        reference.check_all_sat(rangen_formula, atoms, store_models=True)
+        assert len(result.models) == result.models_count == reference.get_models_count()
+        assert {frozenset(model) for model in result.models} == {frozenset(m) for m in reference.get_models()}
+
+
+@pytest.mark.parametrize("solver_cls", [MathSATTotalEnumerator, MathSATExtendedPartialEnumerator])
+def test_lift_term_ite(solver_cls, x, y, a):
+    phi = Or(And(x >= Ite(a, Real(0), Real(1)), y >= 0), a)
+    solver = solver_cls(lift_term_ite=True)
+    assert solver.check_all_sat(phi, store_models=True)
+    # a makes phi true, so that every assignment of the two theory atoms of phi is a model
+    assert solver.get_models_count() == 4
+    atoms = set(get_theory_atoms(phi.get_atoms()))
+    assert all({literal.arg(0) if literal.is_not() else literal for literal in m} == atoms for m in solver.get_models())
+    assert_models_are_tsat(phi, solver.get_models())
+    lemmas = solver.get_theory_lemmas()
+    assert all(not v.symbol_name().startswith("TERM_ITE") for l in lemmas for v in l.get_free_variables())
+    assert_lemmas_are_tvalid(lemmas)
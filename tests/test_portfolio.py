@@ -0,0 +1,139 @@
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+
+from enumerators.solvers.mathsat_partial_extended import MathSATExtendedPartialEnumerator
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.solvers.portfolio import (
+    PortfolioConfiguration,
+    PortfolioEnumerator,
+    PortfolioHistory,
+    formula_features,
+)
+from enumerators.util.custom_exceptions import PortfolioException
+
+CONFIGURATIONS = [
+    PortfolioConfiguration("total", MathSATTotalEnumerator),
+    PortfolioConfiguration("partial", MathSATExtendedPartialEnumerator),
+    PortfolioConfiguration("partitioned-total", MathSATTotalEnumerator, partitioned=True),
+]
+
+# fails in its process, since the enumerator has no such option
+BROKEN = PortfolioConfiguration("broken", MathSATTotalEnumerator, {"no_such_option": True})
+
+
+def _sleep_ignoring_sigterm() -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    time.sleep(600)
+
+
+class _StuckEnumerator(MathSATTotalEnumerator):
+    """starts a worker which ignores SIGTERM, as a worker busy in mathsat does, and never completes"""
+
+    def __init__(self, pid_path: str):
+        super().__init__()
+        self._pid_path = pid_path
+
+    def check_all_sat(self, phi, atoms=None, store_models=False, incremental=False):
+        worker = multiprocessing.Process(target=_sleep_ignoring_sigterm)
+        worker.start()
+        with open(f"{self._pid_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(str(worker.pid))
+        os.replace(f"{self._pid_path}.tmp", self._pid_path)
+        time.sleep(600)
+
+
+class _WaitingEnumerator(MathSATTotalEnumerator):
+    """completes once the worker of _StuckEnumerator is running"""
+
+    def __init__(self, pid_path: str):
+        super().__init__()
+        self._pid_path = pid_path
+
+    def check_all_sat(self, phi, atoms=None, store_models=False, incremental=False):
+        while not os.path.exists(self._pid_path):
+            time.sleep(0.05)
+        return super().check_all_sat(phi, atoms, store_models, incremental)
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+            # the state follows the name of the command, in parentheses
+            return f.read().rpartition(")")[2].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_portfolio(rangen_formula):
+    logger = {}
+    portfolio = PortfolioEnumerator(CONFIGURATIONS, computation_logger=logger)
+    sat = portfolio.check_all_sat(rangen_formula, store_models=True)
+
+    reference = MathSATTotalEnumerator()
+    assert sat == reference.check_all_sat(rangen_formula, store_models=True)
+    assert portfolio.get_models_count() == reference.get_models_count()
+    assert {frozenset(m) for m in portfolio.get_models()} == {frozenset(m) for m in reference.get_models()}
+    assert portfolio.get_winner() in {c.name for c in CONFIGURATIONS}
+    assert logger["Portfolio winner"] == portfolio.get_winner()
+    # the lemmas of the winner are valid in the environment of the portfolio
+    mgr = portfolio.env.formula_manager
+    assert all(mgr.normalize(lemma) is lemma for lemma in portfolio.get_theory_lemmas())
+
+
+def test_portfolio_failures(rangen_formula):
+    portfolio = PortfolioEnumerator([BROKEN, CONFIGURATIONS[0]])
+    portfolio.check_all_sat(rangen_formula)
+    assert portfolio.get_winner() == "total"
+
+    with pytest.raises(PortfolioException, match="broken"):
+        PortfolioEnumerator([BROKEN]).check_all_sat(rangen_formula)
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc to check the processes")
+def test_portfolio_kills_workers_of_losers(tmp_path, rangen_formula):
+    pid_path = str(tmp_path / "worker.pid")
+    configurations = [
+        PortfolioConfiguration("stuck", _StuckEnumerator, {"pid_path": pid_path}),
+        PortfolioConfiguration("waiting", _WaitingEnumerator, {"pid_path": pid_path}),
+    ]
+    portfolio = PortfolioEnumerator(configurations)
+    portfolio.check_all_sat(rangen_formula)
+    assert portfolio.get_winner() == "waiting"
+
+    with open(pid_path, encoding="utf-8") as f:
+        worker_pid = int(f.read())
+    deadline = time.monotonic() + 10
+    while _is_running(worker_pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _is_running(worker_pid), "The workers of a losing configuration should not outlive it"
+
+
+def test_portfolio_history(tmp_path, rangen_formula):
+    path = str(tmp_path / "history.json")
+    history = PortfolioHistory(path)
+    portfolio = PortfolioEnumerator(CONFIGURATIONS, history=history, max_running=2)
+    assert [c.name for c in portfolio.select_configurations(rangen_formula)] == ["total", "partial"]
+
+    features = formula_features(rangen_formula)
+    history.record(features, "partitioned-total", 1.0)
+    assert [c.name for c in portfolio.select_configurations(rangen_formula)] == ["partitioned-total", "total"]
+
+    portfolio.check_all_sat(rangen_formula)
+    winner = portfolio.get_winner()
+    # the history is persisted, and the preferences only apply to formulas with the same features
+    reloaded = PortfolioHistory(path)
+    assert reloaded.wins(features, winner) == history.wins(features, winner) > 0
+    assert reloaded.rank(["total", "partitioned-total"], "other") == ["total", "partitioned-total"]
+
+
+def test_portfolio_invalid_configurations():
+    with pytest.raises(ValueError):
+        PortfolioEnumerator([])
+    with pytest.raises(ValueError):
+        PortfolioEnumerator([CONFIGURATIONS[0], CONFIGURATIONS[0]])
+    with pytest.raises(ValueError):
+        PortfolioEnumerator(CONFIGURATIONS, max_running=0)
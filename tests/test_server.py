@@ -0,0 +1,122 @@
+import asyncio
+import threading
+
+import pytest
+from pysmt.shortcuts import And, Not, is_sat
+
+from enumerators.server import protocol, server
+from enumerators.server.client import EnumerationClient, formula_to_smtlib
+from enumerators.server.server import DEFAULT_ENUMERATORS, EnumerationServer
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.util.custom_exceptions import ServerException
+
+
+class BlockingEnumerator(MathSATTotalEnumerator):
+    """an enumerator whose runs wait for release to be set, to keep a slot busy"""
+
+    release = threading.Event()
+
+    def check_all_sat(self, *args, **kwargs):
+        assert self.release.wait(60), "The test did not release the enumerator"
+        return super().check_all_sat(*args, **kwargs)
+
+
+@pytest.fixture
+def server_socket(tmp_path):
+    """runs a server with a single slot in a background thread, and returns the path of its socket"""
+    path = str(tmp_path / "server.sock")
+    server = EnumerationServer(path, {**DEFAULT_ENUMERATORS, "blocking": BlockingEnumerator}, max_concurrent=1)
+    started = threading.Event()
+    stop = asyncio.Event()
+    loops = []
+
+    async def serve():
+        loops.append(asyncio.get_running_loop())
+        await server.start()
+        started.set()
+        await stop.wait()
+        await server.close()
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),))
+    thread.start()
+    started.wait(30)
+    yield path
+    loops[0].call_soon_threadsafe(stop.set)
+    thread.join()
+
+
+def test_server_enumeration(server_socket, rangen_formula):
+    events = []
+    with EnumerationClient(server_socket, timeout=60) as client:
+        result = client.enumerate(rangen_formula, on_event=events.append, models=True, progress_interval=0.0)
+        # the enumerators are reused by the next jobs
+        again = client.enumerate(formula_to_smtlib(rangen_formula))
+
+    reference = MathSATTotalEnumerator()
+    reference.check_all_sat(rangen_formula, store_models=True)
+    assert result.sat
+    assert result.models_count == again.models_count == reference.get_models_count()
+    assert {frozenset(model) for model in result.get_models()} == {frozenset(m) for m in reference.get_models()}
+    lemmas = result.get_lemmas()
+    assert len(lemmas) == result.lemmas_count == again.lemmas_count > 0
+    assert not is_sat(Not(And(lemmas)), solver_name="msat")
+    types = [event["type"] for event in events]
+    assert types[0] == protocol.QUEUED and types[1] == protocol.STARTED and types[-1] == protocol.DONE
+    assert types.index(protocol.LEMMAS) < types.index(protocol.DONE)
+    assert result.progress[-1]["phase"] == "done"
+
+
+def test_server_backpressure(server_socket, rangen_formula, monkeypatch):
+    # the enumeration waits for each streamed message to be written before the next one
+    monkeypatch.setattr(server, "MAX_PENDING_STREAMED", 1)
+    with EnumerationClient(server_socket, timeout=60) as client:
+        result = client.enumerate(rangen_formula, models=True, progress_interval=0.0)
+        assert client.status()["running"] == 0
+
+    reference = MathSATTotalEnumerator()
+    reference.check_all_sat(rangen_formula, store_models=True)
+    assert result.models_count == len(result.get_models()) == reference.get_models_count()
+    assert len(result.get_lemmas()) == result.lemmas_count
+
+
+def test_server_priorities(server_socket, rangen_formula):
+    BlockingEnumerator.release.clear()
+    try:
+        with EnumerationClient(server_socket, timeout=60) as client:
+            # the first job holds the only slot until it is released, while the others are queued
+            first = client.submit(rangen_formula, enumerator="blocking", progress_interval=None)
+            client._next_message(lambda m: m["type"] == protocol.STARTED and m["id"] == first)
+            low = client.submit(rangen_formula, priority=1, progress_interval=None)
+            high = client.submit(rangen_formula, priority=5, progress_interval=None)
+            cancelled = client.submit(rangen_formula, priority=3, progress_interval=None)
+            client.cancel(cancelled)
+            assert [e["type"] for e in client.events(cancelled)][-1] == protocol.CANCELLED
+            assert client.status()["queued"] == 2
+            BlockingEnumerator.release.set()
+
+            started = []
+            done = set()
+            for event in client.events():
+                if event["type"] == protocol.STARTED:
+                    started.append(event["id"])
+                elif event["type"] == protocol.DONE:
+                    done.add(event["id"])
+                if done == {first, low, high}:
+                    break
+            assert started == [high, low]
+            assert client.status()["completed"] == 3
+    finally:
+        # the slot must not stay blocked when the server is closed
+        BlockingEnumerator.release.set()
+
+
+def test_server_errors(server_socket, rangen_formula):
+    with EnumerationClient(server_socket, timeout=60) as client:
+        with pytest.raises(ServerException, match="unknown enumerator"):
+            client.enumerate(rangen_formula, enumerator="missing")
+        with pytest.raises(ServerException):
+            client.enumerate("(assert (undeclared_symbol))")
+        client._socket.sendall(b"not json\n")
+        assert client._next_message(lambda m: m["type"] == protocol.ERROR)["message"].startswith("invalid message")
+        # the connection still serves jobs
+        assert client.enumerate(rangen_formula).sat
@@ -0,0 +1,59 @@
+import pathlib
+
+import pytest
+
+from enumerators.generator import FormulaParameters, random_formula
+from enumerators.solvers.mathsat_profiles import MathSATProfile, TunableOption, apply_profile, load_profile
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.solvers.mathsat_utils import MSAT_TOTAL_ENUM_OPTIONS
+from enumerators.tuning import OptionTuner, split_corpus, theory_of
+
+ITEMS = pathlib.Path(__file__).parent / "items"
+
+
+def test_profile_roundtrip(tmp_path, monkeypatch):
+    profile = MathSATProfile("fast-lra", "LRA", {"dpll.restart_strategy": "1"}, {"tuned_score": 1.0})
+    profile.save(str(tmp_path))
+    monkeypatch.setenv("ENUMERATORS_PROFILES_DIR", str(tmp_path))
+    assert load_profile("fast-lra") == profile
+
+    options = apply_profile(MSAT_TOTAL_ENUM_OPTIONS, "fast-lra")
+    assert options == {**MSAT_TOTAL_ENUM_OPTIONS, "dpll.restart_strategy": "1"}
+    assert apply_profile(MSAT_TOTAL_ENUM_OPTIONS, None) is MSAT_TOTAL_ENUM_OPTIONS
+
+
+def test_protected_options():
+    with pytest.raises(ValueError, match="preprocessor.simplification"):
+        MathSATProfile("unsafe", "LRA", {"preprocessor.simplification": "1"})
+
+
+@pytest.mark.parametrize("theory", ["LRA", "LIA", "BV"])
+def test_theory_of(theory):
+    phi = random_formula(FormulaParameters(bool_vars=2, theory_vars=3, theory_atoms=4, depth=2, theory=theory))
+    assert theory_of(phi) == theory
+
+
+def test_split_corpus():
+    corpus = split_corpus([str(ITEMS / "rng.smt")])
+    assert corpus == {"LRA": [str(ITEMS / "rng.smt")]}
+
+
+def test_tuner(tmp_path, rangen_formula):
+    space = [TunableOption("dpll.restart_strategy", ("0", "1")), TunableOption("no.such.option", ("1",))]
+    log = []
+    tuner = OptionTuner(timeout=60.0, options=space, rounds=1, min_improvement=0.0, log=log.append)
+    profile = tuner.tune("LRA", [str(ITEMS / "rng.smt")], "test-lra")
+    # the defaults and each value of each option are evaluated once
+    assert profile.info["evaluations"] == 1 + sum(len(option.values) for option in space)
+    assert len(log) == profile.info["evaluations"]
+    # the option rejected by mathsat is evaluated, and discarded
+    assert "LRA no.such.option=1: failed" in log
+    assert "no.such.option" not in profile.options
+
+    # the enumerators load the profile, and find the same models with it
+    profile.save(str(tmp_path))
+    tuned = MathSATTotalEnumerator(msat_profile=load_profile("test-lra", str(tmp_path)))
+    tuned.check_all_sat(rangen_formula)
+    reference = MathSATTotalEnumerator()
+    reference.check_all_sat(rangen_formula)
+    assert tuned.get_models_count() == reference.get_models_count()
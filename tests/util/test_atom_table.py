@@ -0,0 +1,43 @@
+import pytest
+from pysmt.shortcuts import Not
+
+from enumerators.util.atom_table import AbstractionTable, AtomTable
+
+
+@pytest.fixture
+def models(x, y, z, a):
+    return [[x < y, Not(y < z), a], [], [Not(x < y), Not(a)], [z < x]]
+
+
+def test_encode_decode_models(models, x, y, z, a):
+    table = AtomTable([a])
+    literals, offsets = table.encode_models(models)
+    assert list(offsets) == [3, 3, 5, 6]
+    assert list(literals) == [2, -3, 1, -2, -1, 4]
+    assert table.decode_models(literals, offsets) == models
+    assert table.decode_literals(literals[:3]) == models[0]
+
+    # the negation of atoms added after a batch was decoded are found
+    assert table.decode_literal(-table.get_id(x.Equals(0))) == Not(x.Equals(0))
+    assert table.decode_literals([-5, 4]) == [Not(x.Equals(0)), z < x]
+
+
+def test_encode_decode_models_numpy(models):
+    numpy = pytest.importorskip("numpy")
+    table = AtomTable()
+    literals, offsets = table.encode_models(models, as_numpy=True)
+    assert isinstance(literals, numpy.ndarray) and literals.dtype == numpy.int32
+    assert table.decode_models(literals, offsets) == models
+    assert list(table.decode_literals(literals[:3])) == models[0]
+
+
+def test_abstraction_table_conflict(x, y, a, b):
+    abstraction = {x < y: b}
+    table = AbstractionTable(abstraction)
+    assert table.refine_models([[b, Not(a)]]) == [[x < y, Not(a)]]
+
+    # a was mapped to itself, and cannot be the abstraction of another atom
+    abstraction[y < x] = a
+    with pytest.raises(ValueError):
+        table.refine_models([[a]])
+    assert len(table.atoms) == len(table.variables), "A conflict should leave the tables aligned"
@@ -0,0 +1,37 @@
+from pysmt.shortcuts import And, Iff, Not, Or
+
+from enumerators.util.cnf_cache import CNFCache
+
+
+def test_cnf_cache_reuses_phi(x, y, z, a):
+    phi = And(Iff(a, x < y), Or(And(y < z, a), z < x))
+    lemmas = [Or(Not(x < y), Not(y < x)), Or(Not(y < z), Not(z < y))]
+    cache = CNFCache()
+
+    cnf = cache.convert(phi)
+    assert cache.misses == 1
+
+    cnf_with_lemmas = cache.convert(And(phi, *lemmas))
+    assert cache.misses == 1 and cache.hits == 1
+    assert set(cnf_with_lemmas.args()) == {cnf, *lemmas}
+
+    cache.convert(And(phi, lemmas[0]))
+    assert cache.misses == 1 and cache.hits == 2
+
+
+def test_cnf_cache_clauses_only(x, y, a):
+    cache = CNFCache()
+    clauses = [Or(a, x < y), Not(a)]
+    assert cache.convert(And(clauses)) == And(clauses)
+    assert cache.convert(x < y) == (x < y)
+    assert len(cache) == 0
+
+
+def test_cnf_cache_max_size(x, y, a):
+    cache = CNFCache(max_size=1)
+    phi1 = Iff(a, x < y)
+    phi2 = Iff(a, y < x)
+    cache.convert(phi1)
+    cache.convert(phi2)
+    cache.convert(phi1)
+    assert cache.misses == 3 and len(cache) == 1
@@ -0,0 +1,8 @@
+from enumerators.util.collections import map_nested
+
+
+def test_map_nested_keeps_order():
+    data = [[1, 2, 3], [4, 5], (6, 7)]
+    assert map_nested(lambda x: x * 10, data) == [[10, 20, 30], [40, 50], (60, 70)]
+    assert map_nested(str, (1, [2, 3])) == ("1", ["2", "3"])
+    assert map_nested(str, 1) == "1"
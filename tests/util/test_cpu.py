@@ -0,0 +1,28 @@
+import pytest
+
+from enumerators.util.cpu import available_cpu_ids, available_cpus, choose_workers
+
+
+def test_available_cpus():
+    assert 1 <= available_cpus() <= len(available_cpu_ids())
+
+
+@pytest.mark.parametrize(
+    "tasks, task_time, max_workers, expected",
+    [
+        (0, 1.0, 8, 1),
+        (1, 10.0, 8, 1),
+        (100, 0.001, 8, 1),
+        (8, 10.0, 8, 8),
+        (8, 10.0, 4, 4),
+        (3, 10.0, 8, 3),
+        (10, 1.0, 1, 1),
+    ],
+)
+def test_choose_workers(tasks, task_time, max_workers, expected):
+    assert choose_workers(tasks, task_time, max_workers, startup_time=0.5) == expected
+
+
+def test_choose_workers_does_not_waste_workers():
+    # 4 or 5 workers both need 2 rounds for 8 tasks, the smallest pool is chosen
+    assert choose_workers(8, 10.0, 7, startup_time=0.5) == 4
@@ -0,0 +1,63 @@
+from pysmt.environment import Environment
+from pysmt.shortcuts import LE, And, ForAll, Ite, Not, Or, Plus, Real
+from pysmt.typing import REAL
+
+from enumerators.util.formula_index import FormulaIndex, FormulaIndexCache, get_formula_index
+
+
+def test_index(x, y, z, w, a):
+    phi = And(Or(LE(x, y), a), LE(Plus(y, z), Real(1)), Not(LE(w, Real(0))), Or(LE(z, Real(3)), LE(w, Real(2))))
+    index = FormulaIndex(phi)
+    assert set(index.atoms) == set(phi.get_atoms())
+    assert set(index.theory_atoms) == set(phi.get_atoms()) - {a}
+    assert index.variables(LE(Plus(y, z), Real(1))) == {y, z}
+    assert index.atoms_of(w) == {LE(w, Real(0)), LE(w, Real(2))}
+    assert index.signature(LE(x, y)) == {REAL}
+    assert index.theories == {REAL}
+    assert index.is_supported
+    partitions = [set(p) for p in sorted(index.partitions(), key=len)]
+    assert partitions == [{LE(w, Real(0)), LE(w, Real(2))}, {LE(x, y), LE(Plus(y, z), Real(1)), LE(z, Real(3))}]
+    assert index.partitions([LE(x, y), LE(w, Real(0))]) == [[LE(x, y)], [LE(w, Real(0))]]
+
+
+def test_conjoin(x, y, w, a):
+    phi = And(Or(LE(x, y), a), LE(w, Real(0)))
+    index = FormulaIndex(phi)
+    lemma = Or(Not(LE(x, y)), LE(x, w))
+    conjoined = index.conjoin([lemma])
+    assert set(conjoined.atoms) == set(And(phi, lemma).get_atoms())
+    assert len(conjoined.partitions()) == 1
+    assert len(index.partitions()) == 2, "conjoin should not change the original index"
+
+
+def test_unsupported(x, y, a):
+    term_ite = LE(Ite(a, x, y), Real(0))
+    assert not FormulaIndex(And(a, term_ite)).is_supported
+    assert FormulaIndex(Ite(a, LE(x, y), LE(y, x))).is_supported, "Boolean ITEs are supported"
+    assert FormulaIndex(ForAll([x], LE(x, y))).has_quantifiers
+    # the memo shared with the conjoined index must not hide the term-ITE of an atom seen before
+    index = FormulaIndex(LE(x, y))
+    assert not index.conjoin([Or(a, term_ite)]).is_supported
+    assert not index.conjoin([term_ite]).is_supported
+
+
+def test_cache_builds_conjunctions_incrementally(x, y, a):
+    cache = FormulaIndexCache(max_size=2)
+    phi = Or(LE(x, y), a)
+    index = cache.get(phi)
+    assert cache.get(phi) is index
+    assert cache.hits == 1
+    lemma = Or(Not(LE(x, y)), LE(y, x))
+    conjoined = cache.get(And(phi, lemma))
+    assert set(conjoined.atoms) == {LE(x, y), a, LE(y, x)}
+    cache.get(LE(x, Real(1)))
+    assert len(cache) == 2
+
+
+def test_get_formula_index_per_environment(x, y):
+    phi = LE(x, y)
+    assert get_formula_index(phi) is get_formula_index(phi)
+    env = Environment()
+    other_phi = env.formula_manager.normalize(phi)
+    assert get_formula_index(other_phi, env) is not get_formula_index(phi)
+    assert get_formula_index(other_phi, env).atoms == [other_phi]
@@ -0,0 +1,110 @@
+import os
+import pickle
+
+import pytest
+from pysmt.formula import FormulaContextualizer
+from pysmt.shortcuts import LE, Not, REAL, Real, Symbol
+
+from enumerators.solvers.mathsat_total import MathSATTotalEnumerator
+from enumerators.util.custom_exceptions import CheckpointException
+from enumerators.util.model_sink import ModelSink, ObservedModels
+
+
+def _all_models(n_atoms: int) -> list[set]:
+    atoms = [LE(Symbol(f"x{i}", REAL), Real(i)) for i in range(n_atoms)]
+    return [{atoms[j] if (i >> j) & 1 else Not(atoms[j]) for j in range(n_atoms)} for i in range(2**n_atoms)]
+
+
+def test_model_sink_spills(tmp_path):
+    models = _all_models(5)
+    sink = ModelSink(max_in_memory=4, spill_path=str(tmp_path / "models"))
+    sink.extend(models)
+
+    assert sink.is_spilled(), "Models exceeding the buffer should be written to disk"
+    assert len(sink) == len(models)
+    assert list(sink) == models
+    assert sink[-1] == models[-1]
+    assert list(sink[5:25:3]) == models[5:25:3]
+    assert sink[5:25][2:4][1] == models[8], "Slices of slices should be lazy views on the same models"
+
+
+def test_model_sink_resume_truncates(tmp_path):
+    models = _all_models(5)
+    sink = ModelSink(max_in_memory=4, spill_path=str(tmp_path / "models"))
+    sink.extend(models[:22])
+    state = pickle.dumps(sink)
+    sink.extend(models[22:])
+
+    restored = pickle.loads(state)
+    restored.contextualize(FormulaContextualizer())
+    assert list(restored) == models[:22], "Models appended after the snapshot should not be visible"
+    assert list(sink) == models, "Restoring a sink should not change the files of the live one"
+    with pytest.raises(ValueError, match="resumed"):
+        restored.extend(models[22:])
+
+    restored = pickle.loads(state)
+    restored.contextualize(FormulaContextualizer())
+    restored.resume()
+    assert list(restored) == models[:22], "Models appended after the snapshot should be discarded"
+    restored.extend(models[22:])
+    assert list(restored) == models
+
+
+def test_temporary_sink_cannot_be_saved():
+    sink = ModelSink(max_in_memory=4)
+    sink.extend(_all_models(2))
+    assert len(pickle.loads(pickle.dumps(sink))) == 4, "A sink which did not spill only saves its buffer"
+    sink.extend(_all_models(2))
+    with pytest.raises(CheckpointException):
+        pickle.dumps(sink)
+    sink.close()
+
+
+def test_temporary_sink_is_removed():
+    sink = ModelSink(max_in_memory=1)
+    sink.extend(_all_models(2))
+    path = sink._spill_path
+    assert os.path.exists(path + ".lits")
+    sink.close()
+    assert not os.path.exists(path + ".lits"), "Temporary spill files should be removed on close"
+
+
+def test_enumerator_with_bounded_models(rangen_formula):
+    unbounded = MathSATTotalEnumerator(project_on_theory_atoms=False)
+    unbounded.check_all_sat(rangen_formula, store_models=True)
+
+    bounded = MathSATTotalEnumerator(project_on_theory_atoms=False, models_buffer_size=2)
+    bounded.check_all_sat(rangen_formula, store_models=True)
+
+    assert isinstance(bounded.get_models(), ModelSink)
+    assert bounded.get_models().is_spilled()
+    assert bounded.get_models_count() == len(bounded.get_models())
+    assert sorted(map(sorted_repr, bounded.get_models())) == sorted(map(sorted_repr, unbounded.get_models()))
+
+
+def sorted_repr(model) -> str:
+    return " ".join(sorted(lit.serialize() for lit in model))
+
+
+def test_observed_models(tmp_path):
+    models = _all_models(3)
+    notified = []
+    observed = ObservedModels(ModelSink(max_in_memory=2, spill_path=str(tmp_path / "models")), notified.append)
+    observed.append(models[0])
+    observed.extend(models[1:])
+    observed.extend([])
+    assert notified == [models[:1], models[1:]]
+    assert list(observed) == models
+    assert isinstance(pickle.loads(pickle.dumps(observed)), ModelSink), "The listener should not be pickled"
+
+
+def test_sinks_with_same_spill_path(tmp_path):
+    models = _all_models(5)
+    first = ModelSink(max_in_memory=4, spill_path=str(tmp_path / "models"))
+    first.extend(models[:20])
+    second = ModelSink(max_in_memory=4, spill_path=str(tmp_path / "models"))
+    second.extend(models[20:])
+
+    assert first._spill_path != second._spill_path, "Each sink should spill to its own files"
+    assert list(first) == models[:20], "A new sink should not overwrite the models of a live one"
+    assert list(second) == models[20:]
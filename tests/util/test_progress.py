@@ -0,0 +1,49 @@
+import multiprocessing
+
+from enumerators.util.progress import ProgressReporter, SharedModelsCounter
+
+
+def test_reporter_disabled():
+    reporter = ProgressReporter()
+    assert not reporter.is_enabled()
+    reporter.model_found()
+    assert not reporter.maybe_report(force=True)
+
+
+def test_reporter_rate_limit():
+    reports = []
+    reporter = ProgressReporter(reports.append, interval=3600.0)
+    reporter.start("total")
+    for _ in range(10):
+        reporter.model_found()
+    assert reports == []
+    reporter.update(phase="done", lemmas=3, force=True)
+    assert len(reports) == 1
+    assert reports[0].phase == "done"
+    assert reports[0].models == 10
+    assert reports[0].lemmas == 3
+
+
+def test_reporter_snapshots():
+    reports = []
+    reporter = ProgressReporter(reports.append, interval=0.0)
+    reporter.start("partial")
+    reporter.partial_model_found()
+    reporter.partial_model_found()
+    assert [r.partial_models for r in reports] == [1, 2]
+    reporter.start("total")
+    reporter.update(tasks_total=4, tasks_completed=1)
+    assert reports[-1].partial_models == 0
+    assert reports[-1].tasks_completed == 1
+
+
+def test_shared_models_counter():
+    value = multiprocessing.Value("q", 0)
+    counter = SharedModelsCounter(value, interval=3600.0)
+    for _ in range(5):
+        counter.model_found()
+    assert value.value == 0
+    counter.flush()
+    assert value.value == 5
+    counter.flush()
+    assert value.value == 5
@@ -0,0 +1,54 @@
+import os
+import time
+
+from enumerators.util.resources import ResourceReport, WorkerUsage, WorkerUsageTracker, peak_rss
+
+
+def test_tracker():
+    tracker = WorkerUsageTracker()
+    with tracker.task():
+        with tracker.solver():
+            time.sleep(0.01)
+    with tracker.task():
+        pass
+    usage = tracker.snapshot()
+    assert usage.pid == os.getpid()
+    assert usage.tasks == 2
+    assert usage.solver_time >= 0.01
+    assert usage.busy_time >= usage.solver_time
+    assert usage.cpu_time > 0
+    assert usage.peak_rss == peak_rss() > 0
+    assert usage.sent_at <= time.time()
+
+
+def test_report_keeps_last_usage_of_each_worker():
+    usages = [
+        WorkerUsage(pid=2, tasks=1, cpu_time=1.0, peak_rss=100, busy_time=1.0, solver_time=0.5),
+        WorkerUsage(pid=1, tasks=1, cpu_time=2.0, peak_rss=300, busy_time=2.0, solver_time=1.5),
+        WorkerUsage(pid=2, tasks=2, cpu_time=3.0, peak_rss=200, busy_time=3.0, solver_time=2.5),
+    ]
+    report = ResourceReport.from_usages(processes=2, wall_time=4.0, result_time=0.1, usages=usages)
+    assert [w.pid for w in report.workers] == [1, 2]
+    assert report.tasks == 3
+    assert report.cpu_time == 5.0
+    assert report.busy_time == 5.0
+    assert report.solver_time == 4.0
+    assert report.idle_time == 3.0
+    assert report.peak_rss == 300
+    assert report.utilization == 5.0 / 8.0
+    assert report.as_dict()["workers"][1]["tasks"] == 2
+
+
+def test_report_separates_ipc_time():
+    usages = [WorkerUsage(pid=1, tasks=2, cpu_time=1.0, peak_rss=100, busy_time=2.0, solver_time=1.0)]
+    report = ResourceReport.from_usages(processes=2, wall_time=4.0, result_time=0.1, usages=usages, ipc_time=1.5)
+    assert report.ipc_time == 1.5
+    assert report.idle_time == 8.0 - 2.0, "The results wait while the workers run, it is not idle time"
+    assert report.as_dict()["ipc_time"] == 1.5
+
+
+def test_empty_report():
+    report = ResourceReport.from_usages(processes=4, wall_time=0.0, result_time=0.0, usages=[])
+    assert report.tasks == 0
+    assert report.peak_rss == 0
+    assert report.utilization == 0.0
@@ -0,0 +1,70 @@
+from pysmt.shortcuts import GE, LE, And, Ite, Not, Or, Plus, Real, Symbol
+from pysmt.typing import REAL
+
+from enumerators.walkers.term_ite_lifter import RestoredModels, TermIteLifter
+
+
+def _term_ites(formula):
+    return [node for node in _subterms(formula) if node.is_ite() and not node.get_type().is_bool_type()]
+
+
+def _subterms(formula):
+    seen = set()
+    stack = [formula]
+    while stack:
+        node = stack.pop()
+        if node not in seen:
+            seen.add(node)
+            stack.extend(node.args())
+    return seen
+
+
+def test_lift():
+    x, y = Symbol("x", REAL), Symbol("y", REAL)
+    a, b = Symbol("a"), Symbol("b")
+    inner = Ite(b, y, Real(2))
+    phi = Or(And(GE(x, Ite(a, Real(0), inner)), GE(y, Real(0))), a)
+    lifter = TermIteLifter()
+    lifted = lifter.lift(phi)
+    assert _term_ites(phi) != []
+    assert _term_ites(lifted) == [], "the lifted formula should have no term-ITE"
+    # the formula, the definitions of the outer and of the inner ITE
+    assert lifted.is_and() and len(lifted.args()) == 3
+    assert lifter.lift(phi) is lifted, "lifting should be memoized"
+
+    (atom,) = lifter.lift_atoms([GE(x, Ite(a, Real(0), inner))])
+    assert atom in lifted.get_atoms()
+    assert lifter.restore(atom) is GE(x, Ite(a, Real(0), inner))
+    assert lifter.restore_model({Not(atom), GE(y, Real(0))}) == {Not(GE(x, Ite(a, Real(0), inner))), GE(y, Real(0))}
+
+
+def test_lift_grown_formula():
+    x = Symbol("x", REAL)
+    a = Symbol("a")
+    phi = LE(Plus(x, Ite(a, Real(1), Real(2))), Real(3))
+    lifter = TermIteLifter()
+    lifted = lifter.lift(phi)
+    grown = lifter.lift(And(phi, LE(x, Ite(a, Real(1), Real(2)))))
+    variables = {v for v in grown.get_free_variables() if v.symbol_name().startswith("TERM_ITE")}
+    assert len(variables) == 1, "the same term-ITE should be lifted to the same variable"
+    assert grown.arg(0) is lifted, "the lifting of a conjunction should extend the one of its first conjunct"
+
+
+def test_boolean_ite_is_kept():
+    x = Symbol("x", REAL)
+    a = Symbol("a")
+    phi = Ite(a, LE(x, Real(0)), GE(x, Real(1)))
+    assert TermIteLifter().lift(phi) is phi
+
+
+def test_restored_models():
+    x = Symbol("x", REAL)
+    a = Symbol("a")
+    lifter = TermIteLifter()
+    atom = LE(x, Ite(a, Real(0), Real(1)))
+    lifter.lift(atom)
+    (lifted_atom,) = lifter.lift_atoms([atom])
+    models = RestoredModels([{lifted_atom}, {Not(lifted_atom)}], lifter)
+    assert len(models) == 2
+    assert list(models) == [{atom}, {Not(atom)}]
+    assert models[1:][0] == {Not(atom)}
@@ -1,7 +1,10 @@
+from pysmt.environment import Environment
 from pysmt.shortcuts import (
     And, Or, Not, Int, Symbol, Equals, Implies, is_valid, Iff
 )
+from pysmt.typing import INT
 from enumerators.walkers.walker_bool_abstraction import BooleanAbstractionWalker
+from enumerators.walkers.walker_refinement import RefinementWalker
 
 
 def test_bool_abstraction_walker():
@@ -51,4 +54,44 @@ def test_bool_abstraction_walker():
         )
     )
 
-    assert is_valid(Iff(abstracted_formula, expected_abstracted)), "Abstracted formula does not match expected structure"
\ No newline at end of file
+    assert is_valid(Iff(abstracted_formula, expected_abstracted)), "Abstracted formula does not match expected structure"
+
+
+def test_bool_abstraction_table():
+    ten = Int(10)
+    a = Symbol("a", ten.get_type())
+    b = Symbol("b", ten.get_type())
+    p = Symbol("p")
+
+    walker = BooleanAbstractionWalker()
+    table = walker.get_abstraction_table()
+    walker.walk(And(Equals(a, ten), Or(p, Not(Equals(b, ten)))))
+    va, vb = walker.abstraction[Equals(a, ten)], walker.abstraction[Equals(b, ten)]
+
+    models = [[va, Not(vb), p], [Not(va), Not(p)]]
+    refined = table.refine_models(models)
+    assert refined == [[Equals(a, ten), Not(Equals(b, ten)), p], [Not(Equals(a, ten)), Not(p)]]
+    assert table.abstract_models(refined) == models
+
+    # atoms abstracted after the table was created are picked up
+    walker.walk(Equals(a, b))
+    vab = walker.abstraction[Equals(a, b)]
+    assert table.refine_models([[Not(vab)]]) == [[Not(Equals(a, b))]]
+
+    literals, offsets = table.encode_models(models)
+    assert list(offsets) == [3, 5]
+    assert table.decode_models(literals, offsets) == refined
+    assert table.decode_models(literals, offsets, refine=False) == models
+
+
+def test_bool_abstraction_walker_environment():
+    env = Environment()
+    mgr = env.formula_manager
+    x = mgr.Symbol("x", INT)
+    phi = mgr.Or(mgr.Equals(x, mgr.Int(0)), mgr.Not(mgr.Equals(x, mgr.Int(1))))
+
+    walker = BooleanAbstractionWalker(env=env)
+    abstracted = walker.walk(phi)
+    v0, v1 = walker.abstraction[mgr.Equals(x, mgr.Int(0))], walker.abstraction[mgr.Equals(x, mgr.Int(1))]
+    assert abstracted is mgr.Or(v0, mgr.Not(v1)), "The abstraction should be built in the environment of the walker"
+    assert RefinementWalker(walker.abstraction, env=env).walk(abstracted) is phi